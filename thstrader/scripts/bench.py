@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+THSTrader 基准测试
+多次执行各项操作，统计 p50/p95 耗时和各步骤（navigate、input_price、confirm、ocr 等）的耗时分解，
+p95 超出延迟预算时返回非零
+
+可以连接真机（--device），也可以回放录制的场景（--scenario，见 ths/fake.py）
+
+使用示例:
+    python bench.py --device 127.0.0.1:5565 --runs 5
+    python bench.py --cases get_balance,withdraw,ocr_full
+    python bench.py --cases buy,sell --code 002415 --amount 100 --price 31.5
+    python bench.py --scenario ../tests/fixtures/moni --position-scenario 200=../tests/fixtures/holdings_200
+    python bench.py --budget budgets.json --json bench_result.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+from ths import THSTrader
+from ths.config import BENCH_BUDGETS
+from ths.fake import FakeDevice
+from ths.ocr import ocr_input
+from ths.trace import tracer
+
+# 默认执行的用例（不会改变账户状态）
+DEFAULT_CASES = ("get_balance", "get_position", "withdraw", "ocr_full", "ocr_lines")
+
+
+def percentile(samples, q):
+    """最近秩百分位数"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def build_cases(trader, args):
+    """
+    用例名 -> 无参函数
+
+    买卖只在指定了 --code / --price 时执行，自选股用例需要 --favorite，OCR 用例需要 OCR 可用
+    """
+    cases = {
+        # 跳过读取缓存，每次都测量完整的读取
+        "get_balance": lambda: trader.get_balance(fresh=True),
+        "get_position": lambda: trader.get_position(fresh=True),
+        # 撤销一笔不存在的委托: 完整扫描一遍撤单列表，不撤任何单
+        "withdraw": lambda: trader.withdraw("__bench__", "买入", 0, 0.0),
+    }
+    if trader.reader:
+        cases["ocr_full"] = lambda: _ocr_full(trader)
+        cases["ocr_lines"] = lambda: _ocr_lines(trader)
+    if args.code and args.price is not None:
+        cases["buy"] = lambda: trader.buy(args.code, args.amount, args.price)
+        cases["sell"] = lambda: trader.sell(args.code, args.amount, args.price)
+    if args.favorite:
+        cases["get_favorite_code"] = lambda: trader.get_favorite_code(args.favorite)
+        cases["favorite_roundtrip"] = lambda: (trader.add_favorite(args.favorite),
+                                               trader.remove_favorite(args.favorite))
+    return cases
+
+
+def _ocr_full(trader):
+    """整屏多行识别"""
+    image = trader.device.screenshot()
+    with tracer.span("ocr"):
+        return trader.reader.ocr(ocr_input(image))
+
+
+def _ocr_lines(trader):
+    """按持仓行裁剪区域批量单行识别（与解析持仓时的调用方式相同）"""
+    image = trader.device.screenshot()
+    crops = [image.crop(box) for box in trader.geometry.crop_areas("holding").values()]
+    return trader._ocr_read_lines(crops * 4)
+
+
+def self_times(summary):
+    """
+    各步骤的自身耗时（区间总耗时减去子区间耗时），按步骤名累加
+
+    各步骤之和等于整个操作的耗时，不会因为嵌套重复计算
+    """
+    totals = {row["path"]: row["total"] for row in summary}
+    own = dict(totals)
+    for path, total in totals.items():
+        parent = path.rpartition("/")[0]
+        if parent in own:
+            own[parent] -= total
+    phases = {}
+    for path, value in own.items():
+        name = path.rpartition("/")[2]
+        phases[name] = phases.get(name, 0.0) + max(0.0, value)
+    return phases
+
+
+def run_case(name, func, runs, verbose=False):
+    """
+    执行一个用例
+
+    Returns:
+        dict: {'runs', 'errors', 'p50', 'p95', 'mean', 'min', 'max',
+               'phases': {步骤: 自身耗时 p50}}
+    """
+    samples = []
+    phases = {}
+    errors = 0
+    for _ in range(runs):
+        tracer.reset()
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        try:
+            with output:
+                func()
+        except Exception as e:
+            errors += 1
+            print(f"  ✗ {name}: {type(e).__name__}: {e}")
+            continue
+        samples.append(time.perf_counter() - start)
+        for phase, total in self_times(tracer.summary()).items():
+            phases.setdefault(phase, []).append(total)
+
+    result = {"runs": len(samples), "errors": errors}
+    if samples:
+        result.update({
+            "p50": round(percentile(samples, 50), 3),
+            "p95": round(percentile(samples, 95), 3),
+            "mean": round(statistics.mean(samples), 3),
+            "min": round(min(samples), 3),
+            "max": round(max(samples), 3),
+        })
+    result["phases"] = {phase: round(statistics.median(values), 3)
+                        for phase, values in sorted(phases.items(), key=lambda kv: -statistics.median(kv[1]))}
+    return result
+
+
+def budget_for(name, budgets):
+    """用例的预算，get_position[200] 找不到时使用 get_position 的预算"""
+    if name in budgets:
+        return budgets[name]
+    return budgets.get(name.split("[", 1)[0])
+
+
+def print_report(results, budgets):
+    print("\n" + "="*78)
+    print(f"{'用例':26s}{'次数':>6}{'p50':>10}{'p95':>10}{'预算':>10}  结果")
+    print("="*78)
+    failed = []
+    for name, r in results.items():
+        budget = budget_for(name, budgets)
+        if not r["runs"]:
+            status = "✗ 全部失败"
+            failed.append(name)
+        elif budget is not None and r["p95"] > budget:
+            status = "✗ 超出预算"
+            failed.append(name)
+        else:
+            status = "✓"
+        p50 = f"{r['p50']:.3f}" if r["runs"] else "-"
+        p95 = f"{r['p95']:.3f}" if r["runs"] else "-"
+        budget_text = f"{budget:.1f}" if budget is not None else "-"
+        print(f"{name:28s}{r['runs']:>6}{p50:>10}{p95:>10}{budget_text:>10}  {status}")
+        for phase, p50_phase in list(r["phases"].items())[:8]:
+            print(f"    {phase:24s}{p50_phase:>18.3f}")
+    print("="*78)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='THSTrader 基准测试',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__.split("使用示例:", 1)[1])
+    parser.add_argument('--device', '-d', default='127.0.0.1:5565', help='设备序列号 (默认: 127.0.0.1:5565)')
+    parser.add_argument('--no-broker', action='store_true', help='不使用本地设备代理，直接连接设备')
+    parser.add_argument('--scenario', help='回放场景目录（不连接设备）')
+    parser.add_argument('--position-scenario', action='append', default=[], metavar='N=DIR',
+                        help='持仓规模用例: 用 DIR 场景执行 get_position[N]，可重复')
+    parser.add_argument('--cases', '-c', default=None,
+                        help=f'逗号分隔的用例 (默认: {",".join(DEFAULT_CASES)}，指定买卖/自选参数时自动加入)')
+    parser.add_argument('--runs', '-n', type=int, default=5, help='每个用例执行次数 (默认: 5)')
+    parser.add_argument('--code', help='买卖用例的股票代码')
+    parser.add_argument('--amount', type=int, default=100, help='买卖用例的数量 (默认: 100)')
+    parser.add_argument('--price', type=float, help='买卖用例的价格')
+    parser.add_argument('--favorite', help='自选股用例的拼音首字母，如 hkws')
+    parser.add_argument('--budget', help='JSON 预算文件 {用例: p95 秒}，覆盖 BENCH_BUDGETS')
+    parser.add_argument('--json', dest='json_out', help='把结果写入 JSON 文件')
+    parser.add_argument('--verbose', '-v', action='store_true', help='显示 THSTrader 日志')
+    args = parser.parse_args()
+
+    budgets = dict(BENCH_BUDGETS)
+    if args.budget:
+        with open(args.budget, encoding='utf-8') as f:
+            budgets.update(json.load(f))
+
+    if args.scenario:
+        trader = THSTrader(device=FakeDevice(args.scenario))
+    else:
+        trader = THSTrader(args.device, use_broker=not args.no_broker)
+    # 截图日志不计入操作耗时
+    trader.screen_log.mode = "off"
+
+    cases = build_cases(trader, args)
+    if args.cases:
+        names = [c.strip() for c in args.cases.split(",") if c.strip()]
+    else:
+        names = [c for c in DEFAULT_CASES if c in cases] + [c for c in cases if c not in DEFAULT_CASES]
+    unknown = [n for n in names if n not in cases]
+    if unknown:
+        parser.error(f"未知或缺少参数的用例: {', '.join(unknown)}")
+
+    tracer.start()
+    results = {}
+    for name in names:
+        print(f"▶ {name} x{args.runs}")
+        results[name] = run_case(name, cases[name], args.runs, args.verbose)
+
+    # 不同持仓规模各用一个回放场景
+    for spec in args.position_scenario:
+        size, _, directory = spec.partition("=")
+        with contextlib.redirect_stdout(io.StringIO()):
+            sized = THSTrader(device=FakeDevice(directory))
+        sized.screen_log.mode = "off"
+        name = f"get_position[{size}]"
+        print(f"▶ {name} x{args.runs}")
+        results[name] = run_case(name, lambda: sized.get_position(fresh=True), args.runs, args.verbose)
+    tracer.stop()
+
+    failed = print_report(results, budgets)
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                       "target": args.scenario or args.device,
+                       "runs": args.runs, "results": results, "budgets": budgets},
+                      f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json_out}")
+    if failed:
+        print(f"✗ 未通过: {', '.join(failed)}")
+        return 1
+    print("✓ 全部用例在预算内")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准
+在全新的 Python 进程中多次测量导入 ths 和运行 trader.py --help 的耗时，
+检查重依赖（uiautomator2、PIL、numpy、cnocr）没有被提前导入，
+并可把结果追加到历史文件中，与上一次记录对比
+
+使用示例:
+    python bench_startup.py
+    python bench_startup.py --runs 20 --record startup_history.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 导入时不应加载的模块
+HEAVY_MODULES = ("uiautomator2", "adbutils", "PIL", "numpy", "cnocr")
+
+# 名称 -> 在子进程中执行的代码
+IMPORT_CASES = {
+    "import ths": "import ths",
+    "import ths.config": "import ths.config",
+    "from ths import THSTrader": "from ths import THSTrader",
+}
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"elapsed": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(code, runs):
+    """
+    在子进程中测量导入耗时
+
+    Returns:
+        dict: {'median', 'min', 'max'} (毫秒) 和 'heavy'（被导入的重依赖）
+    """
+    samples = []
+    heavy = set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE.format(code=code, heavy=HEAVY_MODULES)],
+                             cwd=HERE, capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        samples.append(result["elapsed"] * 1000)
+        heavy.update(result["heavy"])
+    return _stats(samples, heavy=sorted(heavy))
+
+
+def measure_command(args, runs):
+    """测量整个命令（含解释器启动）的耗时"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=HERE, capture_output=True, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return _stats(samples)
+
+
+def _stats(samples, **extra):
+    return {
+        "median": round(statistics.median(samples), 2),
+        "min": round(min(samples), 2),
+        "max": round(max(samples), 2),
+        **extra,
+    }
+
+
+def last_record(path):
+    """历史文件中的最后一条记录"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='THSTrader 启动耗时基准')
+    parser.add_argument('--runs', '-n', type=int, default=10, help='每项测量次数 (默认: 10)')
+    parser.add_argument('--record', '-r', default=None, metavar='FILE',
+                        help='把结果追加到 JSON-lines 历史文件，并与上一条记录对比')
+    args = parser.parse_args()
+
+    sys.path.insert(0, HERE)
+    from ths import __version__
+
+    results = {name: measure_import(code, args.runs) for name, code in IMPORT_CASES.items()}
+    results["trader.py --help"] = measure_command(["trader.py", "--help"], args.runs)
+
+    previous = last_record(args.record)
+    print("\n" + "="*72)
+    print(f"启动耗时 (ths {__version__}, Python {platform.python_version()}, {args.runs} 次取中位数, 毫秒)")
+    print("="*72)
+    failed = False
+    for name, r in results.items():
+        line = f"  {name:28s} {r['median']:9.2f}  (min {r['min']:.2f}, max {r['max']:.2f})"
+        if previous and name in previous["results"]:
+            before = previous["results"][name]["median"]
+            line += f"  较上次 {r['median'] - before:+.2f}"
+        print(line)
+        if r.get("heavy"):
+            failed = True
+            print(f"    ✗ 提前导入了: {', '.join(r['heavy'])}")
+    print("="*72)
+    if previous:
+        print(f"上次记录: ths {previous['version']} @ {previous['time']}")
+
+    if args.record:
+        record = {
+            "version": __version__,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "runs": args.runs,
+            "results": results,
+        }
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"已记录: {args.record}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,19 @@
 """
 THSTrader - 新版同花顺自动化交易工具
+
+uiautomator2、PIL、numpy 和 cnocr 在第一次连接设备或识别时才导入，
+导入本包和读取配置不加载这些依赖
 """
 
-from .trader import THSTrader
 from .config import UI_ELEMENTS, COORDINATES, XPATHS
 
 __version__ = "2.0.0"
 __all__ = ['THSTrader', 'UI_ELEMENTS', 'COORDINATES', 'XPATHS']
+
+
+def __getattr__(name):
+    # 访问 THSTrader 时才导入 trader 模块
+    if name == 'THSTrader':
+        from .trader import THSTrader
+        return THSTrader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
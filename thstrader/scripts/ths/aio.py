@@ -0,0 +1,312 @@
+"""
+asyncio 接口
+AsyncDevice / AsyncTHSTrader 把阻塞的设备调用放到每台设备专用的工作线程中执行，
+等待（wait_exists、wait_stable 等）在事件循环中轮询，一个事件循环可以同时驱动多台模拟器和其他 I/O
+
+同一台设备的调用在同一个线程中依次执行；组合多个动作时用 ``async with device.lock`` 防止与
+AsyncTHSTrader 的操作交错
+
+示例:
+    async def main():
+        traders = await asyncio.gather(AsyncTHSTrader.create("127.0.0.1:5565"),
+                                       AsyncTHSTrader.create("127.0.0.1:5575"))
+        balances = await asyncio.gather(*(t.get_balance() for t in traders))
+        await traders[0].buy("002415", 100, 31.5)
+
+    asyncio.run(main())
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .config import ACTION_TIMEOUTS, WAIT_INTERVAL, STABLE_WINDOW, SNAPSHOT_MAX_AGE
+from .device import Device
+from .server import METHODS
+
+_executors = {}   # 序列号 -> 单线程执行器
+_locks = {}       # 序列号 -> (事件循环, asyncio.Lock)
+_registry_lock = threading.Lock()
+
+
+def device_executor(serial):
+    """
+    设备专用的单线程执行器，同一序列号共用一个
+
+    Args:
+        serial: 设备序列号
+
+    Returns:
+        ThreadPoolExecutor
+    """
+    with _registry_lock:
+        executor = _executors.get(serial)
+        if executor is None:
+            executor = _executors[serial] = ThreadPoolExecutor(max_workers=1,
+                                                               thread_name_prefix=f"ths-{serial}")
+        return executor
+
+
+def device_lock(serial):
+    """
+    设备在当前事件循环中的锁，同一序列号的 AsyncDevice 和 AsyncTHSTrader 共用
+
+    Args:
+        serial: 设备序列号
+
+    Returns:
+        asyncio.Lock
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        entry = _locks.get(serial)
+        if entry is None or entry[0] is not loop:
+            entry = _locks[serial] = (loop, asyncio.Lock())
+        return entry[1]
+
+
+class AsyncDevice:
+    """
+    Device 的 asyncio 版本
+
+    输入动作在设备线程中执行，动作后的等待在事件循环中轮询，取消任务时立即停止等待
+
+    示例:
+        device = await AsyncDevice.create("127.0.0.1:5565")
+        async with device.lock:
+            await device.click(360, 640, wait_for={'text': '买入'})
+            snap = await device.snapshot()
+    """
+
+    def __init__(self, device):
+        """
+        Args:
+            device: 已连接的 Device（或 ths.fake.FakeDevice）
+        """
+        self.device = device
+        self.serial = device.serial
+        self.executor = device_executor(device.serial)
+
+    @classmethod
+    async def create(cls, serial):
+        """在设备线程中连接设备"""
+        executor = device_executor(serial)
+        device = await asyncio.get_running_loop().run_in_executor(executor, Device, serial)
+        return cls(device)
+
+    @property
+    def lock(self):
+        """设备锁（当前事件循环）"""
+        return device_lock(self.serial)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        在设备线程中执行阻塞调用
+
+        任务被取消时已经开始的调用仍会在设备线程中执行完，后续调用排在它之后
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    # ==================== 输入动作 ====================
+
+    async def click(self, x, y, wait_for=None, timeout=None):
+        await self.run(self.device._click, x, y)
+        return await self.settle("click", wait_for, timeout)
+
+    async def click_element(self, wait_for=None, timeout=None, **selector):
+        await self.run(self.device._click_element, selector)
+        return await self.settle("click", wait_for, timeout)
+
+    async def click_xpath(self, xpath, long=False, wait_for=None, timeout=None):
+        await self.run(self.device._click_xpath, xpath, long)
+        return await self.settle("click", wait_for, timeout)
+
+    async def swipe(self, x1, y1, x2, y2, duration=0.5, wait_for=None, timeout=None):
+        await self.run(self.device._swipe, x1, y1, x2, y2, duration)
+        return await self.settle("swipe", wait_for, timeout)
+
+    async def press_key(self, key, wait_for=None, timeout=None):
+        await self.run(self.device._press_key, key)
+        return await self.settle("press_key", wait_for, timeout)
+
+    async def send_keys(self, text, wait_for=None, timeout=None):
+        await self.run(self.device._send_keys, text)
+        return await self.settle("send_keys", wait_for, timeout)
+
+    async def app_start(self, package, timeout=None):
+        await self.run(self.device._app_start, package)
+        if timeout is None:
+            timeout = ACTION_TIMEOUTS["app_start"]
+        return await self.wait_until(lambda: self.device.app_current() == package, timeout,
+                                     name="app_start")
+
+    async def app_stop(self, package, timeout=None):
+        await self.run(self.device._app_stop, package)
+        if timeout is None:
+            timeout = ACTION_TIMEOUTS["app_stop"]
+        return await self.wait_until(lambda: self.device.app_current() != package, timeout,
+                                     name="app_stop")
+
+    # ==================== 查询 ====================
+
+    async def screenshot(self, filename=None):
+        return await self.run(self.device.screenshot, filename)
+
+    async def snapshot(self, max_age=SNAPSHOT_MAX_AGE):
+        return await self.run(self.device.snapshot, max_age)
+
+    async def dump_hierarchy(self):
+        return await self.run(self.device.dump_hierarchy)
+
+    async def app_current(self):
+        return await self.run(self.device.app_current)
+
+    async def window_size(self):
+        return await self.run(self.device.window_size)
+
+    # ==================== 等待 ====================
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    async def settle(self, action="click", wait_for=None, timeout=None):
+        """与 Device.settle 相同，等待期间不占用事件循环和设备线程"""
+        if timeout is None:
+            timeout = ACTION_TIMEOUTS.get(action, ACTION_TIMEOUTS["click"])
+        if timeout <= 0:
+            return True
+        if wait_for:
+            return await self.wait_exists(timeout=timeout, **wait_for)
+        return await self.wait_stable(timeout=timeout)
+
+    async def wait_until(self, condition, timeout, interval=WAIT_INTERVAL, name="condition"):
+        """
+        轮询直到条件成立
+
+        Args:
+            condition: 无参函数（在设备线程中执行），抛出异常视为不成立
+            timeout: 最长等待秒数
+            interval: 轮询间隔
+            name: 记录到 Device.wait_history 的名称
+
+        Returns:
+            bool: 超时前条件是否成立
+        """
+        start = time.time()
+        while True:
+            try:
+                ok = bool(await self.run(condition))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                ok = False
+            if ok or time.time() - start >= timeout:
+                break
+            await asyncio.sleep(interval)
+        self.device._record_wait(name, start, ok, timeout)
+        return ok
+
+    async def wait_exists(self, timeout, **selector):
+        """等待匹配选择器的控件出现"""
+        return await self.wait_until(lambda: self.device.snapshot(max_age=0).exists(**selector),
+                                     timeout, name=f"exists {selector}")
+
+    async def wait_gone(self, timeout, **selector):
+        """等待匹配选择器的控件消失"""
+        return await self.wait_until(lambda: not self.device.snapshot(max_age=0).exists(**selector),
+                                     timeout, name=f"gone {selector}")
+
+    async def wait_stable(self, timeout, interval=WAIT_INTERVAL, window=STABLE_WINDOW):
+        """等待界面层级不再变化"""
+        return await self._wait_digest_stable(self.device._hierarchy_digest, timeout, interval,
+                                              window, "hierarchy_stable")
+
+    async def wait_screen_stable(self, timeout, interval=WAIT_INTERVAL, window=STABLE_WINDOW):
+        """等待屏幕内容不再变化"""
+        return await self._wait_digest_stable(self.device._screen_digest, timeout, interval,
+                                              window, "screen_stable")
+
+    async def _wait_digest_stable(self, digest_func, timeout, interval, window, name):
+        state = {'digest': None, 'since': None}
+
+        def unchanged():
+            digest = digest_func()
+            now = time.time()
+            if digest != state['digest']:
+                state['digest'] = digest
+                state['since'] = now
+                return False
+            return now - state['since'] >= window
+
+        return await self.wait_until(unchanged, timeout, interval, name=name)
+
+
+class AsyncTHSTrader:
+    """
+    THSTrader 的 asyncio 版本
+
+    每个交易方法在持有设备锁时放到设备线程中执行，方法名、参数和返回值与 THSTrader 相同
+    （见 server.METHODS）；操作中的导航、输入和等待都在设备线程里完成，不阻塞事件循环
+    """
+
+    def __init__(self, trader):
+        """
+        Args:
+            trader: 已初始化的 THSTrader
+        """
+        self.trader = trader
+        self.device = AsyncDevice(trader.device)
+
+    @classmethod
+    async def create(cls, serial="127.0.0.1:5565", use_broker=True, device=None):
+        """
+        在设备线程中创建 THSTrader（连接设备、检测分辨率）
+
+        Args:
+            serial: 设备序列号
+            use_broker: 同 THSTrader
+            device: 同 THSTrader，传入时使用其序列号
+        """
+        from .trader import THSTrader
+        executor = device_executor(device.serial if device is not None else serial)
+        trader = await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(THSTrader, serial, use_broker=use_broker, device=device))
+        return cls(trader)
+
+    @property
+    def serial(self):
+        return self.trader.serial
+
+    @property
+    def ledger(self):
+        return self.trader.ledger
+
+    @property
+    def cache(self):
+        return self.trader.cache
+
+    async def call(self, method, *args, **kwargs):
+        """
+        持有设备锁执行 THSTrader 的方法
+
+        Args:
+            method: 方法名
+            *args, **kwargs: 方法参数
+        """
+        async with self.device.lock:
+            return await self.device.run(getattr(self.trader, method), *args, **kwargs)
+
+
+def _async_method(name):
+    async def method(self, *args, **kwargs):
+        return await self.call(name, *args, **kwargs)
+    method.__name__ = name
+    method.__qualname__ = f"AsyncTHSTrader.{name}"
+    method.__doc__ = f"THSTrader.{name} 的 asyncio 版本"
+    return method
+
+
+for _name in METHODS:
+    setattr(AsyncTHSTrader, _name, _async_method(_name))
+del _name
@@ -0,0 +1,328 @@
+"""
+本地设备代理（broker）
+常驻进程为每个设备序列号保持一个已连接的 Device，
+CLI 和脚本通过本地 socket 附着，省去每次 u2 连接和 atx-agent 握手的开销
+
+协议（JSON-lines，每行一个请求/响应）:
+    {"op": "attach", "serial": "127.0.0.1:5565"}       -> {"ok": true, "handle": 1}
+    {"op": "getattr", "handle": 1, "name": "d"}          -> {"ok": true, "handle": 2}
+    {"op": "call", "handle": 2, "args": [], "kwargs": {"text": "交易"}}
+    {"op": "bool" | "iter" | "len", "handle": 3}
+    请求可携带 "release": [句柄...] 释放不再使用的对象
+    可序列化的结果以 {"ok": true, "value": ...} 返回，其余对象留在代理端并返回句柄
+
+只转发 Device / THSTrader 用到的 uiautomator2 接口（ALLOWED_ATTRIBUTES），
+shell 只接受输入框输入用的 input keyevent / input text 命令
+"""
+import itertools
+import re
+import socketserver
+import threading
+from collections import deque
+from .config import BROKER_ADDRESS, BROKER_CONNECT_TIMEOUT, BROKER_REQUEST_TIMEOUT
+from .device import Device
+from .rpc import (encode_value, decode_value, send_message, recv_message,
+                  JsonLineServer, JsonLineClient)
+
+
+# 允许访问的属性: Device 的 d，uiautomator2 设备、选择器（d(...)）和 XPath 对象上用到的方法
+ALLOWED_ATTRIBUTES = frozenset({
+    "d",
+    # uiautomator2 Device
+    "click", "long_click", "swipe", "press", "send_keys", "shell", "screenshot", "dump_hierarchy",
+    "app_current", "app_start", "app_stop", "window_size", "xpath",
+    # UiObject / XPathSelector
+    "exists", "wait", "wait_gone", "get_text", "set_text", "clear_text", "info", "count",
+    "bounds", "center",
+})
+# THSTrader._input_by_keycombo 的命令: input keyevent KEYCODE_... && input text <价格/数量/代码>
+_SHELL_COMMAND = re.compile(r"input keyevent KEYCODE_\w+( KEYCODE_\w+)* && input text [\w.\-]+")
+
+
+def _check_call(name, args, kwargs):
+    """
+    检查对某个属性的调用是否允许
+
+    Raises:
+        PermissionError: 不允许的参数（任意 shell 命令、截图写入代理端文件）
+    """
+    if name == "shell":
+        command = args[0] if args else kwargs.get("cmdargs")
+        if len(args) > 1 or set(kwargs) - {"cmdargs"} or not isinstance(command, str) \
+                or not _SHELL_COMMAND.fullmatch(command):
+            raise PermissionError(f"不允许的 shell 命令: {command!r}")
+    elif name == "screenshot" and (args or kwargs):
+        raise PermissionError("截图不允许参数（不在代理端写文件）")
+
+
+class DeviceBroker:
+    """
+    设备代理服务端
+
+    每个序列号只连接一次，同一设备上的请求串行执行
+    """
+
+    def __init__(self, address=BROKER_ADDRESS):
+        """
+        Args:
+            address: 监听地址 (host, port)，默认仅本机
+        """
+        self.address = address
+        self._devices = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def get_device(self, serial):
+        """获取（必要时连接）序列号对应的 Device"""
+        with self._lock:
+            if serial not in self._devices:
+                self._devices[serial] = Device(serial)
+                self._locks[serial] = threading.RLock()
+            return self._devices[serial], self._locks[serial]
+
+    def serve_forever(self, serials=()):
+        """
+        启动代理并阻塞
+
+        Args:
+            serials: 启动时预先连接的设备序列号
+        """
+        for serial in serials:
+            self.get_device(serial)
+
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                _BrokerSession(broker, self.rfile, self.wfile).run()
+
+        self._server = JsonLineServer(self.address, Handler)
+        print(f"✓ 设备代理已启动: {self.address[0]}:{self.address[1]}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def shutdown(self):
+        """停止代理"""
+        if self._server:
+            self._server.shutdown()
+
+
+class _BrokerSession:
+    """单个客户端连接：维护该连接的对象句柄表"""
+
+    def __init__(self, broker, rfile, wfile):
+        self.broker = broker
+        self.rfile = rfile
+        self.wfile = wfile
+        self.handles = {}
+        self.names = {}  # 句柄 -> 取得该对象的属性名，用于检查调用参数
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+
+    def run(self):
+        while True:
+            try:
+                message = recv_message(self.rfile)
+            except (ConnectionError, ValueError):
+                break
+            if message is None:
+                break
+            if not isinstance(message, dict):
+                # 仍按一问一答回复，连接保持可用
+                response = {"ok": False, "error": "无效请求: 不是 JSON 对象"}
+            else:
+                for handle in message.get("release", ()):
+                    self.handles.pop(handle, None)
+                    self.names.pop(handle, None)
+                try:
+                    with self.lock:
+                        response = self.dispatch(message)
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            try:
+                send_message(self.wfile, response)
+            except (ConnectionError, OSError):
+                break
+        self.handles.clear()
+        self.names.clear()
+
+    def dispatch(self, message):
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True, "value": "pong"}
+        if op == "attach":
+            device, lock = self.broker.get_device(message["serial"])
+            self.lock = lock
+            return self._wrap(device)
+
+        obj = self.handles[message["handle"]]
+        if op == "getattr":
+            name = message["name"]
+            if name not in ALLOWED_ATTRIBUTES:
+                raise AttributeError(f"代理不转发该属性: {name}")
+            return self._wrap(getattr(obj, name), name)
+        if op == "call":
+            args = decode_value(message.get("args", []))
+            kwargs = decode_value(message.get("kwargs", {}))
+            _check_call(self.names.get(message["handle"]), args, kwargs)
+            return self._wrap(obj(*args, **kwargs))
+        if op == "bool":
+            return {"ok": True, "value": bool(obj)}
+        if op == "len":
+            return {"ok": True, "value": len(obj)}
+        if op == "iter":
+            return {"ok": True, "items": [self._wrap(item) for item in obj]}
+        raise ValueError(f"未知操作: {op}")
+
+    def _wrap(self, value, name=None):
+        try:
+            return {"ok": True, "value": encode_value(value)}
+        except TypeError:
+            handle = next(self._ids)
+            self.handles[handle] = value
+            self.names[handle] = name
+            return {"ok": True, "handle": handle}
+
+
+class RemoteError(Exception):
+    """代理端执行出错"""
+
+
+class RemoteObject:
+    """代理端对象的本地替身，属性访问和调用都会转发到代理"""
+
+    def __init__(self, client, handle):
+        self._client = client
+        self._handle = handle
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._client.invoke({"op": "getattr", "handle": self._handle, "name": name})
+
+    def __call__(self, *args, **kwargs):
+        return self._client.invoke({"op": "call", "handle": self._handle,
+                                    "args": encode_value(args), "kwargs": encode_value(kwargs)})
+
+    def __bool__(self):
+        return self._client.invoke({"op": "bool", "handle": self._handle})
+
+    def __len__(self):
+        return self._client.invoke({"op": "len", "handle": self._handle})
+
+    def __iter__(self):
+        return iter(self._client.invoke({"op": "iter", "handle": self._handle}))
+
+    def __del__(self):
+        # 不能在析构中直接发请求（可能打断正在进行的请求），留到下一次请求时释放
+        try:
+            self._client.release(self._handle)
+        except Exception:
+            pass
+
+
+class BrokerClient:
+    """到设备代理的连接"""
+
+    def __init__(self, address=BROKER_ADDRESS, connect_timeout=BROKER_CONNECT_TIMEOUT,
+                 timeout=BROKER_REQUEST_TIMEOUT):
+        """
+        Args:
+            address: 代理地址
+            connect_timeout: 连接和握手（ping）超时（秒）
+            timeout: 单个请求的超时（秒）
+
+        Raises:
+            OSError: 代理未启动，或端口上的服务没有按代理协议应答
+        """
+        self._conn = JsonLineClient(address, connect_timeout, timeout=connect_timeout)
+        self._released = deque()
+        try:
+            pong = self._conn.request({"op": "ping"})
+        except ValueError as e:
+            self.close()
+            raise ConnectionError(f"{address[0]}:{address[1]} 不是设备代理: {e}")
+        if pong.get("value") != "pong":
+            self.close()
+            raise ConnectionError(f"{address[0]}:{address[1]} 不是设备代理: {pong!r}")
+        self._conn.settimeout(timeout)
+
+    def invoke(self, message):
+        """发送请求，返回值或 RemoteObject"""
+        if self._released:
+            message["release"] = [self._released.popleft() for _ in range(len(self._released))]
+        response = self._conn.request(message)
+        return self._unwrap(response)
+
+    def release(self, handle):
+        self._released.append(handle)
+
+    def close(self):
+        self._conn.close()
+
+    def _unwrap(self, response):
+        if not response.get("ok"):
+            raise RemoteError(response.get("error", "未知错误"))
+        if "items" in response:
+            return [self._unwrap(item) for item in response["items"]]
+        if "handle" in response:
+            return RemoteObject(self, response["handle"])
+        return decode_value(response.get("value"))
+
+
+class RemoteDevice(Device):
+    """
+    通过代理使用的 Device，接口与 Device 相同
+
+    等待、重试等逻辑仍在本地执行，只有 uiautomator2 调用经由代理转发
+    """
+
+    def __init__(self, serial, client):
+        """
+        Args:
+            serial: 设备序列号
+            client: BrokerClient
+        """
+        self._client = client
+        super().__init__(serial)
+
+    def _connect(self):
+        """附着到代理端已连接的设备，替代 u2.connect"""
+        remote = self._client.invoke({"op": "attach", "serial": self.serial})
+        self._device = remote.d
+
+    def close(self):
+        """断开与代理的连接（代理端设备保持连接）"""
+        self._client.close()
+
+
+def attach(serial, address=BROKER_ADDRESS):
+    """
+    附着到本地设备代理
+
+    Args:
+        serial: 设备序列号
+        address: 代理地址
+
+    Returns:
+        RemoteDevice: 代理未启动或无响应时返回 None
+    """
+    try:
+        client = BrokerClient(address)
+    except OSError:
+        return None
+    try:
+        device = RemoteDevice(serial, client)
+    except OSError as e:
+        # 代理无响应或连接断开，改为直连
+        client.close()
+        print(f"⚠️ 设备代理无响应，直接连接: {e}")
+        return None
+    except Exception:
+        client.close()
+        raise
+    print(f"✓ 已通过设备代理连接: {serial}")
+    return device
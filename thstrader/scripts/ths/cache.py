@@ -0,0 +1,89 @@
+"""
+账户数据缓存
+余额、持仓、可撤单列表每次读取都要导航、翻页和识别，ReadCache 在有效期内直接返回上一次的结果；
+下单、撤单后由 THSTrader 清除，读取时也可以用 fresh=True 跳过缓存
+"""
+import copy
+import threading
+import time
+from .config import CACHE_TTL
+
+
+class ReadCache:
+    """
+    带有效期的读穿缓存
+
+    示例:
+        cache = ReadCache({"balance": 5})
+        cache.get("balance", read_balance)              # 读取并缓存
+        cache.get("balance", read_balance)              # 5 秒内直接返回
+        cache.get("balance", read_balance, fresh=True)  # 重新读取
+        cache.invalidate()                              # 交易后清除全部
+    """
+
+    def __init__(self, ttl=None):
+        """
+        Args:
+            ttl: {键: 有效期（秒）}，默认 CACHE_TTL；未列出或为 0 的键不缓存
+        """
+        self.ttl = dict(CACHE_TTL if ttl is None else ttl)
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}   # 键 -> (读取时间, 结果)
+        self._generation = 0   # 每次清除加一，用于丢弃清除前开始的读取
+        self._lock = threading.Lock()
+
+    def get(self, key, loader, fresh=False):
+        """
+        读取缓存，过期或不存在时调用 loader 并缓存结果
+
+        Args:
+            key: 缓存键
+            loader: 无参函数，返回要缓存的结果
+            fresh: 跳过缓存，重新读取并更新缓存
+
+        Returns:
+            loader 的结果（副本，调用方修改不影响缓存）
+        """
+        ttl = self.ttl.get(key, 0)
+        if ttl > 0 and not fresh:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry[0]
+                if age < ttl:
+                    self.hits += 1
+                    print(f"✓ 使用缓存（{age:.1f}s 前读取）")
+                    return copy.deepcopy(entry[1])
+
+        self.misses += 1
+        with self._lock:
+            generation = self._generation
+        start = time.monotonic()
+        value = loader()
+        if ttl > 0:
+            with self._lock:
+                # 读取期间发生过交易，结果可能已经过时，不缓存
+                if generation == self._generation:
+                    self._entries[key] = (start, value)
+        return copy.deepcopy(value)
+
+    def age(self, key):
+        """缓存结果的已存在时间（秒），没有缓存时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else time.monotonic() - entry[0]
+
+    def invalidate(self, *keys):
+        """
+        清除缓存
+
+        Args:
+            keys: 要清除的键，不传时清除全部
+        """
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._entries.clear()
+            for key in keys:
+                self._entries.pop(key, None)
@@ -3,6 +3,7 @@ THSTrader 配置文件
 新版同花顺（11.46.04）UI 元素定位配置
 设备分辨率: 720x1280, 240dpi
 """
+import os
 
 # UI 元素 Resource IDs
 UI_ELEMENTS = {
@@ -25,6 +26,7 @@ UI_ELEMENTS = {
     # 搜索结果
     "recyclerView": "com.hexin.plat.android:id/recyclerView",  # 搜索结果列表
     "stockname_tv": "com.hexin.plat.android:id/stockname_tv",  # 股票名称
+    "search_edit": "com.hexin.plat.android:id/search_edit",  # 搜索输入框
 
     # 确认对话框
     "ok_btn": "com.hexin.plat.android:id/ok_btn",  # 确定按钮
@@ -57,15 +59,22 @@ UI_ELEMENTS = {
     "stock_code": "com.hexin.plat.android:id/stock_code",  # 股票代码
 }
 
-# 坐标位置（720x1280分辨率）
+# 坐标位置（720x1280分辨率，其他分辨率由 ths.geometry 换算）
 COORDINATES = {
     "trading_tab": (420, 1210),  # 底部"交易"标签位置
+    "favorites_tab": (72, 1210),  # 底部"自选"标签位置（假设在底部左侧第一个位置）
+    "search_box": (360, 100),  # 顶部搜索框
     "buy_button": (72, 610),  # 买入按钮位置（左侧圆形按钮）
     "sell_button": (216, 610),  # 卖出按钮位置
     "holdings_button": (360, 610),  # 持仓按钮位置
     "withdrawal_button": (504, 610),  # 撤单按钮位置
 }
 
+# 滑动手势 (起点, 终点)（720x1280分辨率）
+SWIPES = {
+    "reveal_capital": ((340, 600), (340, 1000)),  # 持仓页下拉显示资产信息
+}
+
 # XPath 路径
 XPATHS = {
     "trading_tab": '//*[@content-desc="交易"]/android.widget.ImageView[1]',
@@ -92,8 +101,160 @@ OCR_CROP_AREAS = {
     }
 }
 
+# 列表行字段的子控件 ID（优先从界面层级读取，读不到再 OCR）
+# 未配置 ID 的字段按 OCR_CROP_AREAS 区域匹配行内的文本控件
+ROW_FIELD_IDS = {
+    "holding": {},
+    "withdrawal": {},
+}
+
 # 默认参数
-DEFAULT_WAIT = 2  # 默认等待时间（秒）
+DEFAULT_WAIT = 2  # 默认等待上限（秒），条件满足即提前返回
 MAX_RETRY = 3  # 最大重试次数
 MAX_HOLDINGS = 1000  # 最大持仓数量
 INPUT_CLEAR_COUNT = 20  # 输入框清空按键次数
+INPUT_VERIFY_TIMEOUT = 0.5  # 每种输入方式的结果校验等待上限（秒）
+OCR_BATCH_SIZE = 32  # 批量单行识别每批图片数
+
+# 等待引擎（Device.wait_*）
+ACTION_TIMEOUTS = {
+    "click": 1.0,  # 点击后等待界面稳定的上限（秒）
+    "swipe": 1.0,
+    "press_key": 1.0,
+    "send_keys": 0.5,
+    "app_start": 5.0,  # 等待应用到前台
+    "app_stop": 2.0,  # 等待应用退出前台
+}
+WAIT_INTERVAL = 0.1  # 条件轮询间隔（秒）
+STABLE_WINDOW = 0.3  # 层级/画面保持不变多久视为稳定（秒）
+WAIT_HISTORY_SIZE = 200  # 保留的等待记录条数
+
+# 本地设备代理（trader.py broker）
+BROKER_ADDRESS = ("127.0.0.1", 18765)  # 仅监听本机
+BROKER_CONNECT_TIMEOUT = 0.3  # 代理未启动或端口上不是代理时快速回退到直连（秒），连接后的握手也用该超时
+BROKER_REQUEST_TIMEOUT = 60.0  # 代理转发的单个 uiautomator2 调用最长等待（秒），超时断开连接
+
+# 常驻服务（trader.py serve --listen）
+SERVE_ADDRESS = ("127.0.0.1", 18766)
+# 端口模式下交易类请求（下单、撤单、自选股增删、shutdown）必须携带的令牌 {"token": ...}；
+# 未设置时启动服务时随机生成并打印
+SERVE_TOKEN = os.environ.get("THSTRADER_TOKEN")
+
+# OCR 工作进程（trader.py ocr-server），同一台机器上的多个 THSTrader 进程共享一份模型
+OCR_ADDRESS = ("127.0.0.1", 18767)
+OCR_CONNECT_TIMEOUT = 0.3  # 工作进程未启动或端口上不是工作进程时快速回退到进程内模型（秒），连接后的握手也用该超时
+OCR_REQUEST_TIMEOUT = 60.0  # 单次识别请求最长等待（秒），超时断开并改用进程内模型
+
+# 多设备调度（TraderFarm）
+FARM_HEALTH_INTERVAL = 30  # 空闲设备健康检查间隔（秒）
+FARM_MAX_ATTEMPTS = 2  # 任务最多在几台设备上尝试（含首次）
+
+# 层级快照缓存（Device.snapshot）
+SNAPSHOT_MAX_AGE = 1.0  # 无输入动作时快照最长复用时间（秒）
+
+# 弹窗规则（THSTrader._close_dialogs），按优先级排列，一次层级转储内全部匹配
+# match: 弹窗特征，一个选择器或选择器列表（全部存在才算命中）
+# dismiss: 要点击的控件，省略时点击 match 中第一个选择器命中的控件
+# action: "click"（默认）或 "back"（按返回键）
+DIALOG_RULES = [
+    *({"name": f"弹窗文本:{t}", "match": {"text": t}}
+      for t in ["等待", "关闭", "以后再说", "我知道了", "不再提醒", "确定", "取消", "跳过"]),
+    *({"name": f"关闭图标:{d}", "match": {"description": d}}
+      for d in ["关闭", "close", "取消"]),
+    {"name": "关闭按钮", "match": {"resourceId": UI_ELEMENTS["close_btn"]}},
+    # 常见广告关闭按钮
+    *({"name": f"广告关闭:{rid.rsplit('/', 1)[-1]}", "match": {"resourceId": rid}}
+      for rid in [
+          "com.hexin.plat.android:id/iv_close",
+          "com.hexin.plat.android:id/img_close",
+          "com.hexin.plat.android:id/close_img",
+          "com.hexin.plat.android:id/dialog_close",
+          "com.hexin.plat.android:id/btn_close",
+          "com.hexin.plat.android:id/close",
+      ]),
+]
+DIALOG_MAX_ROUNDS = 5  # 叠加弹窗最多连续关闭几层
+
+# 列表采集（RecyclerHarvester）
+HARVEST_OVERLAP = 0.25  # 相邻两页重叠比例，避免漏掉翻页边界上的行
+HARVEST_SWIPE_DURATION = 0.5  # 翻页滑动时长（秒），慢速滑动避免惯性滚动
+
+# 文字定位（TextLocator，用于 _ocr_click）
+# 各文字通常所在的屏幕区域 (x1, y1, x2, y2)，先在区域内识别，找不到再全屏识别
+OCR_SEARCH_REGIONS = {
+    "交易": [(0, 1130, 720, 1280)],  # 底部导航栏
+    "模拟": [(0, 40, 720, 400)],  # 交易页顶部标签
+    "模拟炒股": [(0, 40, 720, 400)],
+}
+OCR_LOCATE_INTERVAL = 0.3  # 未找到时重新截图的间隔（秒）
+OCR_CACHE_PADDING = 8  # 校验上次位置时向外扩展的像素
+
+# 页面特征（ths.pages.classify），按优先级排列，第一个满足的即为当前页面
+# all: 必须全部存在；any: 至少存在一个；none: 必须都不存在
+PAGE_SIGNATURES = [
+    {"state": "withdrawals", "all": [{"resourceId": UI_ELEMENTS["chedan_recycler_view"]}]},
+    {"state": "holdings", "any": [{"resourceId": UI_ELEMENTS["recyclerview_id"]},
+                                 {"resourceId": UI_ELEMENTS["capital_cell_value"]}]},
+    # 买入/卖出表单控件相同，由 PageNavigator 根据进入时点的按钮区分
+    {"state": "trade_form", "all": [{"resourceId": UI_ELEMENTS["stockprice"]}]},
+    {"state": "moni", "any": [{"resourceId": UI_ELEMENTS["menu_buy_image"]}, {"text": "模拟练习区"}]},
+    {"state": "trade_tab", "all": [{"resourceId": UI_ELEMENTS["tab_moni"]}]},
+    {"state": "favorites", "any": [{"resourceId": UI_ELEMENTS["optional_list"]}]},
+    {"state": "home", "any": [{"description": "交易"}, {"text": "交易"}]},
+]
+PAGE_MAX_STEPS = 8  # 一次跳转最多执行的动作数
+PAGE_BACK_LIMIT = 3  # 应用内无法识别的页面（如个股详情）最多按几次返回键，仍无法识别时重启应用
+
+# 耗时追踪（ths.trace，trader.py --trace）
+TRACE_FILE = "thstrader_trace.jsonl"  # --trace 不指定文件时的默认输出
+
+# 截图日志（ths.screenlog.ScreenLogger，THSTrader._log_screen）
+SCREEN_LOG_DIR = "screen_logs"  # 截图目录
+SCREEN_LOG_FORMAT = "JPEG"  # JPEG / WEBP / PNG
+SCREEN_LOG_QUALITY = 70  # JPEG/WebP 压缩质量
+SCREEN_LOG_MAX_FILES = 200  # 目录中最多保留的截图数，超出删除最旧的
+SCREEN_LOG_QUEUE_SIZE = 16  # 待写入截图队列长度，满了丢弃而不阻塞交易
+SCREEN_LOG_MODE = "all"  # all: 全部；every: 每 SCREEN_LOG_EVERY 笔委托一笔；failure: 只记录失败；off: 关闭
+SCREEN_LOG_EVERY = 10
+# 未记录的截图在内存中保留最近几张，发生失败时与失败截图一起写入（0 关闭，"failure" 模式下不再额外截图）
+SCREEN_LOG_CONTEXT = 3
+# 后台识别截图全文并打印；识别与交易路径共用 OCR 模型，会拖慢下单时的识别，默认关闭
+SCREEN_LOG_DESCRIBE = False
+
+# 基准测试（bench.py）延迟预算: {用例: p95 上限（秒）}，按实机设定；
+# get_position[200] 这类带规模的用例找不到时使用不带后缀的预算
+BENCH_BUDGETS = {
+    "get_balance": 8.0,
+    "get_position": 15.0,
+    "buy": 20.0,
+    "sell": 20.0,
+    "withdraw": 10.0,
+    "get_favorite_code": 10.0,
+    "favorite_roundtrip": 20.0,
+    "ocr_full": 3.0,
+    "ocr_lines": 1.0,
+}
+
+# 分辨率适配（ths.geometry）
+# COORDINATES、SWIPES、OCR_SEARCH_REGIONS 和 OCR_CROP_AREAS 按 GEOMETRY_BASE_SIZE 录制，
+# 其他分辨率按宽度比例换算（界面按 dp 布局，dp 与宽度成比例）；
+# 贴底部的控件按到屏幕底部的距离换算，适应不同长宽比
+GEOMETRY_BASE_SIZE = (720, 1280)
+GEOMETRY_BOTTOM_ANCHORED = {"trading_tab", "favorites_tab", "交易"}  # 坐标名 / OCR_SEARCH_REGIONS 的文字
+# 个别分辨率换算不准时直接给出实测值: {"1080x2340": {"coordinates": {...}, "swipes": {...},
+#   "regions": {...}, "crop_areas": {...}}}，未列出的项仍按比例换算
+GEOMETRY_PROFILES = {}
+
+# 账户数据缓存（ths.cache）: {键: 有效期（秒）}，0 表示不缓存
+# 下单、撤单后自动清除；读取时传 fresh=True 跳过缓存
+CACHE_TTL = {
+    "balance": 5.0,
+    "position": 5.0,
+    "withdrawals": 3.0,
+}
+
+# 本地持仓账本（ths.ledger）
+LEDGER_MAX_AGE = 300.0  # get_ledger_position 距上次核对超过该秒数时重新读取界面核对，None 表示只在需要时核对
+LEDGER_CASH_TOLERANCE = 50.0  # 核对可用资金时允许的误差（元），账本不计手续费
+
+CANCEL_CONFIRM_TIMEOUT = 2.0  # 撤单后等待该行从撤单列表消失的时间（秒），超时视为未确认
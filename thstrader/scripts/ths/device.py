@@ -0,0 +1,514 @@
+"""
+Device connection management for THS Trader
+Simplified version inspired by mobileas architecture
+"""
+import time
+import hashlib
+from collections import deque
+from functools import wraps
+from .config import ACTION_TIMEOUTS, WAIT_INTERVAL, STABLE_WINDOW, WAIT_HISTORY_SIZE, SNAPSHOT_MAX_AGE
+from .hierarchy import Snapshot
+
+
+# uiautomator2 (and its adbutils/requests stack) is imported on first connection,
+# so importing ths stays cheap for --help and config checks
+_u2 = None
+_original_parse = None
+
+
+def _patched_parse(version):
+    """Parse version, treating 'null' as '0.0.0'"""
+    if not version or version == 'null' or version.strip() == '':
+        version = '0.0.0'
+    return _original_parse(version)
+
+
+def _uiautomator2():
+    """Import uiautomator2 once, patching the version parser first (versionName may be "null")"""
+    global _u2, _original_parse
+    if _u2 is None:
+        import packaging.version
+        if packaging.version.parse is not _patched_parse:
+            _original_parse = packaging.version.parse
+            packaging.version.parse = _patched_parse
+        import uiautomator2
+        _u2 = uiautomator2
+    return _u2
+
+
+def retry(max_tries=3):
+    """Retry decorator with exponential backoff"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            last_exception = None
+            for attempt in range(max_tries):
+                try:
+                    return func(self, *args, **kwargs)
+                except Exception as e:
+                    last_exception = e
+                    if attempt < max_tries - 1:
+                        wait_time = 2 ** attempt  # exponential backoff
+                        print(f"Attempt {attempt + 1} failed: {e}, retrying in {wait_time}s...")
+                        time.sleep(wait_time)
+                    else:
+                        print(f"All {max_tries} attempts failed")
+            raise last_exception
+        return wrapper
+    return decorator
+
+
+class Device:
+    """
+    Device connection wrapper for uiautomator2
+    Handles connection initialization and provides basic operations
+
+    Input actions do not sleep for a fixed time. After each action the device
+    settles: it waits for an explicit target selector (``wait_for``) or, by
+    default, for the view hierarchy to stop changing, bounded by a per-action
+    timeout from ACTION_TIMEOUTS.
+
+    snapshot() answers exists/bounds/text queries from one cached hierarchy
+    dump. Every input action invalidates the cache, and hierarchy polls made
+    while settling refill it, so a snapshot right after an action is usually free.
+    """
+    def __init__(self, serial):
+        """
+        Args:
+            serial (str): Device serial like "127.0.0.1:5565"
+        """
+        self.serial = serial
+        self._device = None
+        self.wait_history = deque(maxlen=WAIT_HISTORY_SIZE)
+        self.last_wait = None
+        self._xml = None
+        self._xml_time = 0
+        self._snapshot = None
+        self._connect()
+
+    def _connect(self):
+        """Initialize uiautomator2 connection"""
+        print(f"Connecting to device: {self.serial}")
+        u2 = _uiautomator2()
+
+        # Use connect_usb for emulator/localhost connections
+        # This is more stable than plain connect()
+        if self.serial.startswith('emulator-') or self.serial.startswith('127.0.0.1:'):
+            self._device = u2.connect_usb(self.serial)
+        else:
+            self._device = u2.connect(self.serial)
+
+        # Set long timeout to keep connection alive (7 days)
+        # self._device.set_new_command_timeout(604800)
+
+        print(f"Connected to device: {self.serial}")
+        # print(f"ATX Agent URL: {self._device._get_atx_agent_url()}")
+
+    @property
+    def d(self):
+        """Get uiautomator2 device instance"""
+        return self._device
+
+    @retry(max_tries=3)
+    def screenshot(self, filename=None):
+        """
+        Take a screenshot
+
+        Args:
+            filename (str, optional): File path to save screenshot
+
+        Returns:
+            PIL.Image: Screenshot image
+        """
+        img = self._device.screenshot()
+        if filename:
+            img.save(filename)
+        return img
+
+    @retry(max_tries=3)
+    def _click(self, x, y):
+        self._device.click(x, y)
+        self.invalidate()
+
+    def click(self, x, y, wait_for=None, timeout=None):
+        """
+        Click at coordinates
+
+        Args:
+            x (int): X coordinate
+            y (int): Y coordinate
+            wait_for (dict, optional): Selector expected to appear afterwards
+            timeout (float, optional): Settle timeout, defaults to ACTION_TIMEOUTS
+        """
+        self._click(x, y)
+        return self.settle("click", wait_for, timeout)
+
+    @retry(max_tries=3)
+    def _click_element(self, selector):
+        self._device(**selector).click()
+        self.invalidate()
+
+    def click_element(self, wait_for=None, timeout=None, **selector):
+        """
+        Click the UI element matching a selector
+
+        Args:
+            wait_for (dict, optional): Selector expected to appear afterwards
+            timeout (float, optional): Settle timeout, defaults to ACTION_TIMEOUTS
+            **selector: uiautomator2 selector, e.g. resourceId=..., text=...
+        """
+        self._click_element(selector)
+        return self.settle("click", wait_for, timeout)
+
+    @retry(max_tries=3)
+    def _click_xpath(self, xpath, long):
+        element = self._device.xpath(xpath)
+        if long:
+            element.long_click()
+        else:
+            element.click()
+        self.invalidate()
+
+    def click_xpath(self, xpath, long=False, wait_for=None, timeout=None):
+        """
+        Click the UI element matching an XPath
+
+        Args:
+            xpath (str): uiautomator2 XPath
+            long (bool): Long click instead of click
+            wait_for (dict, optional): Selector expected to appear afterwards
+            timeout (float, optional): Settle timeout, defaults to ACTION_TIMEOUTS
+        """
+        self._click_xpath(xpath, long)
+        return self.settle("click", wait_for, timeout)
+
+    @retry(max_tries=3)
+    def _swipe(self, x1, y1, x2, y2, duration):
+        self._device.swipe(x1, y1, x2, y2, duration=duration)
+        self.invalidate()
+
+    def swipe(self, x1, y1, x2, y2, duration=0.5, wait_for=None, timeout=None):
+        """
+        Swipe from (x1, y1) to (x2, y2)
+
+        Args:
+            x1, y1: Start coordinates
+            x2, y2: End coordinates
+            duration (float): Swipe duration in seconds
+            wait_for (dict, optional): Selector expected to appear afterwards
+            timeout (float, optional): Settle timeout, defaults to ACTION_TIMEOUTS
+        """
+        self._swipe(x1, y1, x2, y2, duration)
+        return self.settle("swipe", wait_for, timeout)
+
+    @retry(max_tries=3)
+    def _press_key(self, key):
+        self._device.press(key)
+        self.invalidate()
+
+    def press_key(self, key, wait_for=None, timeout=None):
+        """
+        Press a key
+
+        Args:
+            key (str): Key name like 'back', 'home', 'enter'
+            wait_for (dict, optional): Selector expected to appear afterwards
+            timeout (float, optional): Settle timeout, defaults to ACTION_TIMEOUTS
+        """
+        self._press_key(key)
+        return self.settle("press_key", wait_for, timeout)
+
+    @retry(max_tries=3)
+    def _send_keys(self, text):
+        self._device.send_keys(text)
+        self.invalidate()
+
+    def send_keys(self, text, wait_for=None, timeout=None):
+        """
+        Send text input
+
+        Args:
+            text (str): Text to send
+            wait_for (dict, optional): Selector expected to appear afterwards
+            timeout (float, optional): Settle timeout, defaults to ACTION_TIMEOUTS
+        """
+        self._send_keys(text)
+        return self.settle("send_keys", wait_for, timeout)
+
+    @retry(max_tries=3)
+    def window_size(self):
+        """
+        Get the screen size in the current orientation
+
+        Returns:
+            tuple: (width, height)
+        """
+        width, height = self._device.window_size()
+        return width, height
+
+    @retry(max_tries=3)
+    def app_current(self):
+        """
+        Get current app package name
+
+        Returns:
+            str: Package name
+        """
+        result = self._device.app_current()
+        return result.get('package', '')
+
+    @retry(max_tries=3)
+    def _app_start(self, package):
+        self._device.app_start(package)
+        self.invalidate()
+
+    def app_start(self, package, timeout=None):
+        """
+        Start an app and wait until it is in the foreground
+
+        Args:
+            package (str): Package name
+            timeout (float, optional): Max wait, defaults to ACTION_TIMEOUTS
+        """
+        self._app_start(package)
+        if timeout is None:
+            timeout = ACTION_TIMEOUTS["app_start"]
+        return self.wait_until(lambda: self.app_current() == package, timeout,
+                               name="app_start")
+
+    @retry(max_tries=3)
+    def _app_stop(self, package):
+        self._device.app_stop(package)
+        self.invalidate()
+
+    def app_stop(self, package, timeout=None):
+        """
+        Stop an app and wait until it has left the foreground
+
+        Args:
+            package (str): Package name
+            timeout (float, optional): Max wait, defaults to ACTION_TIMEOUTS
+        """
+        self._app_stop(package)
+        if timeout is None:
+            timeout = ACTION_TIMEOUTS["app_stop"]
+        return self.wait_until(lambda: self.app_current() != package, timeout,
+                               name="app_stop")
+
+    @retry(max_tries=3)
+    def dump_hierarchy(self):
+        """
+        Dump the current view hierarchy and refresh the snapshot cache
+
+        Returns:
+            str: Hierarchy XML
+        """
+        xml = self._device.dump_hierarchy()
+        if xml != self._xml:
+            self._snapshot = None
+        self._xml = xml
+        self._xml_time = time.time()
+        return xml
+
+    def snapshot(self, max_age=SNAPSHOT_MAX_AGE):
+        """
+        Get an indexed snapshot of the current view hierarchy
+
+        Args:
+            max_age (float): Reuse a cached dump at most this old (seconds);
+                pass 0 to force a fresh dump
+
+        Returns:
+            Snapshot: Parsed hierarchy
+        """
+        if self._xml is None or time.time() - self._xml_time > max_age:
+            self.dump_hierarchy()
+        if self._snapshot is None:
+            self._snapshot = Snapshot(self._xml)
+        return self._snapshot
+
+    def invalidate(self):
+        """Drop the cached hierarchy; called after every input action"""
+        self._xml = None
+        self._snapshot = None
+
+    def sleep(self, seconds):
+        """
+        Sleep for specified seconds
+
+        Args:
+            seconds (float): Sleep duration
+        """
+        time.sleep(seconds)
+
+    # ==================== Wait engine ====================
+
+    def settle(self, action="click", wait_for=None, timeout=None):
+        """
+        Wait for the UI to react to an action
+
+        Args:
+            action (str): Action name used to look up ACTION_TIMEOUTS
+            wait_for (dict, optional): Selector expected to appear; when
+                omitted, waits for the hierarchy to stop changing
+            timeout (float, optional): Max wait, defaults to ACTION_TIMEOUTS
+
+        Returns:
+            bool: True if the target condition held before timeout
+        """
+        if timeout is None:
+            timeout = ACTION_TIMEOUTS.get(action, ACTION_TIMEOUTS["click"])
+        if timeout <= 0:
+            return True
+        if wait_for:
+            return self.wait_exists(timeout=timeout, **wait_for)
+        return self.wait_stable(timeout=timeout)
+
+    def wait_until(self, condition, timeout, interval=WAIT_INTERVAL, name="condition"):
+        """
+        Poll until a condition holds
+
+        Args:
+            condition (callable): Zero-argument predicate; exceptions count as False
+            timeout (float): Max seconds to wait
+            interval (float): Poll interval in seconds
+            name (str): Label recorded in wait_history
+
+        Returns:
+            bool: True if the condition held before timeout
+        """
+        start = time.time()
+        while True:
+            try:
+                ok = bool(condition())
+            except Exception:
+                ok = False
+            if ok or time.time() - start >= timeout:
+                break
+            time.sleep(interval)
+        self._record_wait(name, start, ok, timeout)
+        return ok
+
+    def wait_exists(self, timeout, **selector):
+        """
+        Wait until an element matching the selector appears
+
+        Args:
+            timeout (float): Max seconds to wait
+            **selector: uiautomator2 selector
+
+        Returns:
+            bool: True if the element appeared
+        """
+        start = time.time()
+        try:
+            ok = bool(self._device(**selector).wait(exists=True, timeout=timeout))
+        except Exception:
+            ok = False
+        self._record_wait(f"exists {selector}", start, ok, timeout)
+        return ok
+
+    def wait_gone(self, timeout, **selector):
+        """
+        Wait until no element matches the selector
+
+        Args:
+            timeout (float): Max seconds to wait
+            **selector: uiautomator2 selector
+
+        Returns:
+            bool: True if the element disappeared
+        """
+        start = time.time()
+        try:
+            ok = bool(self._device(**selector).wait_gone(timeout=timeout))
+        except Exception:
+            ok = False
+        self._record_wait(f"gone {selector}", start, ok, timeout)
+        return ok
+
+    def wait_stable(self, timeout, interval=WAIT_INTERVAL, window=STABLE_WINDOW):
+        """
+        Wait until the view hierarchy stops changing
+
+        Args:
+            timeout (float): Max seconds to wait
+            interval (float): Poll interval in seconds
+            window (float): How long the hierarchy must stay unchanged
+
+        Returns:
+            bool: True if the hierarchy settled before timeout
+        """
+        return self._wait_digest_stable(self._hierarchy_digest, timeout, interval,
+                                        window, "hierarchy_stable")
+
+    def wait_screen_stable(self, timeout, interval=WAIT_INTERVAL, window=STABLE_WINDOW):
+        """
+        Wait until the screen content stops changing
+
+        Cheaper than wait_stable on pages whose hierarchy is noisy (quotes,
+        animated banners); compares a downscaled grayscale hash of the frame.
+
+        Args:
+            timeout (float): Max seconds to wait
+            interval (float): Poll interval in seconds
+            window (float): How long the screen must stay unchanged
+
+        Returns:
+            bool: True if the screen settled before timeout
+        """
+        return self._wait_digest_stable(self._screen_digest, timeout, interval,
+                                        window, "screen_stable")
+
+    def wait_summary(self):
+        """
+        Summarize recorded waits by name
+
+        Returns:
+            dict: {name: {'count': int, 'total': float, 'max': float, 'timeouts': int}}
+        """
+        summary = {}
+        for record in self.wait_history:
+            item = summary.setdefault(record['name'], {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+            item['count'] += 1
+            item['total'] += record['elapsed']
+            item['max'] = max(item['max'], record['elapsed'])
+            if not record['ok']:
+                item['timeouts'] += 1
+        return summary
+
+    def _wait_digest_stable(self, digest_func, timeout, interval, window, name):
+        state = {'digest': None, 'since': None}
+
+        def unchanged():
+            digest = digest_func()
+            now = time.time()
+            if digest != state['digest']:
+                state['digest'] = digest
+                state['since'] = now
+                return False
+            return now - state['since'] >= window
+
+        return self.wait_until(unchanged, timeout, interval, name=name)
+
+    def _hierarchy_digest(self):
+        xml = self.dump_hierarchy()
+        return hashlib.md5(xml.encode('utf-8')).hexdigest()
+
+    def _screen_digest(self):
+        from PIL import Image
+        import numpy as np
+        img = self._device.screenshot().convert('L').resize((32, 32), Image.BILINEAR)
+        pixels = np.asarray(img, dtype=np.uint8) >> 4
+        return hashlib.md5(pixels.tobytes()).hexdigest()
+
+    def _record_wait(self, name, start, ok, timeout):
+        record = {
+            'name': name,
+            'elapsed': round(time.time() - start, 3),
+            'ok': ok,
+            'timeout': timeout,
+        }
+        self.wait_history.append(record)
+        self.last_wait = record
+        return record
@@ -0,0 +1,492 @@
+"""
+离线回放设备
+按录制的界面状态（层级 XML + 截图）回放同花顺界面，实现 Device 及 THSTrader 用到的
+uiautomator2 接口，使导航、列表解析和下单流程可以在没有模拟器的机器上运行，
+也可用于测量纯 Python 部分的开销
+
+场景目录中的 scenario.json:
+    {
+        "package": "com.hexin.plat.android",
+        "start": "home",                      # 初始状态
+        "launch": "home",                     # app_start 后的状态
+        "states": {
+            "home": {"xml": "home.xml", "screenshot": "home.png"},
+            "moni": {"xml": "moni.xml"}       # 截图可省略（生成空白图）
+        },
+        "transitions": [                      # 按顺序匹配，第一个满足的生效
+            {"from": "home", "click": {"description": "交易"}, "to": "trade_tab"},
+            {"from": "moni", "click": [0, 300, 180, 420], "to": "buy_form"},
+            {"from": "buy_form", "input": {"resourceId": "...content_stock"}, "to": "buy_search"},
+            {"from": "buy_search", "xpath": "//*[@resource-id=\\"...\\"]", "to": "buy_form"},
+            {"from": "*", "key": "back", "to": "moni"},
+            {"from": "holdings", "swipe": "up", "to": "holdings_2"}
+        ]
+    }
+
+click 为选择器（点击点落在匹配控件内）或区域 [x1, y1, x2, y2]；swipe 为手指移动方向；
+input 在向匹配的输入框输入文本后触发，focused="true" 的输入框在进入状态时获得焦点。
+没有匹配的动作不改变状态，所有动作记录在 actions 中。
+回放中界面只随动作变化，等待条件不成立时立即返回。
+
+录制: 在真机上停留在某个界面时调用 capture_state(device, 目录, 状态名)
+（或 trader.py record-state），跳转关系手工写入 transitions。
+"""
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from .device import Device
+from .hierarchy import Snapshot
+
+SCENARIO_FILE = "scenario.json"
+
+_INPUT_TEXT_RE = re.compile(r"input text (\S+)")
+# XPath 中以类名作为标签的步骤，如 /android.widget.RelativeLayout[1]
+_CLASS_STEP_RE = re.compile(r"/([A-Za-z_][\w$]*(?:\.[\w$]+)+)")
+
+
+class UiObjectNotFoundError(Exception):
+    """回放界面中找不到选择器对应的控件"""
+
+
+class FakeDevice(Device):
+    """
+    回放录制场景的 Device，接口与 Device 相同
+
+    示例:
+        device = FakeDevice("fixtures/moni")
+        trader = THSTrader(device=device)
+        trader.get_balance()
+        print(device.state, device.actions)
+    """
+
+    def __init__(self, scenario, serial="fake", latency=0.0):
+        """
+        Args:
+            scenario: 场景目录、scenario.json 路径，或已加载的场景 dict（xml 为文件路径时相对当前目录）
+            serial: 显示用的序列号
+            latency: 每次设备调用模拟的耗时（秒），默认 0 以测量纯 Python 开销
+        """
+        self._scenario = load_scenario(scenario)
+        self._latency = latency
+        super().__init__(serial)
+
+    def _connect(self):
+        """创建回放用的 uiautomator2 替身，替代 u2.connect"""
+        self._device = FakeU2(self._scenario, self._latency)
+
+    @property
+    def state(self):
+        """当前界面状态名"""
+        return self._device.state
+
+    @property
+    def actions(self):
+        """已执行的动作记录"""
+        return self._device.actions
+
+    def goto_state(self, name):
+        """直接切换到指定状态（测试准备）"""
+        self._device.set_state(name)
+        self.invalidate()
+
+    def wait_stable(self, timeout, interval=None, window=None):
+        """回放的界面在动作之间不变化，总是已稳定"""
+        self._record_wait("hierarchy_stable", time.time(), True, timeout)
+        return True
+
+    def wait_screen_stable(self, timeout, interval=None, window=None):
+        self._record_wait("screen_stable", time.time(), True, timeout)
+        return True
+
+
+class FakeU2:
+    """回放场景的 uiautomator2 Device 替身"""
+
+    def __init__(self, scenario, latency=0.0):
+        self.scenario = scenario
+        self.latency = latency
+        self.package = scenario.get("package", "")
+        self.actions = []
+        self.fields = {}  # 输入过的文本 {resource-id: text}
+        self.focus = None  # 当前焦点输入框的 resource-id
+        self._states = scenario["states"]
+        self._xml_cache = {}
+        self._screens = {}
+        self.state = None
+        self.set_state(scenario["start"])
+
+    # ---------- 状态 ----------
+
+    def set_state(self, name):
+        if name not in self._states:
+            raise KeyError(f"场景中没有状态: {name}")
+        self.state = name
+        self._snapshot = None
+        # 离开表单后，新界面中不存在的输入框清空
+        ids = {n.resource_id for n in self.snapshot().nodes if n.resource_id}
+        self.fields = {rid: text for rid, text in self.fields.items() if rid in ids}
+        if self.focus not in ids:
+            # 新界面自带焦点的输入框（如打开的搜索页）
+            self.focus = next((n.resource_id for n in self.snapshot().nodes
+                               if n.resource_id and n.attrib.get("focused") == "true"), None)
+        self._snapshot = None
+
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = Snapshot(self._render())
+        return self._snapshot
+
+    def _raw_xml(self):
+        if self.state not in self._xml_cache:
+            spec = self._states[self.state]
+            if "xml_text" in spec:
+                xml = spec["xml_text"]
+            else:
+                with open(spec["xml"], encoding="utf-8") as f:
+                    xml = f.read()
+            self._xml_cache[self.state] = xml
+        return self._xml_cache[self.state]
+
+    def _render(self):
+        """当前状态的 XML，叠加已输入的文本"""
+        xml = self._raw_xml()
+        if not self.fields:
+            return xml
+        tree = ET.fromstring(xml.encode("utf-8"))
+        for element in tree.iter():
+            rid = element.attrib.get("resource-id")
+            if rid in self.fields:
+                element.set("text", self.fields[rid])
+        return ET.tostring(tree, encoding="unicode")
+
+    def _transition(self, kind, match):
+        """按顺序查找第一个满足的跳转并执行，返回新状态（没有匹配为 None）"""
+        for t in self.scenario.get("transitions", ()):
+            if t.get("from", "*") not in ("*", self.state) or kind not in t:
+                continue
+            if match(t[kind]):
+                self.set_state(t["to"])
+                return t["to"]
+        return None
+
+    def _record(self, action, to, **detail):
+        self.actions.append({"action": action, "state": self.state if to is None else to, "to": to, **detail})
+
+    def _delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    # ---------- uiautomator2 接口 ----------
+
+    def __call__(self, **selector):
+        return FakeSelector(self, selector)
+
+    def xpath(self, xpath):
+        return FakeXPath(self, xpath)
+
+    def dump_hierarchy(self, *args, **kwargs):
+        self._delay()
+        return self.snapshot().xml
+
+    def screenshot(self, *args, **kwargs):
+        self._delay()
+        if self.state not in self._screens:
+            self._screens[self.state] = self._load_screen()
+        return self._screens[self.state].copy()
+
+    def _load_screen(self):
+        from PIL import Image
+        path = self._states[self.state].get("screenshot")
+        if path and os.path.exists(path):
+            image = Image.open(path)
+            image.load()
+            return image.convert("RGB")
+        root = self.snapshot().root
+        bounds = next((n.bounds for n in root.iter() if n.bounds), None) or (0, 0, 720, 1280)
+        return Image.new("RGB", (bounds[2], bounds[3]), "white")
+
+    def window_size(self):
+        return self.screenshot().size
+
+    def click(self, x, y):
+        self._delay()
+        node = self._node_at(x, y)
+        if node is not None and node.resource_id and "EditText" in node.class_name:
+            self.focus = node.resource_id
+        to = self._transition("click", lambda spec: self._hit(spec, x, y))
+        self._record("click", to, x=x, y=y)
+
+    def long_click(self, x, y, duration=None):
+        self._delay()
+        to = self._transition("long_click", lambda spec: self._hit(spec, x, y))
+        self._record("long_click", to, x=x, y=y)
+
+    def swipe(self, x1, y1, x2, y2, duration=None, **kwargs):
+        self._delay()
+        dx, dy = x2 - x1, y2 - y1
+        if abs(dy) >= abs(dx):
+            direction = "up" if dy < 0 else "down"
+        else:
+            direction = "left" if dx < 0 else "right"
+        to = self._transition("swipe", lambda spec: spec == direction)
+        self._record("swipe", to, direction=direction)
+
+    def press(self, key):
+        self._delay()
+        to = self._transition("key", lambda spec: spec == key)
+        self._record("key", to, key=key)
+
+    def send_keys(self, text, clear=False):
+        self._delay()
+        self._input(self.focus, str(text))
+
+    def shell(self, cmd, *args, **kwargs):
+        self._delay()
+        # keycombo 输入: 先删除再 input text，结果等同于替换焦点输入框的内容
+        m = _INPUT_TEXT_RE.search(cmd)
+        if m:
+            self._input(self.focus, m.group(1))
+        else:
+            self._record("shell", None, cmd=cmd)
+        return ""
+
+    def app_current(self):
+        node = next((n for n in self.snapshot().nodes if n.attrib.get("package")), None)
+        return {"package": node.attrib["package"] if node else self.package}
+
+    def app_start(self, package, *args, **kwargs):
+        self._delay()
+        launch = self.scenario.get("launch")
+        if launch:
+            self.set_state(launch)
+        self._record("app_start", launch, package=package)
+
+    def app_stop(self, package, *args, **kwargs):
+        self._delay()
+        self._record("app_stop", None, package=package)
+
+    # ---------- 内部 ----------
+
+    def _input(self, rid, text):
+        if rid is not None:
+            self.fields[rid] = text
+            self._snapshot = None
+        node = self.snapshot().first(resourceId=rid) if rid else None
+        to = self._transition("input", lambda spec: node is not None and node.matches(**spec))
+        self._record("input", to, resourceId=rid, text=text)
+
+    def _node_at(self, x, y):
+        """包含该点的最深层控件"""
+        hit = None
+        for node in self.snapshot().nodes:
+            b = node.bounds
+            if b and b[0] <= x < b[2] and b[1] <= y < b[3]:
+                hit = node
+        return hit
+
+    def _hit(self, spec, x, y):
+        if isinstance(spec, (list, tuple)):
+            x1, y1, x2, y2 = spec
+            return x1 <= x < x2 and y1 <= y < y2
+        for node in self.snapshot().find(**spec):
+            b = node.bounds
+            if b and b[0] <= x < b[2] and b[1] <= y < b[3]:
+                return True
+        return False
+
+    def _find(self, selector):
+        instance = selector.get("instance", 0)
+        selector = {k: v for k, v in selector.items() if k != "instance"}
+        found = self.snapshot().find(**selector)
+        return found[instance] if len(found) > instance else None
+
+
+class FakeSelector:
+    """d(**selector) 返回的 UiObject 替身"""
+
+    def __init__(self, fake, selector):
+        self.fake = fake
+        self.selector = selector
+
+    def _node(self):
+        node = self.fake._find(self.selector)
+        if node is None:
+            raise UiObjectNotFoundError(f"找不到控件: {self.selector}")
+        return node
+
+    @property
+    def exists(self):
+        return _Exists(self.fake._find(self.selector) is not None)
+
+    @property
+    def count(self):
+        selector = {k: v for k, v in self.selector.items() if k != "instance"}
+        return len(self.fake.snapshot().find(**selector))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def info(self):
+        node = self._node()
+        x1, y1, x2, y2 = node.bounds
+        return {"text": node.text, "resourceName": node.resource_id, "className": node.class_name,
+                "contentDescription": node.description,
+                "bounds": {"left": x1, "top": y1, "right": x2, "bottom": y2}}
+
+    def bounds(self):
+        return self._node().bounds
+
+    def center(self):
+        return self._node().center
+
+    def wait(self, exists=True, timeout=None):
+        return (self.fake._find(self.selector) is not None) == exists
+
+    def wait_gone(self, timeout=None):
+        return self.fake._find(self.selector) is None
+
+    def click(self, *args, **kwargs):
+        self.fake.click(*self._node().center)
+
+    def long_click(self, *args, **kwargs):
+        self.fake.long_click(*self._node().center)
+
+    def get_text(self):
+        return self._node().text
+
+    def set_text(self, text):
+        node = self._node()
+        self.fake.focus = node.resource_id
+        self.fake._input(node.resource_id, str(text))
+
+    def clear_text(self):
+        self.set_text("")
+
+    def screenshot(self):
+        return self.fake.screenshot().crop(self._node().bounds)
+
+
+class FakeXPath:
+    """d.xpath(xpath) 返回的 XPathSelector 替身"""
+
+    def __init__(self, fake, xpath):
+        self.fake = fake
+        self.xpath = xpath
+
+    def _node(self):
+        # uiautomator2 的 XPath 转为 ElementTree 可用的相对路径（层级 XML 的标签都是 node）
+        path = _CLASS_STEP_RE.sub(r'/node[@class="\1"]', self.xpath)
+        if path.startswith("//"):
+            path = "." + path
+        try:
+            tree = ET.fromstring(self.fake.snapshot().xml.encode("utf-8"))
+            element = tree.find(path)
+        except (SyntaxError, KeyError):
+            element = None
+        if element is None:
+            return None
+        bounds = element.attrib.get("bounds", "")
+        return next((n for n in self.fake.snapshot().nodes if n.attrib.get("bounds") == bounds
+                     and n.attrib == dict(element.attrib)), None)
+
+    def _declared(self):
+        return any(t.get("xpath") == self.xpath and t.get("from", "*") in ("*", self.fake.state)
+                   for t in self.fake.scenario.get("transitions", ()))
+
+    @property
+    def exists(self):
+        return self._declared() or self._node() is not None
+
+    def click(self):
+        self._press("click")
+
+    def long_click(self):
+        self._press("long_click")
+
+    def get_text(self):
+        node = self._node()
+        if node is None:
+            raise UiObjectNotFoundError(f"找不到控件: {self.xpath}")
+        return node.text
+
+    def _press(self, kind):
+        fake = self.fake
+        fake._delay()
+        # 场景中直接声明的 XPath 跳转优先，其次按解析到的控件坐标点击
+        to = fake._transition("xpath", lambda spec: spec == self.xpath)
+        if to is not None:
+            fake._record(kind, to, xpath=self.xpath)
+            return
+        node = self._node()
+        if node is None:
+            raise UiObjectNotFoundError(f"找不到控件: {self.xpath}")
+        getattr(fake, kind)(*node.center)
+
+
+class _Exists:
+    """u2 的 exists 既可当作布尔值，也可调用 exists(timeout=...)"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __bool__(self):
+        return self.value
+
+    def __call__(self, timeout=0):
+        return self.value
+
+
+def load_scenario(scenario):
+    """
+    加载场景
+
+    Args:
+        scenario: 场景目录、scenario.json 路径或 dict
+
+    Returns:
+        dict: 场景，xml / screenshot 已转为可直接打开的路径
+    """
+    if isinstance(scenario, dict):
+        return scenario
+    path = os.path.join(scenario, SCENARIO_FILE) if os.path.isdir(scenario) else scenario
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for spec in data["states"].values():
+        for key in ("xml", "screenshot"):
+            if spec.get(key):
+                spec[key] = os.path.join(base, spec[key])
+    return data
+
+
+def capture_state(device, directory, name):
+    """
+    录制当前界面为一个状态，写入 <name>.xml / <name>.png 并登记到 scenario.json
+
+    Args:
+        device: 已连接的 Device
+        directory: 场景目录
+        name: 状态名
+
+    Returns:
+        dict: 更新后的场景
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{name}.xml"), "w", encoding="utf-8") as f:
+        f.write(device.dump_hierarchy())
+    device.screenshot().save(os.path.join(directory, f"{name}.png"))
+
+    path = os.path.join(directory, SCENARIO_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        data = {"package": device.app_current(), "start": name, "launch": name,
+                "states": {}, "transitions": []}
+    data["states"][name] = {"xml": f"{name}.xml", "screenshot": f"{name}.png"}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
@@ -0,0 +1,274 @@
+"""
+多模拟器调度
+TraderFarm 为每个设备序列号维护一个 THSTrader 和工作线程，
+任务进入队列后由空闲且健康的设备执行，设备出错时切换到其他设备重试
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from .config import FARM_HEALTH_INTERVAL, FARM_MAX_ATTEMPTS
+
+# 只读查询，失败后可以安全地换一台设备重试
+READ_METHODS = (
+    "get_balance",
+    "get_position",
+    "get_avail_withdrawals",
+    "get_favorite_code",
+)
+
+
+class _Job:
+    """队列中的一个任务"""
+
+    def __init__(self, method, args, kwargs, serial, failover):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.serial = serial
+        self.failover = failover
+        self.future = Future()
+        self.attempts = 0
+        self.tried = set()
+
+    def fail(self, error, cancel=False):
+        """
+        结束未完成的任务
+
+        Args:
+            error: 设置到 future 的异常
+            cancel: 尚未开始的任务取消而不是设为异常（已在换设备重试的任务无法取消，仍设为异常）
+        """
+        if self.attempts == 0:
+            if cancel and self.future.cancel():
+                return
+            if not self.future.set_running_or_notify_cancel():
+                return
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class _FarmWorker(threading.Thread):
+    """单个设备的工作线程"""
+
+    def __init__(self, farm, serial):
+        super().__init__(name=f"farm-{serial}", daemon=True)
+        self.farm = farm
+        self.serial = serial
+        self.trader = None
+        self.healthy = False
+        self.checked = False  # 是否完成过至少一次健康检查
+        self.busy = False
+        self.jobs_done = 0
+        self.last_error = ""
+        self.last_check = 0
+        self.pinned = queue.Queue()
+
+    def run(self):
+        while not self.farm._stopped.is_set():
+            if not self.healthy or time.time() - self.last_check > self.farm.health_interval:
+                self.check_health()
+            if not self.healthy:
+                self._fail_pinned()
+                self.farm._fail_queued_if_unhealthy()
+                self.farm._stopped.wait(self.farm.health_interval)
+                continue
+
+            job = self._next_job()
+            if job is None:
+                continue
+            self.busy = True
+            try:
+                self.farm._execute(self, job)
+            finally:
+                self.busy = False
+
+    def check_health(self):
+        """连接设备（必要时）并确认设备响应"""
+        self.last_check = time.time()
+        try:
+            if self.trader is None:
+                self.trader = self.farm._trader_factory(self.serial)
+            else:
+                self.trader.device.app_current()
+            self.healthy = True
+        except Exception as e:
+            self.healthy = False
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ 设备 {self.serial} 不可用: {self.last_error}")
+        self.checked = True
+        return self.healthy
+
+    def _next_job(self):
+        # 指定了本设备的任务优先
+        try:
+            return self.pinned.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            job = self.farm._queue.get(timeout=0.1)
+        except queue.Empty:
+            return None
+        if self.serial in job.tried and any(
+                w.healthy and w.serial not in job.tried for w in self.farm.workers.values()):
+            # 已在本设备失败过，留给还没试过的健康设备；没有这样的设备时在本设备重试
+            self.farm._queue.put(job)
+            self.farm._stopped.wait(0.1)
+            return None
+        return job
+
+    def _fail_pinned(self, error=None, cancel=False):
+        error = error or RuntimeError(f"设备 {self.serial} 不可用: {self.last_error}")
+        for job in _drain(self.pinned):
+            job.fail(error, cancel)
+
+
+class TraderFarm:
+    """
+    多设备调度器
+
+    示例:
+        farm = TraderFarm(["127.0.0.1:5565", "127.0.0.1:5575"])
+        futures = [farm.submit("get_balance") for _ in range(4)]
+        print([f.result() for f in futures])
+        farm.submit("buy", "002415", 100, 31.5, serial="127.0.0.1:5575").result()
+        farm.shutdown()
+    """
+
+    def __init__(self, serials, use_broker=True, health_interval=FARM_HEALTH_INTERVAL,
+                 max_attempts=FARM_MAX_ATTEMPTS, trader_factory=None):
+        """
+        Args:
+            serials: 设备序列号列表，如 ["127.0.0.1:5565", "127.0.0.1:5575"]
+            use_broker: 是否通过本地设备代理连接
+            health_interval: 健康检查间隔（秒）
+            max_attempts: 任务最多在几台设备上尝试
+            trader_factory: 自定义 THSTrader 构造函数 serial -> trader
+        """
+        if trader_factory is None:
+            from .trader import THSTrader
+
+            def trader_factory(serial):
+                return THSTrader(serial, use_broker=use_broker)
+
+        self._trader_factory = trader_factory
+        self.health_interval = health_interval
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self.workers = {serial: _FarmWorker(self, serial) for serial in serials}
+        for worker in self.workers.values():
+            worker.start()
+
+    def submit(self, method, *args, serial=None, failover=None, **kwargs):
+        """
+        提交任务
+
+        Args:
+            method: THSTrader 方法名，如 "get_balance"、"buy"
+            *args, **kwargs: 方法参数
+            serial: 指定执行设备（对应账户），默认任意空闲设备
+            failover: 设备出错时是否换设备重试；默认只读查询重试，
+                下单类操作不重试以免重复委托
+
+        Returns:
+            concurrent.futures.Future: 结果为方法返回值
+
+        Raises:
+            AttributeError: THSTrader 没有该方法
+            KeyError: 未知设备
+            RuntimeError: 调度器已停止
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("调度器已停止")
+        from .trader import THSTrader
+        if method.startswith("_") or not callable(getattr(THSTrader, method, None)):
+            # 在提交时报错，不让拼错的方法名在执行时把设备标记为不可用
+            raise AttributeError(f"THSTrader 没有方法: {method}")
+        if failover is None:
+            failover = method in READ_METHODS
+        job = _Job(method, args, kwargs, serial, failover)
+        if serial is not None:
+            if serial not in self.workers:
+                raise KeyError(f"未知设备: {serial}")
+            self.workers[serial].pinned.put(job)
+        else:
+            self._queue.put(job)
+            # 所有设备都已不可用时不再排队等待
+            self._fail_queued_if_unhealthy()
+        return job.future
+
+    def call(self, method, *args, **kwargs):
+        """提交任务并等待结果"""
+        return self.submit(method, *args, **kwargs).result()
+
+    def health(self):
+        """
+        各设备状态
+
+        Returns:
+            dict: {serial: {'healthy': bool, 'busy': bool, 'jobs_done': int, 'last_error': str}}
+        """
+        return {
+            serial: {
+                'healthy': w.healthy,
+                'busy': w.busy,
+                'jobs_done': w.jobs_done,
+                'last_error': w.last_error,
+            }
+            for serial, w in self.workers.items()
+        }
+
+    def shutdown(self, wait=True):
+        """停止所有工作线程，队列中和指定设备的未执行任务被取消（换设备重试中的任务设为异常）"""
+        self._stopped.set()
+        error = RuntimeError("调度器已停止")
+        for job in _drain(self._queue):
+            job.fail(error, cancel=True)
+        for worker in self.workers.values():
+            worker._fail_pinned(error, cancel=True)
+        if wait:
+            for worker in self.workers.values():
+                worker.join()
+
+    def _fail_queued_if_unhealthy(self):
+        """所有设备都检查过且都不可用时，结束队列中的任务"""
+        workers = list(self.workers.values())
+        if not all(w.checked and not w.healthy for w in workers):
+            return
+        errors = "; ".join(f"{w.serial}: {w.last_error}" for w in workers)
+        error = RuntimeError(f"没有可用的设备（{errors}）")
+        for job in _drain(self._queue):
+            job.fail(error)
+
+    def _execute(self, worker, job):
+        if job.attempts == 0 and not job.future.set_running_or_notify_cancel():
+            return
+        job.attempts += 1
+        job.tried.add(worker.serial)
+        try:
+            result = getattr(worker.trader, job.method)(*job.args, **job.kwargs)
+        except Exception as e:
+            # retry 装饰器已放弃，视为设备故障
+            worker.healthy = False
+            worker.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ 设备 {worker.serial} 执行 {job.method} 失败: {worker.last_error}")
+            if job.failover and job.serial is None and job.attempts < self.max_attempts:
+                print(f"切换设备重试 {job.method} ({job.attempts}/{self.max_attempts})")
+                # 本设备下一轮先做健康检查，仍不可用且没有其他健康设备时由它结束队列中的任务
+                self._queue.put(job)
+            else:
+                job.future.set_exception(e)
+            return
+        worker.jobs_done += 1
+        job.future.set_result(result)
+
+
+def _drain(q):
+    """取出队列中当前的全部任务"""
+    jobs = []
+    while True:
+        try:
+            jobs.append(q.get_nowait())
+        except queue.Empty:
+            return jobs
@@ -0,0 +1,143 @@
+"""
+分辨率适配
+config 中的坐标、滑动、OCR 区域按 720x1280 录制，GeometryProfile 按设备实际分辨率换算，
+每个设备序列号只检测一次窗口大小
+"""
+import threading
+from .config import (COORDINATES, SWIPES, OCR_CROP_AREAS, OCR_SEARCH_REGIONS,
+                     GEOMETRY_BASE_SIZE, GEOMETRY_BOTTOM_ANCHORED, GEOMETRY_PROFILES)
+
+
+class GeometryProfile:
+    """
+    一种分辨率下的坐标换算
+
+    示例:
+        geometry = GeometryProfile((1080, 1920))
+        geometry.point("buy_button")         # (108, 915)
+        geometry.crop_areas("holding")      # 相对行左上角的裁剪区域
+    """
+
+    def __init__(self, size, base=GEOMETRY_BASE_SIZE, overrides=None):
+        """
+        Args:
+            size: 设备窗口大小 (width, height)
+            base: 配置坐标对应的分辨率
+            overrides: 实测值，格式同 GEOMETRY_PROFILES 的一项，默认按 "宽x高" 查找
+        """
+        self.width, self.height = size
+        self.base_width, self.base_height = base
+        self.scale = self.width / self.base_width
+        if overrides is None:
+            overrides = GEOMETRY_PROFILES.get(f"{self.width}x{self.height}", {})
+        self.overrides = overrides
+        self._crop_areas = {}
+        self._regions = None
+
+    @property
+    def identity(self):
+        """与配置分辨率相同，坐标不需要换算"""
+        return (self.width, self.height) == (self.base_width, self.base_height) and not self.overrides
+
+    def xy(self, x, y, bottom=False):
+        """
+        换算一个屏幕坐标
+
+        Args:
+            x, y: 配置分辨率下的坐标
+            bottom: 控件贴屏幕底部，按到底部的距离换算
+        """
+        if bottom:
+            return round(x * self.scale), round(self.height - (self.base_height - y) * self.scale)
+        return round(x * self.scale), round(y * self.scale)
+
+    def box(self, box, bottom=False):
+        """换算一个屏幕区域 (x1, y1, x2, y2)，结果限制在屏幕内"""
+        x1, y1 = self.xy(box[0], box[1], bottom)
+        x2, y2 = self.xy(box[2], box[3], bottom)
+        return max(0, x1), max(0, y1), min(self.width, x2), min(self.height, y2)
+
+    def point(self, name):
+        """COORDINATES 中的坐标"""
+        override = self.overrides.get("coordinates", {}).get(name)
+        if override:
+            return tuple(override)
+        return self.xy(*COORDINATES[name], bottom=name in GEOMETRY_BOTTOM_ANCHORED)
+
+    def swipe(self, name):
+        """SWIPES 中的滑动，返回 (x1, y1, x2, y2)"""
+        override = self.overrides.get("swipes", {}).get(name)
+        if override:
+            (x1, y1), (x2, y2) = override
+            return x1, y1, x2, y2
+        bottom = name in GEOMETRY_BOTTOM_ANCHORED
+        start, end = SWIPES[name]
+        return self.xy(*start, bottom) + self.xy(*end, bottom)
+
+    def crop_areas(self, kind):
+        """
+        OCR_CROP_AREAS 中的行内裁剪区域
+
+        区域相对列表行左上角，行内布局只随 dp 缩放，不受屏幕高度影响
+        """
+        if kind not in self._crop_areas:
+            override = self.overrides.get("crop_areas", {}).get(kind)
+            if override:
+                areas = {name: tuple(box) for name, box in override.items()}
+            else:
+                areas = {name: tuple(round(v * self.scale) for v in box)
+                         for name, box in OCR_CROP_AREAS[kind].items()}
+            self._crop_areas[kind] = areas
+        return self._crop_areas[kind]
+
+    def regions(self):
+        """OCR_SEARCH_REGIONS 换算后的 {文字: [区域, ...]}"""
+        if self._regions is None:
+            regions = {text: [self.box(box, text in GEOMETRY_BOTTOM_ANCHORED) for box in boxes]
+                       for text, boxes in OCR_SEARCH_REGIONS.items()}
+            regions.update({text: [tuple(box) for box in boxes]
+                            for text, boxes in self.overrides.get("regions", {}).items()})
+            self._regions = regions
+        return self._regions
+
+    def __repr__(self):
+        return f"<GeometryProfile {self.width}x{self.height} scale={self.scale:.3f}>"
+
+
+_profiles = {}
+_lock = threading.Lock()
+
+
+def profile_for(device):
+    """
+    设备的分辨率配置，按序列号缓存，只在第一次调用时检测窗口大小
+
+    Args:
+        device: Device
+
+    Returns:
+        GeometryProfile: 检测失败时使用配置分辨率
+    """
+    with _lock:
+        profile = _profiles.get(device.serial)
+    if profile is not None:
+        return profile
+    try:
+        size = device.window_size()
+    except Exception as e:
+        print(f"⚠️ 获取屏幕分辨率失败，按 {GEOMETRY_BASE_SIZE[0]}x{GEOMETRY_BASE_SIZE[1]} 处理: {e}")
+        size = GEOMETRY_BASE_SIZE
+    profile = GeometryProfile(size)
+    if not profile.identity:
+        print(f"✓ 屏幕分辨率 {profile.width}x{profile.height}，坐标按 {profile.scale:.3f} 倍换算")
+    with _lock:
+        return _profiles.setdefault(device.serial, profile)
+
+
+def forget(serial=None):
+    """清除缓存的分辨率配置（设备更换分辨率或旋转后调用）"""
+    with _lock:
+        if serial is None:
+            _profiles.clear()
+        else:
+            _profiles.pop(serial, None)
@@ -0,0 +1,217 @@
+"""
+列表采集
+按整屏翻页读取 RecyclerView，用行内容（或行截图哈希）做指纹，
+按相邻两页相同指纹的位置差算出实际滚动距离，只去掉滚动后仍在屏幕上的行；
+翻页后没有新行即认为到达列表末尾
+"""
+import hashlib
+from collections import Counter
+from .config import MAX_HOLDINGS, HARVEST_OVERLAP, HARVEST_SWIPE_DURATION
+from .trace import traced
+
+
+class Row:
+    """采集到的一行"""
+
+    __slots__ = ("node", "texts", "image", "fingerprint")
+
+    def __init__(self, node, texts, image, fingerprint):
+        self.node = node
+        self.texts = texts
+        self.image = image
+        self.fingerprint = fingerprint
+
+    def __repr__(self):
+        return f"<Row {self.texts!r}>"
+
+
+class RecyclerHarvester:
+    """
+    RecyclerView 整屏翻页采集器
+
+    示例:
+        harvester = RecyclerHarvester(device, UI_ELEMENTS["recyclerview_id"],
+                                      row_class="android.widget.RelativeLayout")
+        for page in harvester.pages():
+            for row in page:
+                print(row.texts)
+    """
+
+    def __init__(self, device, list_id, row_class=None, need_image=None,
+                 max_rows=MAX_HOLDINGS, overlap=HARVEST_OVERLAP):
+        """
+        Args:
+            device: Device
+            list_id: 列表控件 resource-id
+            row_class: 行控件类名，默认列表的所有直接子节点
+            need_image: node -> bool，该行是否需要截图（层级中读不全时），
+                默认没有任何文本的行才截图
+            max_rows: 最多采集行数
+            overlap: 相邻两页的重叠比例，保证不漏掉翻页边界上的行
+        """
+        self.device = device
+        self.list_id = list_id
+        self.row_class = row_class
+        self.need_image = need_image or (lambda node: not node.texts())
+        self.max_rows = max_rows
+        self.overlap = overlap
+        self.pages_read = 0
+        self._refresh = False
+
+    def pages(self):
+        """
+        逐页产出新出现的行
+
+        Yields:
+            list[Row]: 本页新出现的行（已去掉与上一页重叠的部分）；
+                调用 refresh() 后的下一页为重新读取的整屏
+        """
+        previous = []
+        distance = 0
+        total = 0
+        refreshing = False
+        while total < self.max_rows:
+            rows, list_bounds = self._read_page()
+            if list_bounds is None:
+                return
+            self.pages_read += 1
+
+            if refreshing:
+                new_rows = rows
+            else:
+                new_rows = _new_rows(previous, rows, distance)
+            if not new_rows:
+                return
+            new_rows = new_rows[:self.max_rows - total]
+            total += len(new_rows)
+            previous = rows
+            self._refresh = False
+            yield new_rows
+
+            refreshing = self._refresh
+            if not refreshing:
+                distance = self._next_page(list_bounds)
+
+    def refresh(self):
+        """
+        列表内容在当前屏幕内发生变化后调用（如撤掉了一行），
+        下一页不滑动，重新读取当前屏幕的所有行
+        """
+        self._refresh = True
+
+    def count(self, fingerprint):
+        """
+        重新读取当前屏幕，返回指纹相同的行数（用于确认某一行已从列表中消失）
+        """
+        self.device.invalidate()
+        rows, _ = self._read_page()
+        return sum(1 for row in rows if row.fingerprint == fingerprint)
+
+    def harvest(self):
+        """
+        采集整个列表
+
+        Returns:
+            list[Row]
+        """
+        rows = []
+        for page in self.pages():
+            rows.extend(page)
+        return rows
+
+    @traced("read_page")
+    def _read_page(self):
+        snap = self.device.snapshot()
+        lists = snap.find(resourceId=self.list_id)
+        if not lists or not lists[0].bounds:
+            return [], None
+        list_node = lists[0]
+        lx1, ly1, lx2, ly2 = list_node.bounds
+
+        screen = None
+        rows = []
+        for node in list_node.children:
+            if self.row_class and node.class_name != self.row_class:
+                continue
+            bounds = node.bounds
+            # 只取完整可见的行，被截断的行留到下一页
+            if not bounds or bounds[1] < ly1 or bounds[3] > ly2 or bounds[3] <= bounds[1]:
+                continue
+            texts = tuple(node.texts())
+            image = None
+            if self.need_image(node):
+                if screen is None:
+                    screen = self.device.screenshot()
+                image = screen.crop(bounds)
+            if texts:
+                fingerprint = texts
+            elif image is not None:
+                fingerprint = hashlib.md5(image.tobytes()).hexdigest()
+            else:
+                fingerprint = bounds
+            rows.append(Row(node, texts, image, fingerprint))
+        return rows, list_node.bounds
+
+    @traced("next_page")
+    def _next_page(self, list_bounds):
+        x1, y1, x2, y2 = list_bounds
+        x = (x1 + x2) // 2
+        distance = int((y2 - y1) * (1 - self.overlap))
+        start = y2 - max(1, (y2 - y1 - distance) // 2)
+        self.device.swipe(x, start, x, start - distance, duration=HARVEST_SWIPE_DURATION)
+        return distance
+
+
+def _scroll_offset(previous, current, expected):
+    """
+    两页之间列表实际滚动的像素数
+
+    每对指纹相同的行给出一个候选值（上一页的位置 - 本页的位置）；候选值下本页落在上一页范围内的行
+    都要在同一位置找到同样的行才成立，成立的候选值中取最接近滑动距离的（内容重复的列表可能有多个）。
+    没有相同的行（滚过了整屏）时返回 None
+    """
+    votes = Counter()
+    for old in previous:
+        for new in current:
+            if old.fingerprint == new.fingerprint:
+                votes[old.node.bounds[1] - new.node.bounds[1]] += 1
+    if not votes:
+        return None
+    seen = {(row.node.bounds[1], row.fingerprint) for row in previous}
+    first, last = previous[0].node.bounds[1], previous[-1].node.bounds[1]
+
+    def consistent(offset):
+        return all((row.node.bounds[1] + offset, row.fingerprint) in seen for row in current
+                   if first <= row.node.bounds[1] + offset <= last)
+
+    candidates = [offset for offset in votes if consistent(offset)]
+    if candidates:
+        return min(candidates, key=lambda offset: abs(offset - expected))
+    # 读取期间列表内容有变化，取得票最多的
+    return max(votes, key=lambda offset: (votes[offset], -abs(offset - expected)))
+
+
+def _new_rows(previous, current, expected):
+    """
+    current 中上一页没有读到的行
+
+    Args:
+        previous: 上一页的行
+        current: 本页的行
+        expected: 翻页时的滑动距离（像素）
+
+    Returns:
+        list[Row]: 滚动后不与上一页同一位置、同一内容重合的行；
+            内容相同但位于新滚入区域的行（如两笔相同的委托）保留
+    """
+    if not previous:
+        return list(current)
+    positions = [(row.node.bounds[1], row.fingerprint) for row in current]
+    if positions == [(row.node.bounds[1], row.fingerprint) for row in previous]:
+        # 滑动后列表没有移动，已到末尾
+        return []
+    offset = _scroll_offset(previous, current, expected)
+    if offset is None:
+        return list(current)
+    seen = {(row.node.bounds[1], row.fingerprint) for row in previous}
+    return [row for row in current if (row.node.bounds[1] + offset, row.fingerprint) not in seen]
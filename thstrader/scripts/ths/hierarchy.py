@@ -0,0 +1,254 @@
+"""
+界面层级快照
+一次 dump_hierarchy 解析为内存中的树，按 resource-id / text / content-desc 建立索引，
+之后的 exists / bounds / text 查询都在本地完成，不再逐个向设备发起 RPC
+"""
+import re
+import xml.etree.ElementTree as ET
+
+_BOUNDS_RE = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+# uiautomator2 选择器参数 -> 层级 XML 属性
+_SELECTOR_ATTRS = {
+    "resourceId": "resource-id",
+    "text": "text",
+    "description": "content-desc",
+    "className": "class",
+    "packageName": "package",
+}
+_CONTAINS_ATTRS = {
+    "textContains": "text",
+    "descriptionContains": "content-desc",
+}
+
+
+class Node:
+    """层级中的一个控件"""
+
+    __slots__ = ("attrib", "parent", "children")
+
+    def __init__(self, attrib, parent=None):
+        self.attrib = attrib
+        self.parent = parent
+        self.children = []
+
+    @property
+    def text(self):
+        return self.attrib.get("text", "")
+
+    @property
+    def resource_id(self):
+        return self.attrib.get("resource-id", "")
+
+    @property
+    def description(self):
+        return self.attrib.get("content-desc", "")
+
+    @property
+    def class_name(self):
+        return self.attrib.get("class", "")
+
+    @property
+    def bounds(self):
+        """(x1, y1, x2, y2)，无法解析时为 None"""
+        m = _BOUNDS_RE.match(self.attrib.get("bounds", ""))
+        return tuple(int(v) for v in m.groups()) if m else None
+
+    @property
+    def center(self):
+        """控件中心坐标 (x, y)"""
+        x1, y1, x2, y2 = self.bounds
+        return (x1 + x2) // 2, (y1 + y2) // 2
+
+    def iter(self):
+        """深度优先遍历自身及所有子孙节点"""
+        yield self
+        for child in self.children:
+            yield from child.iter()
+
+    def texts(self):
+        """子树中所有非空 text，按文档顺序"""
+        return [n.text for n in self.iter() if n.text]
+
+    def matches(self, **selector):
+        """是否满足 uiautomator2 风格的选择器"""
+        for key, value in selector.items():
+            if key in _SELECTOR_ATTRS:
+                if self.attrib.get(_SELECTOR_ATTRS[key], "") != value:
+                    return False
+            elif key in _CONTAINS_ATTRS:
+                if value not in self.attrib.get(_CONTAINS_ATTRS[key], ""):
+                    return False
+            else:
+                raise ValueError(f"不支持的选择器参数: {key}")
+        return True
+
+    def __repr__(self):
+        return f"<Node {self.class_name} id={self.resource_id!r} text={self.text!r}>"
+
+
+class Snapshot:
+    """
+    一次层级转储的只读索引
+
+    示例:
+        snap = Snapshot(d.dump_hierarchy())
+        if snap.exists(resourceId=UI_ELEMENTS["ok_btn"]):
+            x, y = snap.first(resourceId=UI_ELEMENTS["ok_btn"]).center
+    """
+
+    def __init__(self, xml):
+        """
+        Args:
+            xml: dump_hierarchy 返回的 XML 字符串
+        """
+        self.xml = xml
+        self.root = None
+        self.nodes = []
+        self._index = {"resource-id": {}, "text": {}, "content-desc": {}}
+        self._parse(xml)
+
+    def _parse(self, xml):
+        tree = ET.fromstring(xml.encode("utf-8") if isinstance(xml, str) else xml)
+        self.root = self._build(tree, None)
+
+    def _build(self, element, parent):
+        node = Node(dict(element.attrib), parent)
+        self.nodes.append(node)
+        for attr, index in self._index.items():
+            value = node.attrib.get(attr)
+            if value:
+                index.setdefault(value, []).append(node)
+        for child in element:
+            node.children.append(self._build(child, node))
+        return node
+
+    def find(self, **selector):
+        """
+        查找所有匹配的节点
+
+        Args:
+            **selector: resourceId / text / description / className /
+                textContains / descriptionContains
+
+        Returns:
+            list[Node]: 按文档顺序
+        """
+        candidates = None
+        for key in ("resourceId", "text", "description"):
+            if key in selector:
+                candidates = self._index[_SELECTOR_ATTRS[key]].get(selector[key], [])
+                break
+        if candidates is None:
+            candidates = self.nodes
+        return [n for n in candidates if n.matches(**selector)]
+
+    def first(self, **selector):
+        """第一个匹配的节点，没有则为 None"""
+        found = self.find(**selector)
+        return found[0] if found else None
+
+    def exists(self, **selector):
+        """是否存在匹配的节点"""
+        return bool(self.find(**selector))
+
+    def exists_any(self, *selectors):
+        """任意一个选择器存在即返回该选择器，否则为 None"""
+        for selector in selectors:
+            if self.exists(**selector):
+                return selector
+        return None
+
+    def bounds(self, **selector):
+        """第一个匹配节点的 bounds"""
+        node = self.first(**selector)
+        return node.bounds if node else None
+
+    def text(self, **selector):
+        """第一个匹配节点的 text"""
+        node = self.first(**selector)
+        return node.text if node else None
+
+    def texts(self, **selector):
+        """所有匹配节点的 text"""
+        return [n.text for n in self.find(**selector)]
+
+
+def row_fields(row, areas, field_ids=None):
+    """
+    从列表行节点读取各字段文本
+
+    配置了子控件 ID 的字段按 ID 读取，其余字段取中心点落在对应区域内的文本控件
+
+    Args:
+        row: 行 Node
+        areas: {字段名: (x1, y1, x2, y2)}，相对行左上角，与 OCR 裁剪区域一致
+        field_ids: {字段名: 子控件 resource-id}
+
+    Returns:
+        dict: {字段名: 文本}，层级中读不到的字段为 None
+    """
+    field_ids = field_ids or {}
+    row_bounds = row.bounds
+    texts = [n for n in row.iter() if n is not row and n.text.strip() and n.bounds]
+    fields = {}
+    for name, box in areas.items():
+        if field_ids.get(name):
+            found = [n.text for n in texts if n.resource_id == field_ids[name]]
+        elif row_bounds:
+            x1, y1, x2, y2 = box
+            found = []
+            for n in texts:
+                cx, cy = n.center
+                if x1 <= cx - row_bounds[0] <= x2 and y1 <= cy - row_bounds[1] <= y2:
+                    found.append(n.text)
+        else:
+            found = []
+        fields[name] = "".join(found).strip() or None
+    return fields
+
+
+class RuleSet:
+    """
+    预编译的界面规则集，在一个快照上按优先级找出第一条命中的规则
+
+    规则格式见 config.DIALOG_RULES:
+        {"name": str, "match": selector | [selector, ...],
+         "dismiss": selector (可选), "action": "click" | "back" (可选)}
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        for i, rule in enumerate(rules):
+            match = rule["match"]
+            match = [match] if isinstance(match, dict) else list(match)
+            if not match:
+                raise ValueError(f"规则缺少 match: {rule}")
+            action = rule.get("action", "click")
+            if action not in ("click", "back"):
+                raise ValueError(f"不支持的动作: {action}")
+            self.rules.append({
+                "name": rule.get("name") or f"rule{i}",
+                "match": match,
+                "dismiss": rule.get("dismiss") or match[0],
+                "action": action,
+            })
+
+    def first_match(self, snap):
+        """
+        Args:
+            snap: Snapshot
+
+        Returns:
+            tuple: (rule, node)，node 为要点击的节点（action 为 back 时为 None）；
+                没有命中时返回 None
+        """
+        for rule in self.rules:
+            if not all(snap.exists(**selector) for selector in rule["match"]):
+                continue
+            if rule["action"] == "back":
+                return rule, None
+            node = snap.first(**rule["dismiss"])
+            if node is not None and node.bounds:
+                return rule, node
+        return None
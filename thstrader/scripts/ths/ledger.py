@@ -0,0 +1,187 @@
+"""
+本地持仓账本
+以最近一次界面读取（持仓、余额、未成交委托）为基准，按下单、撤单的确认结果增量更新，
+读取持仓不必每次翻页识别；定期与界面核对，报告两者不一致的地方
+
+账本中的持仓和可用资金按"已提交的委托全部成交"计算:
+    股票余额 = 界面股票余额 + 未成交买入 - 未成交卖出
+    可用余额 = 界面可用余额（卖出委托提交后界面已冻结）
+    可用资金 = 界面可用资金（买入委托提交后界面已冻结）+ 未成交卖出金额
+核对时对界面读取结果做同样的换算，未成交的委托不会被当作不一致
+"""
+import re
+import threading
+import time
+from .config import LEDGER_CASH_TOLERANCE
+
+
+class PositionLedger:
+    """
+    持仓和资金账本
+
+    示例:
+        ledger = PositionLedger()
+        ledger.sync(trader.get_position(), trader.get_balance(), trader.get_avail_withdrawals())
+        ledger.apply_order({'success': True, 'stock_name': '海康威视', 'amount': '100',
+                            'price': '31.5', 'type': '买入'})
+        ledger.position("海康威视")   # {'股票名称': '海康威视', '股票余额': ..., '可用余额': ...}
+    """
+
+    def __init__(self, cash_tolerance=LEDGER_CASH_TOLERANCE):
+        """
+        Args:
+            cash_tolerance: 核对可用资金时允许的误差（元），账本不计手续费
+        """
+        self.cash_tolerance = cash_tolerance
+        self.cash = None
+        self.synced_at = None
+        self.dirty = True
+        self.discrepancies = []
+        self._positions = {}   # 股票名称 -> {'股票余额': int, '可用余额': int}
+        self._lock = threading.Lock()
+
+    # ==================== 读取 ====================
+
+    def positions(self):
+        """
+        账本中的持仓
+
+        Returns:
+            list: [{'股票名称': str, '股票余额': int, '可用余额': int}, ...]，格式同 get_position
+        """
+        with self._lock:
+            return [{"股票名称": name, **counts} for name, counts in self._positions.items()
+                    if counts["股票余额"] or counts["可用余额"]]
+
+    def position(self, stock_name):
+        """单只股票的持仓，没有持仓时返回 None"""
+        with self._lock:
+            counts = self._positions.get(stock_name)
+            if not counts or not (counts["股票余额"] or counts["可用余额"]):
+                return None
+            return {"股票名称": stock_name, **counts}
+
+    def age(self):
+        """距上次与界面核对的秒数，从未核对时返回 None"""
+        return None if self.synced_at is None else time.time() - self.synced_at
+
+    def needs_sync(self, max_age):
+        """
+        是否需要重新读取界面
+
+        Args:
+            max_age: 账本最长有效时间（秒），None 表示不按时间过期
+        """
+        if self.dirty or self.synced_at is None:
+            return True
+        return max_age is not None and self.age() > max_age
+
+    # ==================== 更新 ====================
+
+    def apply_order(self, result):
+        """
+        记录一笔已确认的委托
+
+        Args:
+            result: buy/sell 的返回值 {'success', 'stock_name', 'amount', 'price', 'type'}，
+                    未成功或没有读到股票名称（名称为代码）时账本标记为需要核对
+        """
+        stock_name = result.get("stock_name") or ""
+        if not result.get("success") or not stock_name or stock_name.isdigit():
+            self.dirty = True
+            return
+        self._apply(stock_name, result["type"], int(result["amount"]), float(result["price"]), 1)
+
+    def apply_cancel(self, order):
+        """
+        记录一笔已撤销的委托（撤单前已部分成交的部分在下次核对时报告）
+
+        Args:
+            order: 委托 {'股票名称', '委托类型', '委托数量', '委托价格'}，格式同 get_avail_withdrawals
+        """
+        self._apply(order["股票名称"], order["委托类型"], int(order["委托数量"]), float(order["委托价格"]), -1)
+
+    def _apply(self, stock_name, trade_type, amount, price, sign):
+        """按委托方向更新持仓和资金，sign 为 -1 时撤销该委托的影响"""
+        with self._lock:
+            counts = self._positions.setdefault(stock_name, {"股票余额": 0, "可用余额": 0})
+            if trade_type == "买入":
+                counts["股票余额"] += sign * amount
+                if self.cash is not None:
+                    self.cash -= sign * amount * price
+            elif trade_type == "卖出":
+                counts["股票余额"] -= sign * amount
+                counts["可用余额"] -= sign * amount
+                if self.cash is not None:
+                    self.cash += sign * amount * price
+            else:
+                self.dirty = True
+
+    def sync(self, holdings, balance=None, open_orders=()):
+        """
+        用界面读取结果重建账本，并与当前账本核对
+
+        Args:
+            holdings: get_position 的返回值
+            balance: get_balance 的返回值，None 时不核对资金
+            open_orders: get_avail_withdrawals 的返回值（未成交委托）
+
+        Returns:
+            list: 不一致项 [{'股票名称': str, '字段': str, '账本': 值, '界面': 值}, ...]，首次同步时为空
+        """
+        positions = {}
+        unreadable = False
+        for item in holdings:
+            if item["股票名称"] in ("解析错误", "未知"):
+                unreadable = True
+                continue
+            positions[item["股票名称"]] = {"股票余额": int(item["股票余额"]), "可用余额": int(item["可用余额"])}
+
+        cash = parse_amount(balance.get("可用")) if balance else None
+        for order in open_orders:
+            counts = positions.setdefault(order["股票名称"], {"股票余额": 0, "可用余额": 0})
+            if order["委托类型"] == "买入":
+                counts["股票余额"] += int(order["委托数量"])
+            elif order["委托类型"] == "卖出":
+                counts["股票余额"] -= int(order["委托数量"])
+                if cash is not None:
+                    cash += int(order["委托数量"]) * float(order["委托价格"])
+
+        with self._lock:
+            discrepancies = []
+            if self.synced_at is not None:
+                for name in sorted(set(self._positions) | set(positions)):
+                    if unreadable and name not in positions:
+                        continue
+                    before = self._positions.get(name, {"股票余额": 0, "可用余额": 0})
+                    after = positions.get(name, {"股票余额": 0, "可用余额": 0})
+                    for field in ("股票余额", "可用余额"):
+                        if before[field] != after[field]:
+                            discrepancies.append({"股票名称": name, "字段": field,
+                                                  "账本": before[field], "界面": after[field]})
+                if (cash is not None and self.cash is not None
+                        and abs(cash - self.cash) > self.cash_tolerance):
+                    discrepancies.append({"股票名称": "", "字段": "可用资金",
+                                          "账本": round(self.cash, 2), "界面": round(cash, 2)})
+
+            self._positions = positions
+            if cash is not None:
+                self.cash = cash
+            self.synced_at = time.time()
+            # 有无法识别的持仓行时下次读取仍然重新核对
+            self.dirty = unreadable
+            self.discrepancies = discrepancies
+        return discrepancies
+
+
+def parse_amount(text):
+    """'180,000.00' -> 180000.0，无法解析时返回 None"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    cleaned = re.sub(r"[^\d.\-]", "", str(text))
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
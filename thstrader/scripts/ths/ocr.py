@@ -0,0 +1,229 @@
+"""
+OCR 辅助工具
+统一 cnocr 不同版本的输入/输出格式，提供进程内共享、首次使用时才加载的模型，
+以及按区域查找屏幕文字的 TextLocator
+"""
+import importlib.util
+import threading
+import time
+from .config import OCR_SEARCH_REGIONS, OCR_LOCATE_INTERVAL, OCR_CACHE_PADDING
+from .trace import span
+
+
+def ocr_available():
+    """是否安装了 cnocr（只检查，不导入）"""
+    return importlib.util.find_spec("cnocr") is not None
+
+
+class SharedReader:
+    """
+    进程内共享的 CnOcr
+
+    接口与 CnOcr 相同（ocr / ocr_for_single_line / ocr_for_single_lines），
+    第一次识别时才加载模型；识别串行执行，可在多个线程和 THSTrader 实例间共用
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Args:
+            **kwargs: 传给 CnOcr 的参数
+        """
+        self.kwargs = kwargs
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """模型是否已加载"""
+        return self._model is not None
+
+    def model(self):
+        """加载（仅一次）并返回 CnOcr 实例"""
+        with self._lock:
+            if self._model is None:
+                from cnocr import CnOcr
+                start = time.time()
+                self._model = CnOcr(**self.kwargs)
+                print(f"✓ OCR 模型已加载 ({time.time() - start:.1f}s)")
+            return self._model
+
+    def ocr(self, image, **kwargs):
+        model = self.model()
+        with self._lock:
+            return model.ocr(image, **kwargs)
+
+    def ocr_for_single_line(self, image):
+        model = self.model()
+        with self._lock:
+            return model.ocr_for_single_line(image)
+
+    def ocr_for_single_lines(self, images, batch_size=1):
+        model = self.model()
+        with self._lock:
+            if not hasattr(model, "ocr_for_single_lines"):
+                return [model.ocr_for_single_line(image) for image in images]
+            return model.ocr_for_single_lines(images, batch_size=batch_size)
+
+
+_shared_reader = None
+_shared_lock = threading.Lock()
+
+
+def shared_reader():
+    """
+    进程内唯一的 SharedReader
+
+    Returns:
+        SharedReader: 未安装 cnocr 时返回 None
+    """
+    global _shared_reader
+    if not ocr_available():
+        return None
+    with _shared_lock:
+        if _shared_reader is None:
+            _shared_reader = SharedReader()
+        return _shared_reader
+
+
+def ocr_input(image):
+    """PIL 图片转为 cnocr 可直接识别的 RGB 数组；路径和数组原样返回"""
+    from PIL import Image
+    import numpy as np
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("RGB"))
+    return image
+
+
+def line_text(result):
+    """
+    单行识别结果转为文本
+
+    兼容 cnocr 1.x 的字符列表 / (字符列表, 置信度) 和 2.x 的 {'text': ..., 'score': ...}
+    """
+    if isinstance(result, dict):
+        return result.get("text", "")
+    if isinstance(result, tuple) and result and isinstance(result[0], (list, str)):
+        result = result[0]
+    return "".join(result) if result else ""
+
+
+def text_boxes(result, offset=(0, 0)):
+    """
+    多行识别结果转为 [(text, (x1, y1, x2, y2)), ...]
+
+    兼容 cnocr 2.x 的 {'text', 'position'} 和 [box, text, score] 两种格式，
+    box 可以是四个顶点或 [x1, y1, x2, y2]
+
+    Args:
+        result: reader.ocr() 的返回值
+        offset: 识别图片在屏幕上的左上角，用于换算回屏幕坐标
+    """
+    import numpy as np
+    boxes = []
+    for item in result or []:
+        if isinstance(item, dict):
+            text, box = item.get("text", ""), item.get("position")
+        elif isinstance(item, (list, tuple)) and len(item) >= 2:
+            box, text = item[0], item[1]
+        else:
+            continue
+        if box is None or not isinstance(text, str):
+            continue
+        box = np.asarray(box, dtype=float)
+        if box.ndim == 2:
+            x1, y1 = box.min(axis=0)
+            x2, y2 = box.max(axis=0)
+        elif box.size == 4:
+            x1, y1, x2, y2 = box
+        else:
+            continue
+        ox, oy = offset
+        boxes.append((text, (int(x1) + ox, int(y1) + oy, int(x2) + ox, int(y2) + oy)))
+    return boxes
+
+
+class TextLocator:
+    """
+    按区域查找屏幕上的文字
+
+    查找顺序: 上次命中的位置（小图单行识别校验）-> OCR_SEARCH_REGIONS 中的区域 -> 全屏
+    """
+
+    def __init__(self, device, reader, regions=None):
+        """
+        Args:
+            device: Device
+            reader: CnOcr 实例
+            regions: {文字: [(x1, y1, x2, y2), ...]}，默认 OCR_SEARCH_REGIONS
+        """
+        self.device = device
+        self.reader = reader
+        self.regions = OCR_SEARCH_REGIONS if regions is None else regions
+        self._cache = {}
+
+    def locate(self, text, timeout=3):
+        """
+        查找文字的中心坐标
+
+        Args:
+            text: 要查找的文字（包含即命中）
+            timeout: 最长查找时间（秒）
+
+        Returns:
+            tuple: (x, y)，找不到返回 None
+        """
+        if not self.reader:
+            return None
+        with span("ocr_locate", text=text):
+            return self._locate(text, timeout)
+
+    def _locate(self, text, timeout):
+        deadline = time.time() + timeout
+        while True:
+            box = self._find(text, self.device.screenshot())
+            if box:
+                self._cache[text] = box
+                return (box[0] + box[2]) // 2, (box[1] + box[3]) // 2
+            if time.time() + OCR_LOCATE_INTERVAL > deadline:
+                return None
+            time.sleep(OCR_LOCATE_INTERVAL)
+
+    def forget(self, text=None):
+        """清除缓存的位置"""
+        if text is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(text, None)
+
+    def _find(self, text, screen):
+        cached = self._cache.get(text)
+        if cached and self._verify(text, screen, cached):
+            return cached
+        for region in self.regions.get(text, ()):
+            box = self._search(text, screen, region)
+            if box:
+                return box
+        return self._search(text, screen, None)
+
+    def _verify(self, text, screen, box):
+        x1, y1, x2, y2 = box
+        pad = OCR_CACHE_PADDING
+        crop = screen.crop((max(0, x1 - pad), max(0, y1 - pad),
+                            min(screen.width, x2 + pad), min(screen.height, y2 + pad)))
+        try:
+            return text in line_text(self.reader.ocr_for_single_line(ocr_input(crop)))
+        except Exception:
+            return False
+
+    def _search(self, text, screen, region):
+        image = screen if region is None else screen.crop(region)
+        offset = (0, 0) if region is None else region[:2]
+        try:
+            boxes = text_boxes(self.reader.ocr(ocr_input(image)), offset)
+        except Exception as e:
+            print(f"OCR Find Error: {e}")
+            return None
+        for found, box in boxes:
+            if text in found:
+                return box
+        return None
@@ -0,0 +1,218 @@
+"""
+OCR 工作进程
+常驻进程加载一份 cnocr 模型，同一台机器上的多个 THSTrader 进程通过本地 socket 共用，
+省去每个进程加载模型的时间和内存
+
+协议（JSON-lines，每行一个请求/响应，图片以 base64 PNG 传输）:
+    {"id": 1, "method": "ocr_for_single_lines", "params": [[图片, ...], 32]}
+    -> {"id": 1, "result": [{"text": "海康威视", "score": 0.99}, ...]}
+    {"id": 2, "method": "ocr", "params": [图片]}
+    -> {"id": 2, "result": [{"text": "交易", "score": 0.98, "position": [[x, y], ...]}, ...]}
+"""
+import socketserver
+import threading
+from .config import OCR_ADDRESS, OCR_CONNECT_TIMEOUT, OCR_REQUEST_TIMEOUT
+from .ocr import shared_reader, line_text
+from .rpc import (encode_value, decode_value, send_message, recv_message,
+                  JsonLineServer, JsonLineClient)
+
+# 允许远程调用的识别方法
+METHODS = ("ocr", "ocr_for_single_line", "ocr_for_single_lines")
+
+
+class OcrWorker:
+    """OCR 工作进程服务端"""
+
+    def __init__(self, reader=None):
+        """
+        Args:
+            reader: 识别器，默认进程内共享的 SharedReader
+        """
+        self.reader = reader or shared_reader()
+        if self.reader is None:
+            raise RuntimeError("cnocr 未安装，无法启动 OCR 工作进程")
+
+    def handle(self, request):
+        """
+        执行一条请求
+
+        Args:
+            request: 请求 dict
+
+        Returns:
+            dict: 响应
+        """
+        req_id = request.get("id")
+        method = request.get("method")
+        if method == "ping":
+            return {"id": req_id, "result": "pong"}
+        if method not in METHODS:
+            return {"id": req_id, "error": f"未知方法: {method}"}
+        try:
+            params = decode_value(request.get("params") or [])
+            if method == "ocr_for_single_lines":
+                images, batch_size = params[0], (params[1] if len(params) > 1 else 1)
+                results = self.reader.ocr_for_single_lines([_array(i) for i in images], batch_size=batch_size)
+                result = [_line(r) for r in results]
+            elif method == "ocr_for_single_line":
+                result = _line(self.reader.ocr_for_single_line(_array(params[0])))
+            else:
+                result = self.reader.ocr(_array(params[0]))
+            return {"id": req_id, "result": encode_value(_plain(result))}
+        except Exception as e:
+            return {"id": req_id, "error": f"{type(e).__name__}: {e}"}
+
+    def serve_forever(self, address=OCR_ADDRESS, preload=True):
+        """
+        启动工作进程并阻塞
+
+        Args:
+            address: 监听地址 (host, port)，默认仅本机
+            preload: 启动时加载模型，第一个请求不必等待
+        """
+        if preload and hasattr(self.reader, "model"):
+            self.reader.model()
+        worker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = recv_message(self.rfile)
+                    except ValueError as e:
+                        # 不是 JSON-lines 客户端，断开连接，不执行后续行
+                        send_message(self.wfile, {"id": None, "error": f"无效请求: {e}"})
+                        break
+                    if request is None:
+                        break
+                    if not isinstance(request, dict):
+                        send_message(self.wfile, {"id": None, "error": "无效请求: 不是 JSON 对象"})
+                        break
+                    send_message(self.wfile, worker.handle(request))
+
+        with JsonLineServer(address, Handler) as server:
+            print(f"✓ OCR 工作进程已就绪: {address[0]}:{address[1]}")
+            server.serve_forever()
+
+
+class RemoteReader:
+    """
+    通过 OCR 工作进程识别，接口与 CnOcr 相同
+
+    工作进程断开时回退到进程内的 SharedReader（未安装 cnocr 时抛出异常）
+    """
+
+    def __init__(self, address=OCR_ADDRESS, connect_timeout=OCR_CONNECT_TIMEOUT,
+                 timeout=OCR_REQUEST_TIMEOUT):
+        """
+        Args:
+            address: 工作进程地址
+            connect_timeout: 连接和握手（ping）超时（秒）
+            timeout: 单次识别请求的超时（秒）
+
+        Raises:
+            OSError: 工作进程未启动，或端口上的服务没有按本协议应答
+        """
+        self.address = address
+        self._conn = JsonLineClient(address, connect_timeout, timeout=connect_timeout)
+        self._ids = iter(range(1, 1 << 62))
+        self._lock = threading.Lock()
+        self._fallback = None
+        try:
+            pong = self._conn.request({"id": 0, "method": "ping"})
+        except ValueError as e:
+            self.close()
+            raise ConnectionError(f"{address[0]}:{address[1]} 不是 OCR 工作进程: {e}")
+        if not isinstance(pong, dict) or pong.get("result") != "pong":
+            self.close()
+            raise ConnectionError(f"{address[0]}:{address[1]} 不是 OCR 工作进程: {pong!r}")
+        self._conn.settimeout(timeout)
+
+    def ocr(self, image):
+        return self._call("ocr", _image(image))
+
+    def ocr_for_single_line(self, image):
+        return self._call("ocr_for_single_line", _image(image))
+
+    def ocr_for_single_lines(self, images, batch_size=1):
+        return self._call("ocr_for_single_lines", [_image(i) for i in images], batch_size)
+
+    def close(self):
+        """断开与工作进程的连接"""
+        self._conn.close()
+
+    def _call(self, method, *params):
+        if self._fallback is None:
+            with self._lock:
+                req_id = next(self._ids)
+            try:
+                response = self._conn.request({"id": req_id, "method": method, "params": encode_value(list(params))})
+            except (OSError, ValueError) as e:
+                # 断开、超时或应答错乱（连接已关闭），之后都用进程内模型
+                self._fallback = shared_reader()
+                if self._fallback is None:
+                    raise
+                print(f"⚠️ OCR 工作进程断开，改用进程内模型: {e}")
+            else:
+                if "error" in response:
+                    raise RuntimeError(response["error"])
+                return decode_value(response.get("result"))
+        return getattr(self._fallback, method)(*params)
+
+
+def attach_reader(address=OCR_ADDRESS):
+    """
+    连接本地 OCR 工作进程
+
+    Args:
+        address: 工作进程地址
+
+    Returns:
+        RemoteReader: 工作进程未启动或端口上不是工作进程时返回 None
+    """
+    try:
+        reader = RemoteReader(address)
+    except OSError:
+        return None
+    print(f"✓ 已连接 OCR 工作进程: {address[0]}:{address[1]}")
+    return reader
+
+
+def _image(image):
+    """数组转为 PIL 图片以便传输，路径原样发送（同一台机器）"""
+    import numpy as np
+    from PIL import Image
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    return image
+
+
+def _array(image):
+    """收到的图片转为 cnocr 输入"""
+    import numpy as np
+    from PIL import Image
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert("RGB"))
+    return image
+
+
+def _line(result):
+    """单行识别结果统一为 cnocr 2.x 的 {'text', 'score'} 格式"""
+    score = result.get("score") if isinstance(result, dict) else None
+    if isinstance(result, tuple) and len(result) == 2 and not isinstance(result[1], str):
+        score = result[1]
+    return {"text": line_text(result), "score": score}
+
+
+def _plain(value):
+    """识别结果中的 numpy 类型转为 JSON 可序列化的值"""
+    import numpy as np
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
@@ -0,0 +1,203 @@
+"""
+页面状态机
+从一次层级快照判断当前所在页面，按最短路径在页面之间跳转，
+已经在目标页面时不做任何导航
+"""
+from collections import deque
+from .config import APP_PACKAGE, PAGE_SIGNATURES, PAGE_MAX_STEPS, PAGE_BACK_LIMIT
+from .trace import span
+
+UNKNOWN = "unknown"
+OTHER_APP = "other_app"
+# 买入和卖出表单在层级上无法可靠区分，classify 统一返回 TRADE_FORM，
+# PageNavigator 记住是从哪个按钮进入的
+TRADE_FORM = "trade_form"
+FORM_STATES = ("buy_form", "sell_form")
+
+# 页面跳转: {起点: {终点: 动作名}}，动作由 PageNavigator 的 actions 提供
+# 应用内无法识别的页面（UNKNOWN）不在表中: PageNavigator 先按返回键退回已知页面，
+# 仍无法识别时用 "restart" 动作重启应用
+PAGE_TRANSITIONS = {
+    OTHER_APP: {"home": "launch"},
+    "home": {"trade_tab": "tap_trade_tab", "moni": "tap_moni_icon", "favorites": "tap_favorites_tab"},
+    "trade_tab": {"moni": "tap_moni_tab", "favorites": "tap_favorites_tab"},
+    "moni": {
+        "buy_form": "tap_buy",
+        "sell_form": "tap_sell",
+        "holdings": "tap_holdings",
+        "withdrawals": "tap_withdrawals",
+        "trade_tab": "tap_trade_tab",
+        "favorites": "tap_favorites_tab",
+    },
+    "buy_form": {"moni": "back"},
+    "sell_form": {"moni": "back"},
+    TRADE_FORM: {"moni": "back"},
+    "holdings": {"moni": "back"},
+    "withdrawals": {"moni": "back"},
+    "favorites": {"trade_tab": "tap_trade_tab"},
+}
+
+
+def classify(snap, signatures=PAGE_SIGNATURES, package=APP_PACKAGE):
+    """
+    判断快照所在的页面
+
+    Args:
+        snap: hierarchy.Snapshot
+        signatures: 页面特征列表，按优先级排列，见 config.PAGE_SIGNATURES
+        package: 应用包名
+
+    Returns:
+        str: 页面名，不在应用内为 OTHER_APP，无法识别为 UNKNOWN
+    """
+    if not any(node.attrib.get("package") == package for node in snap.nodes):
+        return OTHER_APP
+    for signature in signatures:
+        if not all(snap.exists(**s) for s in signature.get("all", ())):
+            continue
+        if signature.get("any") and not snap.exists_any(*signature["any"]):
+            continue
+        if any(snap.exists(**s) for s in signature.get("none", ())):
+            continue
+        return signature["state"]
+    return UNKNOWN
+
+
+def shortest_path(src, dst, transitions=PAGE_TRANSITIONS, blocked=()):
+    """
+    广度优先搜索页面间的最短路径
+
+    Args:
+        src: 起点页面
+        dst: 目标页面
+        transitions: 跳转表
+        blocked: 本次不可用的 (起点, 终点) 边
+
+    Returns:
+        list: [(动作名, 下一页面), ...]，不可达为 None
+    """
+    if src == dst:
+        return []
+    queue = deque([src])
+    previous = {src: None}
+    while queue:
+        state = queue.popleft()
+        for nxt, action in transitions.get(state, {}).items():
+            if nxt in previous or (state, nxt) in blocked:
+                continue
+            previous[nxt] = (state, action)
+            if nxt == dst:
+                path = []
+                while previous[nxt] is not None:
+                    state, action = previous[nxt]
+                    path.append((action, nxt))
+                    nxt = state
+                return path[::-1]
+            queue.append(nxt)
+    return None
+
+
+class PageNavigator:
+    """
+    页面导航器
+
+    示例:
+        nav = PageNavigator(device, {"launch": ..., "back": ..., ...})
+        nav.goto("holdings")
+    """
+
+    def __init__(self, device, actions, close_dialogs=None,
+                 signatures=PAGE_SIGNATURES, transitions=PAGE_TRANSITIONS):
+        """
+        Args:
+            device: Device
+            actions: {动作名: 无参函数}，返回 False 表示动作未能执行；
+                需要 "back"，可选 "restart"（强制重启应用，最后的恢复手段）
+            close_dialogs: 关闭弹窗的函数，每次判断页面前调用
+            signatures: 页面特征列表
+            transitions: 跳转表
+        """
+        self.device = device
+        self.actions = actions
+        self.close_dialogs = close_dialogs
+        self.signatures = signatures
+        self.transitions = transitions
+        self._form = None
+
+    def current(self):
+        """当前页面（先关闭弹窗，再用一次快照判断）"""
+        if self.close_dialogs:
+            self.close_dialogs()
+        state = classify(self.device.snapshot(), self.signatures)
+        if state == TRADE_FORM:
+            return self._form or TRADE_FORM
+        self._form = None
+        return state
+
+    def goto(self, target, max_steps=PAGE_MAX_STEPS):
+        """
+        跳转到目标页面
+
+        Args:
+            target: 目标页面名
+            max_steps: 最多执行的动作数
+
+        Returns:
+            bool: 是否到达
+        """
+        with span("navigate", target=target):
+            return self._goto(target, max_steps)
+
+    def _goto(self, target, max_steps):
+        blocked = set()
+        restarted = False
+        state = self.current()
+        for _ in range(max_steps):
+            if state == target:
+                return True
+            if state == UNKNOWN:
+                state = self._back_out()
+                if state != UNKNOWN:
+                    continue
+            path = shortest_path(state, target, self.transitions, blocked)
+            if not path and state != UNKNOWN and (state, "home") not in blocked:
+                # 无路可走时重新启动应用再试
+                path = [("launch", "home")]
+            if not path:
+                if restarted or "restart" not in self.actions:
+                    break
+                # 最后的手段: 强制重启应用，回到首页重新规划
+                print(f"⚠️ 无法从 {state} 到达 {target}，重启应用")
+                restarted = True
+                self.actions["restart"]()
+                blocked.clear()
+                state = self.current()
+                continue
+            action, expected = path[0]
+            print(f"页面跳转: {state} -> {expected} ({action})")
+            if self.actions[action]() is False:
+                blocked.add((state, expected))
+            elif expected in FORM_STATES:
+                self._form = expected
+            new_state = self.current()
+            if new_state == state:
+                blocked.add((state, expected))
+            state = new_state
+        print(f"⚠️ 未能到达页面 {target}，当前: {state}")
+        return state == target
+
+    def _back_out(self, limit=PAGE_BACK_LIMIT):
+        """
+        从应用内无法识别的页面（个股详情、资讯等）按返回键退回，每按一次重新判断页面
+
+        Returns:
+            str: 退回后的页面，仍无法识别时为 UNKNOWN
+        """
+        state = UNKNOWN
+        for _ in range(limit):
+            print("页面未识别，按返回键")
+            self.actions["back"]()
+            state = self.current()
+            if state != UNKNOWN:
+                break
+        return state
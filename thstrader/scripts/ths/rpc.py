@@ -0,0 +1,150 @@
+"""
+本地 JSON-lines RPC 工具
+每条消息为一行 UTF-8 JSON，图片以 base64 PNG 传输
+供设备代理（broker）和常驻服务（serve）共用
+"""
+import base64
+import io
+import json
+import socket
+import socketserver
+import threading
+
+
+def encode_value(value):
+    """
+    将返回值转换为可 JSON 序列化的结构
+
+    Args:
+        value: 任意值，支持基本类型、list/tuple/dict、PIL.Image、bytes
+
+    Returns:
+        可 JSON 序列化的值
+
+    Raises:
+        TypeError: 值无法序列化
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): encode_value(v) for k, v in value.items()}
+    from PIL import Image
+    if isinstance(value, Image.Image):
+        buf = io.BytesIO()
+        value.save(buf, format="PNG")
+        return {"__image__": base64.b64encode(buf.getvalue()).decode("ascii")}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def decode_value(value):
+    """encode_value 的逆操作"""
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    if isinstance(value, dict):
+        if "__image__" in value:
+            from PIL import Image
+            img = Image.open(io.BytesIO(base64.b64decode(value["__image__"])))
+            img.load()
+            return img
+        if "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        return {k: decode_value(v) for k, v in value.items()}
+    return value
+
+
+def send_message(wfile, message):
+    """写入一条 JSON-lines 消息"""
+    wfile.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+def recv_message(rfile):
+    """
+    读取一条 JSON-lines 消息
+
+    Returns:
+        dict: 消息内容，连接关闭时返回 None
+
+    Raises:
+        ValueError: 不是 JSON，或为 null（与连接关闭无法区分）
+    """
+    line = rfile.readline()
+    if not line:
+        return None
+    message = json.loads(line.decode("utf-8"))
+    if message is None:
+        raise ValueError("消息为 null")
+    return message
+
+
+def parse_address(text, default):
+    """解析 "host:port" 形式的地址"""
+    if not text:
+        return default
+    host, _, port = text.rpartition(":")
+    return (host or default[0], int(port))
+
+
+class JsonLineServer(socketserver.ThreadingTCPServer):
+    """只监听本地地址的多线程 JSON-lines 服务器"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class JsonLineClient:
+    """
+    JSON-lines 客户端，一个连接上的请求按顺序执行（线程安全）
+    """
+
+    def __init__(self, address, connect_timeout=0.3, timeout=None):
+        """
+        Args:
+            address: (host, port)
+            connect_timeout: 连接超时（秒），服务未启动时快速失败
+            timeout: 等待响应的超时（秒），None 表示一直等待
+        """
+        self.address = address
+        self._sock = socket.create_connection(address, timeout=connect_timeout)
+        self._sock.settimeout(timeout)
+        self._rfile = self._sock.makefile("rb")
+        self._wfile = self._sock.makefile("wb")
+        self._lock = threading.Lock()
+
+    def request(self, message):
+        """
+        发送请求并等待响应
+
+        Returns:
+            dict: 响应消息
+
+        Raises:
+            ConnectionError: 连接已断开
+            TimeoutError: 超时未收到响应（连接随之关闭，迟到的响应不会被当作下一个请求的结果）
+            ValueError: 响应不是 JSON（对端不是本协议的服务，连接随之关闭）
+        """
+        with self._lock:
+            try:
+                send_message(self._wfile, message)
+                response = recv_message(self._rfile)
+            except (OSError, ValueError):
+                self.close()
+                raise
+        if response is None:
+            raise ConnectionError(f"连接已关闭: {self.address}")
+        return response
+
+    def settimeout(self, timeout):
+        """修改等待响应的超时（秒）"""
+        self._sock.settimeout(timeout)
+
+    def close(self):
+        """关闭连接"""
+        for f in (self._rfile, self._wfile, self._sock):
+            try:
+                f.close()
+            except Exception:
+                pass
@@ -0,0 +1,181 @@
+"""
+截图日志
+交易路径上只抓取内存中的原始截图并放入队列，由后台线程压缩编码（JPEG/WebP）后
+写入按数量轮转的目录；支持按委托抽样，失败截图总是保留，
+未记录的截图在内存中保留最近几张，失败时连同失败前的画面一起写入
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from .config import (SCREEN_LOG_DIR, SCREEN_LOG_FORMAT, SCREEN_LOG_QUALITY, SCREEN_LOG_MAX_FILES,
+                     SCREEN_LOG_QUEUE_SIZE, SCREEN_LOG_MODE, SCREEN_LOG_EVERY, SCREEN_LOG_CONTEXT)
+
+_EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+_MODES = ("all", "every", "failure", "off")
+
+
+class ScreenLogger:
+    """
+    异步截图日志
+
+    示例:
+        logger = ScreenLogger(device, mode="every", every=10)
+        logger.begin_order()
+        logger.log("buy_input_done")
+        logger.log("buy_verify_fail", failure=True)
+    """
+
+    def __init__(self, device, directory=SCREEN_LOG_DIR, fmt=SCREEN_LOG_FORMAT, quality=SCREEN_LOG_QUALITY,
+                 max_files=SCREEN_LOG_MAX_FILES, mode=SCREEN_LOG_MODE, every=SCREEN_LOG_EVERY,
+                 queue_size=SCREEN_LOG_QUEUE_SIZE, context=SCREEN_LOG_CONTEXT, describe=None):
+        """
+        Args:
+            device: Device
+            directory: 截图目录
+            fmt: "JPEG"、"WEBP" 或 "PNG"
+            quality: JPEG/WebP 压缩质量
+            max_files: 目录中最多保留的截图数，超出删除最旧的
+            mode: "all" 全部记录；"every" 每 every 笔委托记录一笔；"failure" 只记录失败；"off" 不记录
+            every: mode 为 "every" 时的抽样间隔
+            queue_size: 待写入队列长度，写入跟不上时丢弃新截图而不阻塞交易
+            context: 未记录的截图在内存中保留的张数，失败时一起写入；0 表示未记录时不截图
+            describe: image -> str，在后台线程中调用，返回的文字随截图打印（如 OCR 全文）
+        """
+        if mode not in _MODES:
+            raise ValueError(f"未知截图模式: {mode}，可选 {_MODES}")
+        self.device = device
+        self.directory = directory
+        self.format = fmt.upper()
+        self.quality = quality
+        self.max_files = max_files
+        self.mode = mode
+        self.every = max(1, every)
+        self.describe = describe
+        self.orders = 0
+        self.dropped = 0
+        self._sampled = mode == "all"
+        self._recent = deque(maxlen=max(0, context))   # (tag, image, time)
+        self._seq = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def begin_order(self):
+        """开始一笔新委托，按抽样设置决定本笔的非失败截图是否记录"""
+        self.orders += 1
+        if self.mode == "all":
+            self._sampled = True
+        elif self.mode == "every":
+            self._sampled = (self.orders - 1) % self.every == 0
+        else:
+            self._sampled = False
+        self._recent.clear()
+
+    def log(self, tag="info", failure=False):
+        """
+        抓取当前屏幕，交给后台线程写入
+
+        Args:
+            tag: 截图标签，出现在文件名中
+            failure: 是否为失败现场（除 "off" 外总是记录）
+
+        Returns:
+            str: 将要写入的文件路径，未记录返回 None
+        """
+        if self.mode == "off":
+            return None
+        recording = failure or self._sampled
+        if not recording and not self._recent.maxlen:
+            return None
+        try:
+            image = self.device.screenshot()
+        except Exception as e:
+            print(f"⚠️ [{tag}] 截图失败: {e}")
+            return None
+        now = time.time()
+
+        if not recording:
+            # 只在内存中保留，失败时再写入
+            self._recent.append((tag, image, now))
+            return None
+        if failure:
+            # 失败前的画面
+            while self._recent:
+                self._enqueue(*self._recent.popleft())
+        return self._enqueue(tag, image, now)
+
+    def _enqueue(self, tag, image, now):
+        self._seq += 1
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+        name = f"{stamp}_{int(now * 1000) % 1000:03d}_{self._seq:04d}_{tag}{_EXTENSIONS.get(self.format, '.img')}"
+        path = os.path.join(self.directory, name)
+        try:
+            self._queue.put_nowait((tag, image, path))
+        except queue.Full:
+            self.dropped += 1
+            print(f"⚠️ [{tag}] 截图队列已满，丢弃")
+            return None
+        self._ensure_worker()
+        print(f"📸 [{tag}] 已截图: {path}")
+        return path
+
+    def flush(self, timeout=None):
+        """
+        等待队列中的截图写完
+
+        Args:
+            timeout: 最长等待时间（秒），None 为一直等待
+
+        Returns:
+            bool: 是否全部写完
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None:
+                # 进程退出前把已抓取的截图写完
+                atexit.register(self.flush, 10)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ScreenLogger", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            tag, image, path = self._queue.get()
+            try:
+                self._write(image, path)
+                if self.describe:
+                    text = self.describe(image)
+                    if text:
+                        print(f"📝 [{tag}] 屏幕文字: {text[:100]}...")
+            except Exception as e:
+                print(f"⚠️ [{tag}] 截图写入失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, image, path):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.format == "PNG":
+            image.save(path, "PNG")
+        else:
+            image.convert("RGB").save(path, self.format, quality=self.quality)
+        self._rotate()
+
+    def _rotate(self):
+        """只保留最新的 max_files 张截图（文件名以时间开头，按名称排序即按时间排序）"""
+        extensions = tuple(_EXTENSIONS.values())
+        files = sorted(f for f in os.listdir(self.directory) if f.endswith(extensions))
+        for name in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,177 @@
+"""
+THSTrader 常驻服务
+保持 THSTrader 实例、OCR 模型和当前页面状态常驻，通过 JSON-lines 接收请求，
+避免每条命令重新加载 cnocr、连接设备和从头导航
+
+请求: {"id": 1, "method": "buy", "params": {"stock_code": "002415", "amount": 100, "price": 10.0}}
+      params 也可以是位置参数列表
+响应: {"id": 1, "result": {...}, "elapsed": 3.21}
+      {"id": 1, "error": "..."}
+
+端口模式下交易类请求（TRADE_METHODS）需要携带令牌: {"id": 1, "method": "buy", "token": "...", ...}；
+收到无法解析的行（如浏览器发来的 HTTP 请求）时立即断开连接
+"""
+import contextlib
+import hmac
+import secrets
+import socketserver
+import sys
+import threading
+import time
+from .config import SERVE_TOKEN
+from .rpc import encode_value, send_message, recv_message, JsonLineServer
+
+# 允许远程调用的 THSTrader 方法
+METHODS = (
+    "get_balance",
+    "get_position",
+    "get_avail_withdrawals",
+    "get_ledger_position",
+    "reconcile",
+    "buy",
+    "sell",
+    "submit_basket",
+    "withdraw",
+    "cancel_all",
+    "add_favorite",
+    "remove_favorite",
+    "get_favorite_code",
+    "buy_from_favorite",
+    "sell_from_favorite",
+)
+
+# 会改变账户或应用状态的请求，端口模式下需要令牌
+TRADE_METHODS = (
+    "buy",
+    "sell",
+    "submit_basket",
+    "withdraw",
+    "cancel_all",
+    "add_favorite",
+    "remove_favorite",
+    "buy_from_favorite",
+    "sell_from_favorite",
+    "shutdown",
+)
+
+
+class TraderServer:
+    """
+    在单个 THSTrader 上串行执行请求的常驻服务
+    """
+
+    def __init__(self, trader, token=SERVE_TOKEN):
+        """
+        Args:
+            trader: 已初始化的 THSTrader
+            token: 交易类请求的令牌，None 时端口模式启动时随机生成（stdio 模式不检查）
+        """
+        self.trader = trader
+        self.token = token
+        self._require_token = False
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def handle(self, request):
+        """
+        执行一条请求
+
+        Args:
+            request: 请求 dict（其他 JSON 值返回错误响应）
+
+        Returns:
+            dict: 响应
+        """
+        if not isinstance(request, dict):
+            return {"id": None, "error": "无效请求: 不是 JSON 对象"}
+        req_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+
+        if method in TRADE_METHODS and self._require_token and not self._token_ok(request.get("token")):
+            return {"id": req_id, "error": "令牌无效，交易类请求需要携带 token"}
+        if method == "ping":
+            return {"id": req_id, "result": "pong"}
+        if method == "methods":
+            return {"id": req_id, "result": list(METHODS)}
+        if method == "shutdown":
+            self._stopped.set()
+            return {"id": req_id, "result": "bye"}
+        if method not in METHODS:
+            return {"id": req_id, "error": f"未知方法: {method}"}
+
+        start = time.time()
+        try:
+            with self._lock:
+                func = getattr(self.trader, method)
+                if isinstance(params, list):
+                    result = func(*params)
+                else:
+                    result = func(**params)
+            return {"id": req_id, "result": encode_value(result),
+                    "elapsed": round(time.time() - start, 3)}
+        except Exception as e:
+            return {"id": req_id, "error": f"{type(e).__name__}: {e}",
+                    "elapsed": round(time.time() - start, 3)}
+
+    def _token_ok(self, token):
+        return isinstance(token, str) and self.token is not None and hmac.compare_digest(token, self.token)
+
+    def serve_stdio(self, stdin=None, stdout=None):
+        """
+        从 stdin 读取请求，向 stdout 写响应
+
+        THSTrader 的日志输出被重定向到 stderr，保证 stdout 只有协议数据
+        """
+        stdin = stdin or sys.stdin.buffer
+        stdout = stdout or sys.stdout.buffer
+        with contextlib.redirect_stdout(sys.stderr):
+            print("✓ THSTrader 服务已就绪 (stdio)")
+            while not self._stopped.is_set():
+                try:
+                    request = recv_message(stdin)
+                except ValueError as e:
+                    # 协议已错位，不再执行后续内容
+                    send_message(stdout, {"id": None, "error": f"无效请求: {e}"})
+                    break
+                if request is None:
+                    break
+                # 不是对象的 JSON 值（如 [1]）由 handle 返回错误，服务继续运行
+                send_message(stdout, self.handle(request))
+
+    def serve_socket(self, address):
+        """
+        在本地 TCP 地址上提供服务，多个客户端共享同一个 THSTrader
+
+        Args:
+            address: (host, port)
+        """
+        if self.token is None:
+            self.token = secrets.token_urlsafe(16)
+            print(f"✓ 访问令牌（交易类请求需携带 \"token\"）: {self.token}")
+        self._require_token = True
+        server_self = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = recv_message(self.rfile)
+                    except ValueError as e:
+                        # 不是 JSON-lines 客户端（如浏览器发来的 HTTP 请求），断开连接，
+                        # 不执行后续行
+                        send_message(self.wfile, {"id": None, "error": f"无效请求: {e}"})
+                        break
+                    if request is None:
+                        break
+                    if not isinstance(request, dict):
+                        send_message(self.wfile, {"id": None, "error": "无效请求: 不是 JSON 对象"})
+                        break
+                    send_message(self.wfile, server_self.handle(request))
+                    if server_self._stopped.is_set():
+                        threading.Thread(target=self.server.shutdown, daemon=True).start()
+                        break
+
+        with JsonLineServer(address, Handler) as server:
+            print(f"✓ THSTrader 服务已就绪: {address[0]}:{address[1]}")
+            server.serve_forever()
@@ -0,0 +1,176 @@
+"""
+耗时追踪
+用嵌套的计时区间（span）记录每个操作的耗时，写入 JSON-lines 文件并按调用路径汇总；
+未启用时 span 只做一次判断，不计时也不写文件
+"""
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """
+    耗时追踪器
+
+    示例:
+        tracer.start("trace.jsonl")
+        with tracer.span("buy", code="002415"):
+            with tracer.span("navigate"):
+                ...
+        print(tracer.format_summary())
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # {调用路径: [次数, 总耗时, 最大耗时]}，按首次出现的顺序
+        self._stats = {}
+
+    def start(self, path=None):
+        """
+        开始追踪
+
+        Args:
+            path: JSON-lines 输出文件（追加写入），None 时只在内存中汇总
+        """
+        self.stop()
+        self.path = path
+        if path:
+            self._file = open(path, "a", encoding="utf-8")
+        self.enabled = True
+
+    def stop(self):
+        """停止追踪并关闭输出文件，已有的汇总保留"""
+        self.enabled = False
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def reset(self):
+        """清空汇总"""
+        with self._lock:
+            self._stats = {}
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        计时区间，可嵌套；同一线程内的外层区间即为父区间
+
+        Args:
+            name: 区间名，如 "navigate"、"input_price"
+            **attrs: 附加到记录中的字段
+        """
+        if not self.enabled:
+            yield
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(name)
+        path = "/".join(stack)
+        with self._lock:
+            # 进入时登记，汇总表中父区间排在子区间之前
+            self._stats.setdefault(path, [0, 0.0, 0.0])
+        started = time.time()
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - t0
+            stack.pop()
+            record = {
+                "name": name,
+                "path": path,
+                "depth": len(stack),
+                "start": round(started, 3),
+                "duration": round(duration, 4),
+                "thread": threading.current_thread().name,
+            }
+            if attrs:
+                record["attrs"] = attrs
+            if error:
+                record["error"] = error
+            self._emit(record)
+
+    def summary(self):
+        """
+        按调用路径汇总
+
+        Returns:
+            list: [{'path', 'name', 'depth', 'count', 'total', 'mean', 'max'}, ...]，
+                按调用路径首次出现的顺序
+        """
+        with self._lock:
+            stats = list(self._stats.items())
+        rows = []
+        for path, (count, total, longest) in stats:
+            if not count:
+                continue
+            parts = path.split("/")
+            rows.append({
+                "path": path,
+                "name": parts[-1],
+                "depth": len(parts) - 1,
+                "count": count,
+                "total": round(total, 3),
+                "mean": round(total / count, 3),
+                "max": round(longest, 3),
+            })
+        return rows
+
+    def format_summary(self):
+        """汇总表格（按调用层级缩进）"""
+        rows = self.summary()
+        if not rows:
+            return "（无追踪记录）"
+        width = max(40, max(len(r["name"]) + 2 * r["depth"] for r in rows) + 2)
+        lines = [f"{'操作':<{width - 2}}{'次数':>6}{'总耗时':>10}{'平均':>10}{'最大':>10}"]
+        for r in rows:
+            label = "  " * r["depth"] + r["name"]
+            lines.append(f"{label:<{width}}{r['count']:>8}{r['total']:>13.3f}{r['mean']:>12.3f}{r['max']:>12.3f}")
+        return "\n".join(lines)
+
+    def _emit(self, record):
+        with self._lock:
+            stat = self._stats.setdefault(record["path"], [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += record["duration"]
+            stat[2] = max(stat[2], record["duration"])
+            if self._file:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+
+# 进程内共享的追踪器
+tracer = Tracer()
+span = tracer.span
+
+
+def traced(name=None):
+    """
+    把函数调用记录为一个计时区间的装饰器
+
+    Args:
+        name: 区间名，默认使用函数名
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -2,142 +2,230 @@
 THSTrader 核心类
 适配新版同花顺（11.46.04）
 """
+import re
 import time
-import uiautomator2 as u2
-from PIL import Image
-from .config import UI_ELEMENTS, COORDINATES, XPATHS, APP_PACKAGE, DEFAULT_WAIT, MAX_HOLDINGS, INPUT_CLEAR_COUNT
-
-try:
-    from cnocr import CnOcr
-    HAS_OCR = True
-except ImportError:
-    HAS_OCR = False
-    print("警告: cnocr 未安装，OCR 功能将不可用")
+from .config import (UI_ELEMENTS, XPATHS, APP_PACKAGE, ROW_FIELD_IDS, DEFAULT_WAIT,
+                     INPUT_CLEAR_COUNT, DIALOG_RULES, DIALOG_MAX_ROUNDS,
+                     OCR_BATCH_SIZE, INPUT_VERIFY_TIMEOUT, LEDGER_MAX_AGE,
+                     CANCEL_CONFIRM_TIMEOUT, SCREEN_LOG_DESCRIBE)
+from .device import Device
+from .geometry import profile_for
+from .broker import attach
+from .cache import ReadCache
+from .ledger import PositionLedger
+from .hierarchy import RuleSet, row_fields
+from .harvester import RecyclerHarvester
+from .ocr import ocr_input, line_text, TextLocator, ocr_available, shared_reader
+from .ocr_worker import attach_reader
+from .pages import PageNavigator
+from .screenlog import ScreenLogger
+from .trace import span, traced
+
+HAS_OCR = ocr_available()
+
+_DIALOG_RULES = RuleSet(DIALOG_RULES)
+
+# 文本输入方式，按速度排列（见 THSTrader._input_text）
+_INPUT_METHODS = ("set_text", "fastinput", "keycombo")
+
+# 委托方向的写法
+_ORDER_ACTIONS = {"buy": "buy", "b": "buy", "买入": "buy", "买": "buy",
+                  "sell": "sell", "s": "sell", "卖出": "sell", "卖": "sell"}
+
+
+def normalize_order(order):
+    """
+    校验并规范化一笔批量委托
+
+    Args:
+        order: {'action', 'stock_code'（或 'code'）, 'amount', 'price'}，
+            action 可以是 buy/sell/b/s/买入/卖出，默认 buy
+
+    Returns:
+        dict: {'action': 'buy' | 'sell', 'stock_code': str, 'amount': int, 'price': float}
+
+    Raises:
+        ValueError: 委托不完整或格式错误
+    """
+    if not isinstance(order, dict):
+        raise ValueError(f"委托格式错误: {order!r}")
+    action = _ORDER_ACTIONS.get(str(order.get('action', 'buy')).strip().lower())
+    if action is None:
+        raise ValueError(f"未知委托方向: {order.get('action')}")
+    code = order.get('stock_code', order.get('code'))
+    if code is None or not str(code).strip():
+        raise ValueError("缺少股票代码")
+    try:
+        amount = int(order['amount'])
+        price = float(order['price'])
+    except KeyError as e:
+        raise ValueError(f"缺少 {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError(f"数量或价格格式错误: {order.get('amount')!r} @{order.get('price')!r}")
+    if amount <= 0 or price <= 0:
+        raise ValueError(f"数量和价格必须大于 0: {amount} @{price}")
+    return {'action': action, 'stock_code': str(code).strip(), 'amount': amount, 'price': price}
 
 
 class THSTrader:
     """同花顺模拟炒股自动交易类"""
 
-    def __init__(self, serial="127.0.0.1:5565"):
+    def __init__(self, serial="127.0.0.1:5565", use_broker=True, device=None):
         """
         初始化 THSTrader
 
         Args:
             serial: 设备序列号，默认 127.0.0.1:5565
+            use_broker: 本地设备代理（trader.py broker）在运行时复用其连接
+            device: 直接使用的 Device（如回放用的 ths.fake.FakeDevice），传入时忽略 serial 和 use_broker
         """
-        self.d = u2.connect(serial)
-        self.serial = serial
-
-        # 初始化 OCR（如果可用）
-        if HAS_OCR:
-            # 使用 cnocr 的中文模型
-            self.reader = CnOcr()
+        # 通过 Device 管理连接，动作后按条件等待而非固定 sleep
+        if device is not None:
+            self.device = device
+            serial = device.serial
         else:
-            self.reader = None
+            self.device = attach(serial) if use_broker else None
+            if self.device is None:
+                self.device = Device(serial)
+        # 保留 d 以兼容直接使用 uiautomator2 的代码
+        self.d = self.device.d
+        self.serial = serial
+        # 每个输入框上次成功的输入方式 {resource_id: method}
+        self._input_methods = {}
+
+        # OCR: 优先使用本地 OCR 工作进程（trader.py ocr-server），否则使用进程内共享的模型，
+        # 模型在第一次识别时才加载
+        self.reader = attach_reader() or shared_reader()
+        if self.reader is None:
+            print("警告: cnocr 未安装且 OCR 工作进程未启动，OCR 功能将不可用")
+        # 按设备分辨率换算 config 中的坐标和 OCR 区域（每个序列号只检测一次）
+        self.geometry = profile_for(self.device)
+        self.locator = TextLocator(self.device, self.reader, self.geometry.regions())
+        self.pages = PageNavigator(self.device, self._page_actions(), close_dialogs=self._close_dialogs)
+        # 截图全文识别会占用 OCR 模型，默认关闭（config.SCREEN_LOG_DESCRIBE）
+        describe = self._ocr_get_full_text_from_image if self.reader and SCREEN_LOG_DESCRIBE else None
+        self.screen_log = ScreenLogger(self.device, describe=describe)
+        # 余额、持仓、撤单列表的读取缓存，下单、撤单后清除（有效期见 config.CACHE_TTL）
+        self.cache = ReadCache()
+        # 本地持仓账本，按委托、撤单结果更新，定期与界面核对
+        self.ledger = PositionLedger()
 
         print(f"✓ 已连接到设备: {serial}")
 
-    def get_balance(self):
+    @traced()
+    def get_balance(self, fresh=False):
         """
         获取账户余额
 
+        Args:
+            fresh: 跳过缓存重新读取（默认 CACHE_TTL["balance"] 秒内返回上次结果）
+
         Returns:
             dict: {'总资产': float, '可用': float, '浮动盈亏': float, '总市值': float}
         """
         print("\n获取账户余额...")
-        self._back_to_moni_page()
+        balance = self.cache.get("balance", self._read_balance, fresh)
+        if not balance:
+            # 没读到资产信息，不缓存空结果
+            self.cache.invalidate("balance")
+        return balance
 
-        # 点击持仓按钮
-        if self.d(resourceId=UI_ELEMENTS["menu_holdings_image"]).exists:
-            self.d(resourceId=UI_ELEMENTS["menu_holdings_image"]).click()
-            time.sleep(DEFAULT_WAIT)
-        else:
-            # 使用坐标点击
-            self.d.click(*COORDINATES["holdings_button"])
-            time.sleep(DEFAULT_WAIT)
+    def _read_balance(self):
+        """从资产页读取余额"""
+        self.pages.goto("holdings")
 
         # 向下滑动查看资产信息
-        self.d.swipe(340, 600, 340, 1000, duration=0.3)
-        time.sleep(1)
+        self.device.swipe(*self.geometry.swipe("reveal_capital"), duration=0.3,
+                          wait_for={'resourceId': UI_ELEMENTS["capital_cell_value"]}, timeout=1)
 
         # 获取资产信息（新版UI）
         balance = {}
-        if self.d(resourceId=UI_ELEMENTS["capital_cell_value"]).exists:
-            titles = []
-            values = []
-
-            for elem in self.d(resourceId=UI_ELEMENTS["capital_cell_title"]):
-                try:
-                    titles.append(elem.get_text())
-                except:
-                    pass
-
-            for elem in self.d(resourceId=UI_ELEMENTS["capital_cell_value"]):
-                try:
-                    values.append(elem.get_text())
-                except:
-                    pass
+        snap = self.device.snapshot()
+        if snap.exists(resourceId=UI_ELEMENTS["capital_cell_value"]):
+            titles = snap.texts(resourceId=UI_ELEMENTS["capital_cell_title"])
+            values = snap.texts(resourceId=UI_ELEMENTS["capital_cell_value"])
 
             for i in range(min(len(titles), len(values))):
                 balance[titles[i]] = values[i]
 
         # 返回
-        self.d.press("back")
-        time.sleep(1)
+        self.device.press_key("back", timeout=1)
 
         print(f"✓ 获取成功: {balance}")
         return balance
 
-    def get_position(self):
+    @traced()
+    def get_position(self, fresh=False):
         """
         获取持仓列表
 
+        Args:
+            fresh: 跳过缓存重新读取（默认 CACHE_TTL["position"] 秒内返回上次结果）
+
         Returns:
             list: [{'股票名称': str, '股票余额': int, '可用余额': int}, ...]
         """
-        if not self.reader:
-            print("✗ OCR 未初始化，无法获取持仓")
-            return []
-
         print("\n获取持仓列表...")
-        self._back_to_moni_page()
+        return self.cache.get("position", self._read_position, fresh)
 
-        # 点击持仓按钮
-        if self.d(resourceId=UI_ELEMENTS["menu_holdings_image"]).exists:
-            self.d(resourceId=UI_ELEMENTS["menu_holdings_image"]).click()
-        else:
-            self.d.click(*COORDINATES["holdings_button"])
-        time.sleep(DEFAULT_WAIT)
-
-        # 滚动并截取所有持仓
-        i = 0
-        first = True
-        while True:
-            if i > MAX_HOLDINGS:
-                break
-            try:
-                self.d.xpath(f'//*[@resource-id="{UI_ELEMENTS["recyclerview_id"]}"]/android.widget.RelativeLayout[{i+1}]').screenshot().save(f"tmp{i}.png")
-                i += 1
-                self.d.swipe(340, 1000, 340, 890)
-            except:
-                if first:
-                    self.d.swipe(340, 1000, 340, 600)
-                    first = False
-                else:
-                    break
+    def _read_position(self):
+        """翻页读取持仓页的所有持仓"""
+        if not self.reader:
+            print("⚠️ OCR 未初始化，仅从界面层级读取持仓")
 
-        count = i
-        holdings = []
-        for i in range(count):
-            holdings.append(self._ocr_parse_holding(f"tmp{i}.png"))
+        self.pages.goto("holdings")
+
+        # 整屏翻页读取所有持仓（优先读界面层级，缺字段的行截图留待 OCR）
+        harvester = self._row_harvester("recyclerview_id", "android.widget.RelativeLayout", "holding")
+        rows = [self._row_record(row, "holding") for row in harvester.harvest()]
+        holdings = self._holdings_from_fields(self._read_row_fields(rows, "holding"))
 
         # 返回
-        self.d.press("back")
-        time.sleep(1)
+        self.device.press_key("back", timeout=1)
 
         print(f"✓ 获取成功，共 {len(holdings)} 只股票")
         return holdings
 
+    @traced()
+    def get_ledger_position(self, max_age=LEDGER_MAX_AGE):
+        """
+        从本地账本获取持仓，不读取界面
+
+        账本从未核对、距上次核对超过 max_age 秒，或有结果不确定的委托/撤单时，先调用 reconcile
+
+        Args:
+            max_age: 账本最长有效时间（秒），None 表示只在需要时核对
+
+        Returns:
+            list: 格式同 get_position，按已提交的委托全部成交计算
+        """
+        if self.ledger.needs_sync(max_age):
+            self.reconcile()
+        return self.ledger.positions()
+
+    @traced()
+    def reconcile(self):
+        """
+        读取界面上的持仓、余额和未成交委托，与本地账本核对并以界面为准重建账本
+
+        Returns:
+            dict: {'success': bool, 'msg': str,
+                   'discrepancies': [{'股票名称': str, '字段': str, '账本': 值, '界面': 值}, ...]}
+                success 为 False 表示账本与界面不一致
+        """
+        print("\n核对本地账本...")
+        holdings = self.get_position(fresh=True)
+        balance = self.get_balance(fresh=True)
+        open_orders = self.get_avail_withdrawals(fresh=True)
+        discrepancies = self.ledger.sync(holdings, balance or None, open_orders)
+
+        for d in discrepancies:
+            print(f"⚠️ 账本不一致: {d['股票名称']} {d['字段']} 账本 {d['账本']} / 界面 {d['界面']}")
+        msg = f"{len(discrepancies)} 项不一致" if discrepancies else "账本与界面一致"
+        print(f"{'✗' if discrepancies else '✓'} {msg}")
+        return {'success': not discrepancies, 'msg': msg, 'discrepancies': discrepancies}
+
+    @traced()
     def buy(self, stock_code, amount, price):
         """
         买入股票
@@ -152,6 +240,7 @@ class THSTrader:
         """
         return self._trade_action(stock_code, amount, price, "buy")
 
+    @traced()
     def sell(self, stock_code, amount, price):
         """
         卖出股票
@@ -166,56 +255,103 @@ class THSTrader:
         """
         return self._trade_action(stock_code, amount, price, "sell")
 
-    def get_avail_withdrawals(self):
+    @traced()
+    def submit_basket(self, orders):
+        """
+        批量委托：在买入/卖出表单上依次提交多笔委托，只导航一次
+
+        按给定顺序执行；相邻同向委托之间不离开表单，方向改变时只在表单间切换
+
+        Args:
+            orders: 委托列表，每项为 dict
+                {'action': 'buy' | 'sell', 'stock_code': str, 'amount': int, 'price': float}
+                （也接受 'code' 代替 'stock_code'，action 的写法见 normalize_order）
+
+        Returns:
+            dict: {'success': bool, 'results': [...], 'elapsed': float}
+                results 中每项与 buy/sell 的返回值相同，另含 'elapsed'（该笔耗时，秒）；
+                有无效委托时全部不提交，无效委托的 type 为 'error'，其余为 'skipped'
+        """
+        print(f"\n批量委托: 共 {len(orders)} 笔")
+        start = time.time()
+
+        # 提交前校验全部委托，有无效委托时一笔都不提交
+        normalized = []
+        errors = []
+        for order in orders:
+            try:
+                normalized.append(normalize_order(order))
+                errors.append(None)
+            except ValueError as e:
+                normalized.append(None)
+                errors.append(str(e))
+        if any(errors):
+            results = []
+            for order, error in zip(orders, errors):
+                order = order if isinstance(order, dict) else {}
+                results.append({'success': False, 'msg': error or "未提交: 批量委托中有无效委托",
+                                'stock_name': "", 'amount': order.get('amount'), 'price': order.get('price'),
+                                'type': "error" if error else "skipped", 'elapsed': 0.0})
+            print(f"✗ 批量委托中有 {sum(1 for e in errors if e)} 笔无效委托，全部未提交")
+            return {'success': False, 'results': results, 'elapsed': round(time.time() - start, 3)}
+
+        results = []
+        try:
+            for order in normalized:
+                order_start = time.time()
+                try:
+                    result = self._submit_order(order['stock_code'], order['amount'], order['price'],
+                                                order['action'])
+                except Exception as e:
+                    result = {'success': False, 'msg': f"异常: {e}", 'stock_name': "",
+                              'amount': order['amount'], 'price': order['price'], 'type': "error"}
+                result['elapsed'] = round(time.time() - order_start, 3)
+                results.append(result)
+        finally:
+            # 全部完成（或中途出错）后再离开表单
+            try:
+                self.device.press_key("back", timeout=1)
+            except Exception as e:
+                print(f"⚠️ 返回失败: {e}")
+
+        elapsed = round(time.time() - start, 3)
+        success_count = sum(1 for r in results if r['success'])
+        print(f"✓ 批量委托完成: {success_count}/{len(results)} 成功，耗时 {elapsed}s")
+        return {'success': success_count == len(results), 'results': results, 'elapsed': elapsed}
+
+    @traced()
+    def get_avail_withdrawals(self, fresh=False):
         """
         获取可撤单列表
 
+        Args:
+            fresh: 跳过缓存重新读取（默认 CACHE_TTL["withdrawals"] 秒内返回上次结果）
+
         Returns:
             list: [{'股票名称': str, '委托价格': float, '委托数量': int, '委托类型': str}, ...]
         """
-        if not self.reader:
-            print("✗ OCR 未初始化，无法获取撤单列表")
-            return []
-
         print("\n获取可撤单列表...")
-        self._back_to_moni_page()
+        return self.cache.get("withdrawals", self._read_withdrawals, fresh)
 
-        # 点击撤单按钮
-        if self.d(resourceId=UI_ELEMENTS["menu_withdrawal_image"]).exists:
-            self.d(resourceId=UI_ELEMENTS["menu_withdrawal_image"]).click()
-        else:
-            self.d.click(*COORDINATES["withdrawal_button"])
-        time.sleep(DEFAULT_WAIT)
-
-        # 滚动并截取所有撤单
-        i = 0
-        first = True
-        while True:
-            if i > MAX_HOLDINGS:
-                break
-            try:
-                self.d.xpath(f'//*[@resource-id="{UI_ELEMENTS["chedan_recycler_view"]}"]/android.widget.LinearLayout[{i+1}]').screenshot().save(f"tmp{i}.png")
-                i += 1
-                self.d.swipe(340, 1000, 340, 890)
-            except:
-                if first:
-                    self.d.swipe(340, 1000, 340, 600)
-                    first = False
-                else:
-                    break
+    def _read_withdrawals(self):
+        """翻页读取撤单页的所有委托"""
+        if not self.reader:
+            print("⚠️ OCR 未初始化，仅从界面层级读取撤单列表")
 
-        count = i
-        withdrawals = []
-        for i in range(count):
-            withdrawals.append(self._ocr_parse_withdrawal(f"tmp{i}.png"))
+        self.pages.goto("withdrawals")
+
+        # 整屏翻页读取所有撤单（优先读界面层级，缺字段的行截图留待 OCR）
+        harvester = self._row_harvester("chedan_recycler_view", "android.widget.LinearLayout", "withdrawal")
+        rows = [self._row_record(row, "withdrawal") for row in harvester.harvest()]
+        withdrawals = self._withdrawals_from_fields(self._read_row_fields(rows, "withdrawal"))
 
         # 返回
-        self.d.press("back")
-        time.sleep(1)
+        self.device.press_key("back", timeout=1)
 
         print(f"✓ 获取成功，共 {len(withdrawals)} 条委托")
         return withdrawals
 
+    @traced()
     def withdraw(self, stock_name, trade_type, amount, price):
         """
         撤单
@@ -229,249 +365,435 @@ class THSTrader:
         Returns:
             dict: {'success': bool, 'msg': str}
         """
-        if not self.reader:
-            return {'success': False, 'msg': 'OCR 未初始化'}
-
         print(f"\n撤单: {stock_name} {trade_type} {amount}股 @{price}")
-        self._back_to_moni_page()
+        price = float(price)
+        # 只匹配同一价格: A 股最小价位 0.01，容差取半个价位以吸收浮点误差
+        result = self.cancel_all(stock_name=stock_name, trade_type=trade_type, amount=amount,
+                                 predicate=lambda info: abs(info["委托价格"] - price) < 0.005,
+                                 limit=1)
+        success = bool(result['cancelled'])
+        if not success:
+            print(f"✗ 未找到匹配的委托")
+        return {'success': success, 'msg': '撤单成功' if success else '未找到匹配的委托'}
 
-        # 点击撤单按钮
-        if self.d(resourceId=UI_ELEMENTS["menu_withdrawal_image"]).exists:
-            self.d(resourceId=UI_ELEMENTS["menu_withdrawal_image"]).click()
-        else:
-            self.d.click(*COORDINATES["withdrawal_button"])
-        time.sleep(DEFAULT_WAIT)
-
-        # 查找匹配的委托
-        success = False
-        i = 0
-        first = True
-        while True:
-            if i > MAX_HOLDINGS:
-                break
-            try:
-                self.d.xpath(f'//*[@resource-id="{UI_ELEMENTS["chedan_recycler_view"]}"]/android.widget.LinearLayout[{i+1}]').screenshot().save(f"tmp{i}.png")
-                info = self._ocr_parse_withdrawal(f"tmp{i}.png")
-
-                if (stock_name == info["股票名称"] and
-                    int(amount) == int(info["委托数量"]) and
-                    abs(float(price) - float(info["委托价格"])) < 0.01 and
-                    trade_type == info["委托类型"]):
-                    # 找到匹配的委托，点击
-                    self.d.xpath(f'//*[@resource-id="{UI_ELEMENTS["chedan_recycler_view"]}"]/android.widget.LinearLayout[{i+1}]').click()
-                    time.sleep(1)
-                    self.d(resourceId=UI_ELEMENTS["option_chedan"]).click()
-                    time.sleep(1)
-                    success = True
-                    print(f"✓ 撤单成功")
-                    break
+    @traced()
+    def cancel_all(self, stock_name=None, trade_type=None, amount=None, min_price=None,
+                   max_price=None, predicate=None, limit=None):
+        """
+        批量撤单：一次滚动撤掉所有满足条件的委托
 
-                i += 1
-                self.d.swipe(340, 1000, 340, 890)
-            except:
-                if first:
-                    self.d.swipe(340, 1000, 340, 600)
-                    first = False
+        撤掉一行后只重新读取当前屏幕，不从列表顶部重新开始；
+        所有条件为 None 时撤掉全部委托
+
+        Args:
+            stock_name: 股票名称
+            trade_type: 委托类型，"买入" 或 "卖出"
+            amount: 委托数量
+            min_price: 最低委托价格（含）
+            max_price: 最高委托价格（含）
+            predicate: 自定义条件，委托 dict -> bool（与上述条件同时满足）
+            limit: 最多撤几笔
+
+        Returns:
+            dict: {'success': bool, 'msg': str,
+                   'cancelled': [委托...], 'failed': [委托...]}
+                委托格式同 get_avail_withdrawals
+        """
+        def matches(info):
+            if stock_name is not None and info["股票名称"] != stock_name:
+                return False
+            if trade_type is not None and info["委托类型"] != trade_type:
+                return False
+            if amount is not None and int(info["委托数量"]) != int(amount):
+                return False
+            if min_price is not None and info["委托价格"] < float(min_price):
+                return False
+            if max_price is not None and info["委托价格"] > float(max_price):
+                return False
+            return predicate is None or predicate(info)
+
+        if not self.reader:
+            print("⚠️ OCR 未初始化，仅从界面层级读取委托")
+
+        print("\n批量撤单...")
+        self.pages.goto("withdrawals")
+
+        cancelled = []
+        failed = []
+        parsed = {}     # 行指纹 -> 委托，撤单后重读当前屏幕时不再重复识别
+        attempted = set()   # 撤单失败或未能确认的行指纹，不再重试
+        seen = {}       # 行指纹 -> 至少有几笔这样的委托（内容相同的委托可能有多笔）
+        done = {}       # 行指纹 -> 已确认撤掉的笔数，不超过 seen
+        refreshed = False
+        harvester = self._row_harvester("chedan_recycler_view", "android.widget.LinearLayout", "withdrawal")
+        for page in harvester.pages():
+            if refreshed:
+                # 撤单后重读的整屏: 屏幕上的行都还没撤，加上已撤掉的就是至少见过的笔数；
+                # 撤单后才移进屏幕的行由此计入，之后翻页时它们作为重叠行被去掉
+                visible = {}
+                for row in page:
+                    visible[row.fingerprint] = visible.get(row.fingerprint, 0) + 1
+                for fingerprint, count in visible.items():
+                    seen[fingerprint] = max(seen.get(fingerprint, 0), done.get(fingerprint, 0) + count)
+            else:
+                for row in page:
+                    seen[row.fingerprint] = seen.get(row.fingerprint, 0) + 1
+            refreshed = False
+            unparsed = [row for row in page if row.fingerprint not in parsed]
+            fields_list = self._read_row_fields([self._row_record(row, "withdrawal") for row in unparsed],
+                                                "withdrawal")
+            for row, fields in zip(unparsed, fields_list):
+                try:
+                    parsed[row.fingerprint] = self._withdrawals_from_fields([fields])[0]
+                except Exception as e:
+                    print(f"⚠️ 解析委托出错: {e}")
+                    parsed[row.fingerprint] = None
+
+            for row in page:
+                info = parsed.get(row.fingerprint)
+                if info is None or row.fingerprint in attempted or not matches(info):
+                    continue
+                if done.get(row.fingerprint, 0) >= seen.get(row.fingerprint, 0):
+                    continue
+                fingerprint = row.fingerprint
+                visible = harvester.count(fingerprint)
+                if self._cancel_row(row) and self.device.wait_until(
+                        lambda: harvester.count(fingerprint) < visible, CANCEL_CONFIRM_TIMEOUT,
+                        name="cancel_gone"):
+                    # 该行已从列表中消失才算撤单成功
+                    done[fingerprint] = done.get(fingerprint, 0) + 1
+                    cancelled.append(info)
+                    self.ledger.apply_cancel(info)
+                    print(f"✓ 撤单成功: {info['股票名称']} {info['委托类型']} "
+                          f"{info['委托数量']}股 @{info['委托价格']}")
                 else:
-                    break
+                    # 未撤掉，或撤单后该行仍在列表中（无法确认），不再重试同样的行
+                    attempted.add(fingerprint)
+                    failed.append(info)
+                    self.ledger.dirty = True
+                    print(f"✗ 撤单失败或未确认: {info['股票名称']}")
+                # 每次只处理一行，处理后重新读取当前屏幕
+                harvester.refresh()
+                refreshed = True
+                break
+            if limit is not None and len(cancelled) >= limit:
+                break
 
         # 返回
-        self.d.press("back")
-        time.sleep(1)
+        self.device.press_key("back", timeout=1)
 
-        if not success:
-            print(f"✗ 未找到匹配的委托")
+        msg = f"撤单 {len(cancelled)} 笔" + (f"，失败 {len(failed)} 笔" if failed else "")
+        print(f"✓ {msg}")
+        return {'success': not failed, 'msg': msg, 'cancelled': cancelled, 'failed': failed}
 
-        return {'success': success, 'msg': '撤单成功' if success else '未找到匹配的委托'}
+    @traced("cancel_row")
+    def _cancel_row(self, row):
+        """
+        撤掉撤单列表中当前屏幕上的一行
+
+        Returns:
+            bool: 是否执行了撤单
+        """
+        self.device.click(*row.node.center, wait_for={'resourceId': UI_ELEMENTS["option_chedan"]},
+                          timeout=1)
+        if not self._click_any({'resourceId': UI_ELEMENTS["option_chedan"]}, timeout=1):
+            return False
+        self.cache.invalidate()
+        # 关闭确认/结果弹窗，确保仍在撤单列表
+        if self.pages.current() != "withdrawals":
+            self.pages.goto("withdrawals")
+        return True
 
     # ==================== 私有方法 ====================
 
+    @traced("ocr_click")
     def _ocr_click(self, text, timeout=3):
         """
         OCR 查找并点击文本
+
+        先校验上次找到的位置，再在 OCR_SEARCH_REGIONS 配置的区域内识别，最后才全屏识别
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if not self.reader: return False
-            
-            # 截图
-            self.d.screenshot("scr_find.png")
-            try:
-                res = self.reader.ocr("scr_find.png")
-                # res 格式: [[[[x1,y1],[x2,y2],[x3,y3],[x4,y4]], text, score], ...]
-                for item in res:
-                    # item结构可能不同，适配一下
-                    if isinstance(item, list) and len(item) >= 2:
-                        txt_content = item[1]
-                        box = item[0] # 坐标
-                    else:
-                        continue # 格式不对
-                    
-                    if text in txt_content:
-                        # 计算中心点
-                        # box可能是 [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-                        # 或者是 [x1, y1, x2, y2]
-                        # rapidocr 返回的是四个顶点坐标
-                        import numpy as np
-                        box = np.array(box)
-                        center_x = int(np.mean(box[:, 0]))
-                        center_y = int(np.mean(box[:, 1]))
-                        
-                        print(f"👁️ OCR 找到 '{text}' @ ({center_x}, {center_y})，点击！")
-                        self.d.click(center_x, center_y)
-                        return True
-            except Exception as e:
-                print(f"OCR Find Error: {e}")
-            time.sleep(1)
-        return False
+        pos = self.locator.locate(text, timeout)
+        if pos is None:
+            return False
+        print(f"👁️ OCR 找到 '{text}' @ ({pos[0]}, {pos[1]})，点击！")
+        self.device.click(*pos)
+        return True
 
     def _back_to_moni_page(self):
-        """返回到模拟炒股主页 (增强鲁棒版)"""
+        """返回到模拟炒股主页（已在该页面时不做任何操作）"""
         print("正在导航至【模拟炒股】...")
-        
-        # 1. 启动 & 关弹窗
-        self.d.app_start(APP_PACKAGE)
-        time.sleep(2)
-        self._close_dialogs()
+        if self.pages.goto("moni"):
+            print("✓ 已在模拟交易页面")
+        else:
+            print("⚠️ 导航可能未完全成功，尝试继续操作...")
 
-        # 2. 智能导航循环
-        # 目标是找到“买入”或“总资产”等标志，证明到了
-        max_steps = 3
-        for _ in range(max_steps):
-            # A. 如果已经在交易页（看到"买入"、"持仓"）
-            if self.d(resourceId=UI_ELEMENTS["menu_buy_image"]).exists or \
-               self.d(text="买入").exists or \
-               self.d(text="模拟练习区").exists:
-                print("✓ 已在模拟交易页面")
-                return
-
-            # B. 尝试点击底部的“交易”
-            # 先试 OCR 点击（更准）
-            if not self._ocr_click("交易"):
-                # 备选：ID点击
-                if self.d(text="交易").exists:
-                    self.d(text="交易").click()
-                else:
-                    self.d.click(*COORDINATES["trading_tab"])
-            
-            time.sleep(DEFAULT_WAIT)
-            self._close_dialogs()
-
-            # C. 尝试点击顶部的“模拟”或“模拟炒股”
-            # 在交易页顶部 tab
-            if self._ocr_click("模拟"): # 找“模拟”两字
-                pass
-            elif self.d(resourceId=UI_ELEMENTS["tab_moni"]).exists:
-                self.d(resourceId=UI_ELEMENTS["tab_moni"]).click()
-            
-            # D. 特殊情况：如果在首页，尝试点“模拟炒股”大图标
-            self._ocr_click("模拟炒股")
-
-            time.sleep(1)
-        
-        print("⚠️ 导航可能未完全成功，尝试继续操作...")
+    def _page_actions(self):
+        """PageNavigator 使用的页面跳转动作"""
+        def tap(selector, coord):
+            return lambda: self._click_any(selector, fallback=coord, timeout=DEFAULT_WAIT)
+
+        def back():
+            # 返回键总能执行，是否到达由下一次页面判断决定
+            self.device.press_key("back", timeout=1)
 
+        def restart():
+            # 强制停止后重新启动，回到首页
+            self.device.app_stop(APP_PACKAGE)
+            return self.device.app_start(APP_PACKAGE)
+
+        return {
+            "launch": lambda: self.device.app_start(APP_PACKAGE),
+            "restart": restart,
+            "back": back,
+            # OCR 点击更准，找不到再用 ID / 坐标
+            "tap_trade_tab": lambda: self._ocr_click("交易") or self._click_any(
+                {'text': "交易"}, fallback=self.geometry.point("trading_tab"), timeout=DEFAULT_WAIT),
+            "tap_moni_tab": lambda: self._ocr_click("模拟") or self._click_any(
+                {'resourceId': UI_ELEMENTS["tab_moni"]}),
+            # 首页的“模拟炒股”大图标
+            "tap_moni_icon": lambda: self._ocr_click("模拟炒股", timeout=1),
+            # 底部"自选"标签，找不到时使用坐标
+            "tap_favorites_tab": lambda: self._click_any(
+                {'text': "自选"}, {'description': "自选"}, fallback=self.geometry.point("favorites_tab"),
+                timeout=DEFAULT_WAIT),
+            "tap_buy": tap({'resourceId': UI_ELEMENTS["menu_buy_image"]}, self.geometry.point("buy_button")),
+            "tap_sell": tap({'resourceId': UI_ELEMENTS["menu_sale_image"]}, self.geometry.point("sell_button")),
+            "tap_holdings": tap({'resourceId': UI_ELEMENTS["menu_holdings_image"]},
+                                self.geometry.point("holdings_button")),
+            "tap_withdrawals": tap({'resourceId': UI_ELEMENTS["menu_withdrawal_image"]},
+                                   self.geometry.point("withdrawal_button")),
+        }
+
+    @traced("close_dialogs")
     def _close_dialogs(self):
-        """关闭可能的对话框"""
-        # 1. 尝试点击常见的文本关闭/取消按钮
-        texts = ["等待", "关闭", "以后再说", "我知道了", "不再提醒", "确定", "取消", "跳过"]
-        for t in texts:
-            try:
-                if self.d(text=t).exists(timeout=0.2):
-                    print(f"检测到弹窗文本: {t}")
-                    self.d(text=t).click()
-                    time.sleep(0.5)
-            except:
-                pass
+        """
+        关闭可能的对话框
 
-        # 2. 尝试点击常见的图标关闭按钮 (通过 content-desc)
-        descs = ["关闭", "close", "取消"]
-        for d in descs:
-            try:
-                if self.d(description=d).exists(timeout=0.2):
-                    print(f"检测到关闭图标: {d}")
-                    self.d(description=d).click()
-                    time.sleep(0.5)
-            except:
-                pass
+        在一次层级转储上匹配 DIALOG_RULES，命中则执行对应的关闭动作后再检查下一层，
+        没有弹窗时只需一次转储
 
-        # 3. 尝试点击配置中的关闭按钮 ID
-        try:
-            if self.d(resourceId=UI_ELEMENTS["close_btn"]).exists(timeout=0.2):
-                self.d(resourceId=UI_ELEMENTS["close_btn"]).click()
-                time.sleep(0.5)
-        except:
-            pass
-        
-        # 4. 尝试点击可能的广告关闭按钮 (常见 ID 列表)
-        ad_close_ids = [
-            "com.hexin.plat.android:id/iv_close",
-            "com.hexin.plat.android:id/img_close",
-            "com.hexin.plat.android:id/close_img",
-            "com.hexin.plat.android:id/dialog_close",
-            "com.hexin.plat.android:id/btn_close",
-            "com.hexin.plat.android:id/close"
-        ]
-        for rid in ad_close_ids:
+        Returns:
+            list: 已关闭的规则名
+        """
+        closed = []
+        for _ in range(DIALOG_MAX_ROUNDS):
             try:
-                if self.d(resourceId=rid).exists(timeout=0.1):
-                    # print(f"检测到广告关闭按钮: {rid}")
-                    self.d(resourceId=rid).click()
-                    time.sleep(0.5)
+                hit = _DIALOG_RULES.first_match(self.device.snapshot())
+                if hit is None:
+                    break
+                rule, node = hit
+                print(f"检测到弹窗: {rule['name']}")
+                if rule["action"] == "back":
+                    self.device.press_key("back", timeout=0.5)
+                else:
+                    self.device.click(*node.center, timeout=0.5)
+                closed.append(rule["name"])
             except:
-                pass
+                break
+        return closed
 
-    def _ocr_parse_holding(self, path):
-        """OCR 解析持仓信息"""
+    def _click_any(self, *selectors, fallback=None, wait_for=None, timeout=None):
+        """
+        在当前层级快照中点击第一个存在的控件
+
+        Args:
+            *selectors: 按优先级排列的选择器 dict
+            fallback: 都不存在时点击的坐标 (x, y)
+            wait_for: 点击后等待出现的选择器
+            timeout: 点击后等待上限（秒）
+
+        Returns:
+            bool: 是否执行了点击
+        """
+        snap = self.device.snapshot()
+        for selector in selectors:
+            node = snap.first(**selector)
+            if node is not None and node.bounds:
+                self.device.click(*node.center, wait_for=wait_for, timeout=timeout)
+                return True
+        if fallback:
+            self.device.click(*fallback, wait_for=wait_for, timeout=timeout)
+            return True
+        return False
+
+    def _ocr_parse_holding(self, image):
+        """
+        OCR 解析持仓信息
+
+        Args:
+            image: 持仓行截图（PIL.Image），也可以是图片路径
+        """
         if not self.reader:
             return {}
+        return self._ocr_parse_holdings([image])[0]
 
-        try:
-            Image.open(path).crop((11, 11, 165, 55)).save("tmp.png")
-            result = self._ocr_read("tmp.png")
-            stock_name = result[0][1] if result else "未知"
-
-            Image.open(path).crop((419, 11, 548, 55)).save("tmp.png")
-            result = self._ocr_read("tmp.png")
-            stock_count_str = result[0][1] if result else "0"
-            # 容错处理：过滤非数字字符
-            import re
-            stock_count_str = re.sub(r'[^\d]', '', stock_count_str)
-            stock_count = int(stock_count_str) if stock_count_str else 0
-
-            Image.open(path).crop((419, 60, 548, 102)).save("tmp.png")
-            result = self._ocr_read("tmp.png")
-            stock_avail_str = result[0][1] if result else "0"
-            stock_avail_str = re.sub(r'[^\d]', '', stock_avail_str)
-            stock_available = int(stock_avail_str) if stock_avail_str else 0
+    def _ocr_parse_holdings(self, images):
+        """
+        批量 OCR 解析持仓行，所有行的所有字段在一次批量识别中完成
 
-            return {
-                "股票名称": stock_name.replace(" ", ""),
-                "股票余额": stock_count,
-                "可用余额": stock_available
-            }
-        except Exception as e:
-            print(f"⚠️ 解析持仓截图出错: {str(e)}")
-            return {"股票名称": "解析错误", "股票余额": 0, "可用余额": 0}
-
-    def _log_screen(self, tag="info"):
-        """截图并OCR日志"""
-        filename = f"log_{tag}_{int(time.time())}.png"
-        self.d.screenshot(filename)
-        print(f"📸 [{tag}] 已截图: {filename}")
-        if self.reader:
+        Args:
+            images: 持仓行截图列表
+
+        Returns:
+            list: [{'股票名称': str, '股票余额': int, '可用余额': int}, ...]
+        """
+        if not self.reader:
+            return []
+        return self._holdings_from_fields(self._ocr_read_fields(images, self.geometry.crop_areas("holding")))
+
+    def _holdings_from_fields(self, fields_list):
+        """字段文本 -> 持仓记录"""
+        holdings = []
+        for fields in fields_list:
             try:
-                # 简单识别屏幕中心区域或全屏
-                text = self._ocr_get_full_text_from_image(filename)
-                print(f"📝 [{tag}] 屏幕文字: {text[:100]}...") # 只打印前100字避免刷屏
-            except:
-                pass
+                if fields is None:
+                    raise ValueError("截图无法裁剪")
+                stock_name = fields["stock_name"] or "未知"
+                # 容错处理：过滤非数字字符
+                stock_count_str = re.sub(r'[^\d]', '', fields["stock_count"])
+                stock_count = int(stock_count_str) if stock_count_str else 0
+                stock_avail_str = re.sub(r'[^\d]', '', fields["stock_available"])
+                stock_available = int(stock_avail_str) if stock_avail_str else 0
+
+                holdings.append({
+                    "股票名称": stock_name.replace(" ", ""),
+                    "股票余额": stock_count,
+                    "可用余额": stock_available
+                })
+            except Exception as e:
+                print(f"⚠️ 解析持仓截图出错: {str(e)}")
+                holdings.append({"股票名称": "解析错误", "股票余额": 0, "可用余额": 0})
+        return holdings
+
+    def _row_harvester(self, list_key, row_class, kind):
+        """
+        创建列表采集器，层级中读不全字段的行才截图
+
+        Args:
+            list_key: 列表控件在 UI_ELEMENTS 中的键
+            row_class: 行控件类名
+            kind: OCR_CROP_AREAS / ROW_FIELD_IDS 中的类型
+        """
+        areas = self.geometry.crop_areas(kind)
+        field_ids = ROW_FIELD_IDS.get(kind)
+        return RecyclerHarvester(
+            self.device, UI_ELEMENTS[list_key], row_class,
+            need_image=lambda node: None in row_fields(node, areas, field_ids).values())
+
+    def _row_record(self, row, kind):
+        """
+        采集到的行 -> (字段 dict, 截图或 None)，交给 _read_row_fields 补全
 
-    def _ocr_get_full_text_from_image(self, path):
-        """从指定图片识别全文"""
+        Args:
+            row: harvester.Row
+            kind: OCR_CROP_AREAS / ROW_FIELD_IDS 中的类型
+        """
+        return row_fields(row.node, self.geometry.crop_areas(kind), ROW_FIELD_IDS.get(kind)), row.image
+
+    def _read_row_fields(self, rows, kind):
+        """
+        补全采集到的行，层级中缺失的字段统一批量 OCR
+
+        Args:
+            rows: [(字段 dict, 截图或 None), ...]，见 _row_record
+            kind: OCR_CROP_AREAS 中的类型
+
+        Returns:
+            list: 每行一个 {字段名: 文本}
+        """
+        known = [fields for fields, _ in rows]
+        images = [image for _, image in rows]
+        return self._ocr_read_fields(images, self.geometry.crop_areas(kind), known)
+
+    def _ocr_read_fields(self, images, areas, known=None):
+        """
+        按裁剪区域批量识别多张截图
+
+        Args:
+            images: 截图列表（PIL.Image 或路径，不需要识别的行为 None）
+            areas: {字段名: (x1, y1, x2, y2)}，如 OCR_CROP_AREAS["holding"]
+            known: 每行已知的 {字段名: 文本}，值为 None 的字段才识别
+
+        Returns:
+            list: 每张截图一个 {字段名: 文本}，裁剪失败的截图为 None
+        """
+        known = known or [{} for _ in images]
+        results = [dict(fields) for fields in known]
+        crops = []
+        targets = []
+        for n, image in enumerate(images):
+            missing = [name for name in areas if results[n].get(name) is None]
+            if not missing:
+                continue
+            try:
+                if image is None:
+                    raise ValueError("缺少截图")
+                if isinstance(image, str):
+                    from PIL import Image
+                    image = Image.open(image)
+                row_crops = [image.crop(areas[name]) for name in missing]
+            except Exception as e:
+                print(f"⚠️ 截图裁剪失败: {e}")
+                results[n] = None
+                continue
+            crops.extend(row_crops)
+            targets.extend((n, name) for name in missing)
+
+        if not self.reader and crops:
+            print("⚠️ OCR 未初始化，部分字段无法识别")
+        texts = self._ocr_read_lines(crops)
+        for (n, name), text in zip(targets, texts):
+            results[n][name] = text
+        return results
+
+    @traced("ocr")
+    def _ocr_read_lines(self, images):
+        """
+        批量单行识别
+
+        Args:
+            images: 单行图片列表（PIL.Image / RGB 数组 / 路径）
+
+        Returns:
+            list: 与 images 一一对应的文本，识别失败为 ""
+        """
+        if not self.reader or not images:
+            return [""] * len(images)
+
+        arrays = [ocr_input(image) for image in images]
+        if hasattr(self.reader, "ocr_for_single_lines"):
+            try:
+                results = self.reader.ocr_for_single_lines(arrays, batch_size=OCR_BATCH_SIZE)
+                return [line_text(r) for r in results]
+            except Exception as e:
+                print(f"OCR 批量识别失败，逐行识别: {e}")
+
+        texts = []
+        for array in arrays:
+            try:
+                texts.append(line_text(self.reader.ocr_for_single_line(array)))
+            except Exception as e:
+                print(f"OCR 识别失败: {e}")
+                texts.append("")
+        return texts
+
+    @traced("log_screen")
+    def _log_screen(self, tag="info", failure=False):
+        """
+        截图日志（编码、写入和 OCR 在后台线程完成，见 ScreenLogger）
+
+        Args:
+            tag: 截图标签
+            failure: 是否为失败现场，按抽样设置未记录的委托也会保留
+        """
+        return self.screen_log.log(tag, failure=failure)
+
+    def _ocr_get_full_text_from_image(self, image):
+        """从指定图片（PIL.Image / 路径）识别全文"""
         if not self.reader: return ""
         try:
-            result = self.reader.ocr(path)
+            result = self.reader.ocr(ocr_input(image))
             text = ""
             for line in result:
                 if line: text += "".join(line)
@@ -483,11 +805,25 @@ class THSTrader:
         """
         买入/卖出通用方法
         """
+        result = self._submit_order(stock_code, amount, price, action)
+
+        # 返回
+        try:
+            self.device.press_key("back", timeout=1)
+        except Exception as e:
+            print(f"⚠️ 返回失败: {e}")
+        return result
+
+    def _submit_order(self, stock_code, amount, price, action="buy"):
+        """
+        在买入/卖出表单上完成一笔委托（填写、确认），结束后停留在表单页
+        """
         try:
             stock_code = str(stock_code)
             amount = str(amount)
             price = str(price)
             action_cn = "买入" if action == "buy" else "卖出"
+            self.screen_log.begin_order()
 
             print(f"\n{action_cn}股票: {stock_code} {amount}股 @{price}")
 
@@ -495,18 +831,8 @@ class THSTrader:
             msg = ""
             stock_name = ""
 
-            self._back_to_moni_page()
-
-            # 点击买入/卖出按钮
-            button_id = UI_ELEMENTS["menu_buy_image"] if action == "buy" else UI_ELEMENTS["menu_sale_image"]
-            button_coord = COORDINATES["buy_button"] if action == "buy" else COORDINATES["sell_button"]
-
-            if self.d(resourceId=button_id).exists:
-                self.d(resourceId=button_id).click()
-            else:
-                self.d.click(*button_coord)
-            time.sleep(DEFAULT_WAIT)
-            self._close_dialogs()
+            # 进入买入/卖出表单（连续同向交易时已在表单上，不再导航）
+            self.pages.goto("buy_form" if action == "buy" else "sell_form")
 
             # 输入股票代码
             self._input_stock_code(stock_code)
@@ -520,64 +846,60 @@ class THSTrader:
             # 截图保存 (关键节点)
             self._log_screen(f"{action}_input_done")
 
-            # 点击买入/卖出按钮
-            if self.d(text=action_cn).exists:
-                self.d(text=action_cn).click()
-                time.sleep(DEFAULT_WAIT)
-
-                # 检查确认对话框
-                if self.d(resourceId=UI_ELEMENTS["ok_btn"]).exists:
-                    # 二次确认
-                    if self._verify_order(stock_code, amount, price):
-                        try:
-                            stock_name = self.d(resourceId=UI_ELEMENTS["stock_name_value"]).get_text()
-                        except:
-                            stock_name = stock_code
-
-                        # 截图保存 (确认框)
-                        self._log_screen(f"{action}_confirm_dialog")
+            # 点击买入/卖出按钮，确认并读取结果
+            with span("confirm"):
+                if self._click_any({'text': action_cn}, wait_for={'resourceId': UI_ELEMENTS["ok_btn"]},
+                                   timeout=DEFAULT_WAIT):
+
+                    # 检查确认对话框
+                    if self.device.snapshot().exists(resourceId=UI_ELEMENTS["ok_btn"]):
+                        # 二次确认
+                        if self._verify_order(stock_code, amount, price):
+                            try:
+                                stock_name = self.d(resourceId=UI_ELEMENTS["stock_name_value"]).get_text()
+                            except:
+                                stock_name = stock_code
+
+                            # 截图保存 (确认框)
+                            self._log_screen(f"{action}_confirm_dialog")
                         
-                        self.d(resourceId=UI_ELEMENTS["ok_btn"]).click()
-                        time.sleep(DEFAULT_WAIT)
+                            self.device.click_element(timeout=DEFAULT_WAIT, resourceId=UI_ELEMENTS["ok_btn"])
 
-                        # 再次截图看结果
-                        self._log_screen(f"{action}_result")
+                            # 再次截图看结果
+                            self._log_screen(f"{action}_result")
 
-                        # OCR 识别结果
-                        if self.reader and self.d(resourceId=UI_ELEMENTS["content_scroll"]).exists:
-                            self.d(resourceId=UI_ELEMENTS["content_scroll"]).screenshot().save("tmp.png")
-                            msg = self._ocr_get_full_text()
-                        else:
-                            h = self.d.dump_hierarchy()
-                            if "委托已提交" in h or "成功" in h:
-                                msg = "委托已提交"
+                            # OCR 识别结果
+                            if self.reader and self.device.snapshot().exists(resourceId=UI_ELEMENTS["content_scroll"]):
+                                msg = self._ocr_get_full_text(
+                                    self.d(resourceId=UI_ELEMENTS["content_scroll"]).screenshot())
                             else:
-                                msg = "已提交 (未精确认定)"
+                                h = self.device.snapshot().xml
+                                if "委托已提交" in h or "成功" in h:
+                                    msg = "委托已提交"
+                                else:
+                                    msg = "已提交 (未精确认定)"
 
-                        # 关闭结果对话框
-                        if self.d(resourceId=UI_ELEMENTS["ok_btn"]).exists:
-                            self.d(resourceId=UI_ELEMENTS["ok_btn"]).click()
+                            # 关闭结果对话框
+                            self._click_any({'resourceId': UI_ELEMENTS["ok_btn"]})
 
-                        success = True
-                        print(f"✓ {action_cn}成功: {msg}")
+                            success = True
+                            print(f"✓ {action_cn}成功: {msg}")
+                        else:
+                            # 确认失败，取消
+                            print("⚠️ 订单信息验证不符")
+                            self._log_screen(f"{action}_verify_fail", failure=True)
+                            self.device.click_element(resourceId=UI_ELEMENTS["cancel_btn"])
+                            msg = "订单确认信息不符"
+                            print(f"✗ {msg}")
                     else:
-                        # 确认失败，取消
-                        print("⚠️ 订单信息验证不符")
-                        self._log_screen(f"{action}_verify_fail")
-                        self.d(resourceId=UI_ELEMENTS["cancel_btn"]).click()
-                        msg = "订单确认信息不符"
-                        print(f"✗ {msg}")
-                else:
-                    # 没找到确认框，可能是直接提交了，也可能是点按钮没反应
-                    print("⚠️ 未检测到确认框，可能下单未触发")
-                    self._log_screen(f"{action}_no_confirm")
-                    msg = "未检测到确认弹窗"
-
-            # 返回
-            self.d.press("back")
-            time.sleep(1)
-
-            return {
+                        # 没找到确认框，可能是直接提交了，也可能是点按钮没反应
+                        print("⚠️ 未检测到确认框，可能下单未触发")
+                        self._log_screen(f"{action}_no_confirm", failure=True)
+                        msg = "未检测到确认弹窗"
+                        # 无法确定是否已提交，下次读取账本时先与界面核对
+                        self.ledger.dirty = True
+
+            result = {
                 'success': success,
                 'msg': msg,
                 'stock_name': stock_name.replace(" ", ""),
@@ -585,9 +907,13 @@ class THSTrader:
                 'price': price,
                 'type': action_cn
             }
+            if success:
+                self.ledger.apply_order(result)
+            return result
         except Exception as e:
             print(f"🔥 交易过程发生异常: {str(e)}")
-            self._log_screen("error_snapshot")
+            self._log_screen("error_snapshot", failure=True)
+            self.ledger.dirty = True
             import traceback
             traceback.print_exc()
             return {
@@ -598,89 +924,105 @@ class THSTrader:
                 'price': price,
                 'type': "error"
             }
+        finally:
+            # 无论是否成功，委托都可能已经改变了余额、持仓和委托列表
+            self.cache.invalidate()
 
-    def _input_text(self, target_id, text, check=True):
+    def _input_text(self, target_id, text=None, check=True):
         """
         可靠的文本输入工具
+
+        按 set_text / fastinput / keycombo 的顺序尝试，每种方式一次调用完成清空和输入，
+        每个输入框记住上次成功的方式，下次直接使用
+
         Args:
-            target_id: 目标输入框的 Resource ID
+            target_id: 目标输入框的 Resource ID；只传一个参数时视为 text，输入到当前焦点
             text: 要输入的文本
             check: 是否检查输入结果
+
+        Returns:
+            bool: 是否输入成功
         """
-        max_retry = 3
+        if text is None:
+            target_id, text = None, target_id
         text = str(text)
-        
-        for i in range(max_retry):
-            # 1. 点击聚焦
-            if self.d(resourceId=target_id).exists:
-                self.d(resourceId=target_id).click()
-                time.sleep(0.5)
-            else:
-                print(f"⚠️ 找不到输入框: {target_id}")
-                return False
 
-            # 2. 清空 (不仅删除，也尝试 set_text)
-            try:
-                self.d(resourceId=target_id).set_text("") # 尝试直接设置为空
-            except: pass
-            
-            # 手动删除兜底
-            self.d.press("move_end")
-            # 如果能获取当前长度，就删当前长度；获取不到就多删点
-            try:
-                current_text = self.d(resourceId=target_id).get_text()
-                del_len = len(current_text) + 5 if current_text else 20
-            except:
-                del_len = 20
-            
-            for _ in range(del_len):
-                self.d.press("del")
-            
-            # 3. 输入
-            # 尝试直接 set_text (有些输入框支持)
+        if target_id is not None and not self.device.snapshot().exists(resourceId=target_id):
+            print(f"⚠️ 找不到输入框: {target_id}")
+            return False
+
+        remembered = self._input_methods.get(target_id)
+        methods = [remembered] if remembered else []
+        methods += [m for m in _INPUT_METHODS if m != remembered]
+        if target_id is None:
+            # 没有目标控件时只能向焦点输入
+            methods = [m for m in methods if m != "set_text"]
+
+        for method in methods:
             try:
-                self.d(resourceId=target_id).set_text(text)
-                time.sleep(0.5)
-                # 检查是否生效
-                actual = self.d(resourceId=target_id).get_text()
-                if actual and str(text) in actual.replace(",", ""):
-                     print(f"✓ set_text 输入成功: {text}")
-                     return True
-            except: pass
-
-            # 如果 set_text 不行，还是用 input text
-            self.d.shell(f"input text {text}")
-            time.sleep(1)
-            
-            # 4. 检查
-            if check:
-                try:
-                    actual = self.d(resourceId=target_id).get_text()
-                    # 清理格式
-                    clean_actual = ""
-                    if actual:
-                        clean_actual = actual.replace(",", "").replace(" ", "")
-                    
-                    # 精确匹配（转换为数字比较，防止 '1000' vs '1000.0'）
-                    try:
-                        if float(clean_actual) == float(text):
-                            print(f"✓ 输入校验成功: {text}")
-                            return True
-                    except:
-                        # 字符串包含匹配
-                        if str(text) == clean_actual:
-                            print(f"✓ 输入校验成功: {text}")
-                            return True
-                    
-                    print(f"⚠️ 输入校验不符: 期望 '{text}', 实际 '{actual}', 重试 {i+1}/{max_retry}")
-                except:
-                    return True
-            else:
+                getattr(self, f"_input_by_{method}")(target_id, text)
+            except Exception as e:
+                print(f"⚠️ {method} 输入失败: {e}")
+                continue
+
+            if not check or target_id is None:
+                self._input_methods[target_id] = method
                 return True
-        
+            if self.device.wait_until(lambda: self._field_matches(target_id, text),
+                                      INPUT_VERIFY_TIMEOUT, name=f"input_{method}"):
+                print(f"✓ {method} 输入成功: {text}")
+                self._input_methods[target_id] = method
+                return True
+            print(f"⚠️ {method} 输入校验不符: 期望 '{text}', 实际 '{self._field_text(target_id)}'")
+
         print(f"✗ 输入最终失败: {text}")
         return False
 
+    def _input_by_set_text(self, target_id, text):
+        """uiautomator setText，直接替换输入框内容"""
+        self.d(resourceId=target_id).set_text(text)
+        self.device.invalidate()
+
+    def _input_by_fastinput(self, target_id, text):
+        """通过 uiautomator2 输入法（剪贴板）清空并输入"""
+        self._focus(target_id)
+        self.d.send_keys(text, clear=True)
+        self.device.invalidate()
+
+    def _input_by_keycombo(self, target_id, text):
+        """一次 shell 调用完成：移到末尾、批量删除、input text"""
+        self._focus(target_id)
+        current = self._field_text(target_id) if target_id else ""
+        del_len = len(current) + 5 if current else INPUT_CLEAR_COUNT
+        keys = " ".join(["KEYCODE_MOVE_END"] + ["KEYCODE_DEL"] * del_len)
+        self.d.shell(f"input keyevent {keys} && input text {text}")
+        self.device.invalidate()
+
+    def _focus(self, target_id):
+        """输入框未获得焦点时点击它"""
+        if target_id is None:
+            return
+        node = self.device.snapshot().first(resourceId=target_id)
+        if node is not None and node.bounds and node.attrib.get("focused") != "true":
+            self.device.click(*node.center, timeout=0.5)
+
+    def _field_text(self, target_id):
+        """输入框当前文本"""
+        try:
+            return self.d(resourceId=target_id).get_text() or ""
+        except:
+            return ""
+
+    def _field_matches(self, target_id, text):
+        """输入框当前文本是否等于 text（忽略千分位和空格，数字按数值比较）"""
+        actual = self._field_text(target_id).replace(",", "").replace(" ", "")
+        # 精确匹配（转换为数字比较，防止 '1000' vs '1000.0'）
+        try:
+            return float(actual) == float(text)
+        except ValueError:
+            return actual == str(text)
+
+    @traced("input_code")
     def _input_stock_code(self, stock_code):
         """输入股票代码"""
         self._close_dialogs()
@@ -689,8 +1031,9 @@ class THSTrader:
         # 尝试多个可能的输入框
         input_ids = [UI_ELEMENTS["content_stock"], UI_ELEMENTS["content_buy_stock"]]
         target_id = None
+        snap = self.device.snapshot()
         for rid in input_ids:
-            if self.d(resourceId=rid).exists:
+            if snap.exists(resourceId=rid):
                 target_id = rid
                 break
         
@@ -699,32 +1042,35 @@ class THSTrader:
             return
 
         self._input_text(target_id, stock_code)
-        time.sleep(DEFAULT_WAIT)
 
         # 选择搜索结果
-        if self.d(resourceId=UI_ELEMENTS["stockname_tv"]).exists:
+        if self.device.wait_exists(timeout=DEFAULT_WAIT, resourceId=UI_ELEMENTS["stockname_tv"]):
             try:
                 # 尝试点击第一个结果
-                self.d.xpath(XPATHS["stock_search_result"]).click()
+                self.device.click_xpath(XPATHS["stock_search_result"],
+                                        wait_for={'resourceId': UI_ELEMENTS["stockprice"]}, timeout=DEFAULT_WAIT)
             except:
-                self.d(resourceId=UI_ELEMENTS["stockname_tv"]).click()
-            time.sleep(DEFAULT_WAIT)
+                self.device.click_element(wait_for={'resourceId': UI_ELEMENTS["stockprice"]},
+                                          timeout=DEFAULT_WAIT, resourceId=UI_ELEMENTS["stockname_tv"])
 
+    @traced("input_price")
     def _input_price(self, price):
         """输入价格"""
         self._close_dialogs()
-        if self.d(resourceId=UI_ELEMENTS["stockprice"]).exists:
+        if self.device.snapshot().exists(resourceId=UI_ELEMENTS["stockprice"]):
             self._input_text(UI_ELEMENTS["stockprice"], price)
 
+    @traced("input_amount")
     def _input_amount(self, amount):
         """输入数量"""
         self._close_dialogs()
-        if self.d(resourceId=UI_ELEMENTS["stockvolume"]).exists:
+        if self.device.snapshot().exists(resourceId=UI_ELEMENTS["stockvolume"]):
             self._input_text(UI_ELEMENTS["stockvolume"], amount)
 
+    @traced("verify_order")
     def _verify_order(self, stock_code, amount, price):
         """验证订单信息"""
-        time.sleep(1)
+        self.device.wait_exists(timeout=1, resourceId=UI_ELEMENTS["stock_code_value"])
         try:
             code = self.d(resourceId=UI_ELEMENTS["stock_code_value"]).get_text().replace(" ", "")
             num = self.d(resourceId=UI_ELEMENTS["number_value"]).get_text().replace(" ", "").replace(",", "")
@@ -740,12 +1086,13 @@ class THSTrader:
         except:
             return False
 
-    def _ocr_read(self, image_path, single_line=True):
+    @traced("ocr")
+    def _ocr_read(self, image, single_line=True):
         """
         OCR 读取图片文本（兼容 cnocr）
 
         Args:
-            image_path: 图片路径
+            image: PIL.Image、RGB 数组或图片路径
             single_line: True 为单行识别，False 为多行识别
 
         Returns:
@@ -754,19 +1101,19 @@ class THSTrader:
         if not self.reader:
             return []
 
+        image = ocr_input(image)
         try:
             if single_line:
                 # cnocr 使用 ocr_for_single_line 方法
-                result = self.reader.ocr_for_single_line(image_path)
+                result = self.reader.ocr_for_single_line(image)
 
-                # cnocr 返回格式: [char, char, char, ...]
                 # 转换为类似 easyocr 的格式: [(bbox, text, confidence), ...]
-                if result:
-                    text = ''.join(result)
+                text = line_text(result)
+                if text:
                     return [(None, text, 1.0)]  # bbox 和 confidence 设为默认值
             else:
                 # 多行识别：使用 ocr 方法
-                result = self.reader.ocr(image_path)
+                result = self.reader.ocr(image)
 
                 # cnocr.ocr() 返回格式: [[char, char, ...], [char, char, ...], ...]
                 # 转换为类似 easyocr 的格式
@@ -782,46 +1129,58 @@ class THSTrader:
 
         return []
 
-    def _ocr_get_full_text(self):
-        """OCR 识别全部文本"""
+    def _ocr_get_full_text(self, image):
+        """OCR 识别图片中的全部文本"""
         if not self.reader:
             return ""
-        result = self._ocr_read("tmp.png")
+        result = self._ocr_read(image)
         text = ""
         for line in result:
             text += line[1]
         return text
 
-    def _ocr_parse_withdrawal(self, path):
-        """OCR 解析撤单信息"""
+    def _ocr_parse_withdrawal(self, image):
+        """
+        OCR 解析撤单信息
+
+        Args:
+            image: 委托行截图（PIL.Image），也可以是图片路径
+        """
         if not self.reader:
             return {}
+        return self._ocr_parse_withdrawals([image])[0]
 
-        Image.open(path).crop((11, 11, 165, 55)).save("tmp.png")
-        result = self._ocr_read("tmp.png")
-        stock_name = result[0][1] if result else "未知"
-
-        Image.open(path).crop((219, 11, 390, 55)).save("tmp.png")
-        result = self._ocr_read("tmp.png")
-        stock_price = result[0][1] if result else "0"
+    def _ocr_parse_withdrawals(self, images):
+        """
+        批量 OCR 解析委托行，所有行的所有字段在一次批量识别中完成
 
-        Image.open(path).crop((419, 11, 548, 55)).save("tmp.png")
-        result = self._ocr_read("tmp.png")
-        stock_count = result[0][1] if result else "0"
+        Args:
+            images: 委托行截图列表
 
-        Image.open(path).crop((589, 11, 704, 55)).save("tmp.png")
-        result = self._ocr_read("tmp.png")
-        t = result[0][1] if result else "未知"
+        Returns:
+            list: [{'股票名称': str, '委托价格': float, '委托数量': int, '委托类型': str}, ...]
+        """
+        if not self.reader:
+            return []
+        return self._withdrawals_from_fields(self._ocr_read_fields(images, self.geometry.crop_areas("withdrawal")))
 
-        return {
-            "股票名称": stock_name.replace(" ", ""),
-            "委托价格": float(stock_price.replace(",", "")),
-            "委托数量": int(stock_count.replace(",", "")),
-            "委托类型": t.replace(" ", "")
-        }
+    def _withdrawals_from_fields(self, fields_list):
+        """字段文本 -> 委托记录"""
+        withdrawals = []
+        for fields in fields_list:
+            if fields is None:
+                raise ValueError("委托截图无法裁剪")
+            withdrawals.append({
+                "股票名称": (fields["stock_name"] or "未知").replace(" ", ""),
+                "委托价格": float((fields["stock_price"] or "0").replace(",", "")),
+                "委托数量": int((fields["stock_count"] or "0").replace(",", "")),
+                "委托类型": (fields["type"] or "未知").replace(" ", "")
+            })
+        return withdrawals
 
     # ==================== 自选股功能 ====================
 
+    @traced()
     def add_favorite(self, pinyin_initials):
         """
         添加自选股
@@ -843,47 +1202,33 @@ class THSTrader:
 
         # 点击搜索框（通常在顶部）
         self._close_dialogs()
-        time.sleep(1)
 
-        # 点击屏幕上方搜索区域（坐标需要根据实际UI调整）
-        self.d.click(360, 100)
-        time.sleep(DEFAULT_WAIT)
+        # 点击屏幕上方搜索区域
+        self.device.click(*self.geometry.point("search_box"), timeout=DEFAULT_WAIT)
 
         # 输入拼音首字母搜索
         self._input_text(pinyin_code)
-        time.sleep(DEFAULT_WAIT)
+        self.device.wait_exists(timeout=DEFAULT_WAIT, resourceId=UI_ELEMENTS["stockname_tv"])
 
         # 获取第一个搜索结果的股票代码
         stock_code = ""
         try:
             # 尝试获取第一个搜索结果
-            if self.d(resourceId=UI_ELEMENTS["stockname_tv"]).exists:
-                first_result = self.d.xpath(XPATHS["stock_search_result"])
-
+            if self.device.snapshot().exists(resourceId=UI_ELEMENTS["stockname_tv"]):
                 # 长按以显示添加自选选项
-                first_result.long_click()
-                time.sleep(2)
+                self.device.click_xpath(XPATHS["stock_search_result"], long=True, timeout=2)
 
                 # 查找并点击"添加自选"按钮
-                if self.d(text="添加自选").exists:
-                    self.d(text="添加自选").click()
-                    time.sleep(1)
-                    msg = "添加成功"
-                    success = True
-                elif self.d(text="加自选").exists:
-                    self.d(text="加自选").click()
-                    time.sleep(1)
+                if self._click_any({'text': "添加自选"}, {'text': "加自选"}, timeout=1):
                     msg = "添加成功"
                     success = True
                 else:
                     # 备选方案：点击第一个结果进入详情页，从那里添加自选
-                    first_result.click()
-                    time.sleep(2)
+                    self.device.click_xpath(XPATHS["stock_search_result"],
+                                            wait_for={'description': "添加自选"}, timeout=2)
 
                     # 查找添加自选图标或按钮
-                    if self.d(description="添加自选").exists:
-                        self.d(description="添加自选").click()
-                        time.sleep(1)
+                    if self._click_any({'description': "添加自选"}, timeout=1):
                         msg = "添加成功"
                         success = True
                     else:
@@ -891,10 +1236,9 @@ class THSTrader:
                         success = False
 
                 # 返回
-                self.d.press("back")
-                time.sleep(1)
+                self.device.press_key("back", timeout=1)
 
-                print(f"✓ {msg}: {stock_name}")
+                print(f"{'✓' if success else '✗'} {msg}: {pinyin_code}")
                 return {'success': success, 'msg': msg, 'stock_code': stock_code}
             else:
                 msg = "未找到搜索结果"
@@ -906,6 +1250,7 @@ class THSTrader:
             print(f"✗ {msg}")
             return {'success': False, 'msg': msg, 'stock_code': ''}
 
+    @traced()
     def remove_favorite(self, pinyin_initials):
         """
         移除自选股
@@ -927,38 +1272,22 @@ class THSTrader:
         # 在自选列表中搜索股票
         try:
             # 使用拼音搜索自选股
-            if self.d(resourceId="com.hexin.plat.android:id/search_edit").exists:
-                self.d(resourceId="com.hexin.plat.android:id/search_edit").click()
-                time.sleep(1)
+            if self._click_any({'resourceId': UI_ELEMENTS["search_edit"]}, timeout=1):
                 self._input_text(pinyin_code)
-                time.sleep(DEFAULT_WAIT)
+                self.device.wait_exists(timeout=DEFAULT_WAIT, resourceId=UI_ELEMENTS["stockname_tv"])
 
             # 长按第一个结果显示删除选项
-            if self.d(resourceId=UI_ELEMENTS["stockname_tv"]).exists:
-                first_result = self.d.xpath('//*[@resource-id="com.hexin.plat.android:id/recyclerView"]/android.widget.RelativeLayout[1]')
-                first_result.long_click()
-                time.sleep(2)
+            if self.device.snapshot().exists(resourceId=UI_ELEMENTS["stockname_tv"]):
+                self.device.click_xpath('//*[@resource-id="com.hexin.plat.android:id/recyclerView"]/android.widget.RelativeLayout[1]',
+                                        long=True, wait_for={'text': "删除自选"}, timeout=2)
 
                 # 点击删除自选
-                if self.d(text="删除自选").exists:
-                    self.d(text="删除自选").click()
-                    time.sleep(1)
-
+                if self._click_any({'text': "删除自选"}, timeout=1):
                     # 确认删除
-                    if self.d(text="确定").exists or self.d(text="确认").exists:
-                        if self.d(text="确定").exists:
-                            self.d(text="确定").click()
-                        else:
-                            self.d(text="确认").click()
-                        time.sleep(1)
-                        msg = "删除成功"
-                        success = True
-                    else:
-                        msg = "删除成功"
-                        success = True
-                elif self.d(text="删除").exists:
-                    self.d(text="删除").click()
-                    time.sleep(1)
+                    self._click_any({'text': "确定"}, {'text': "确认"}, timeout=1)
+                    msg = "删除成功"
+                    success = True
+                elif self._click_any({'text': "删除"}, timeout=1):
                     msg = "删除成功"
                     success = True
                 else:
@@ -966,10 +1295,9 @@ class THSTrader:
                     success = False
 
                 # 返回
-                self.d.press("back")
-                time.sleep(1)
+                self.device.press_key("back", timeout=1)
 
-                print(f"✓ {msg}: {stock_name}")
+                print(f"{'✓' if success else '✗'} {msg}: {pinyin_code}")
                 return {'success': success, 'msg': msg}
             else:
                 msg = "未找到该自选股"
@@ -981,6 +1309,7 @@ class THSTrader:
             print(f"✗ {msg}")
             return {'success': False, 'msg': msg}
 
+    @traced()
     def get_favorite_code(self, pinyin_initials):
         """
         从自选区获取股票代码
@@ -1004,12 +1333,12 @@ class THSTrader:
 
         try:
             # 截图自选列表
-            time.sleep(1)
-            self.d.screenshot("favorites.png")
+            self.device.wait_screen_stable(timeout=1)
+            screen = self.device.screenshot()
 
             # 使用OCR识别股票名称和代码
             if self.reader:
-                result = self._ocr_read("favorites.png", single_line=False)
+                result = self._ocr_read(screen, single_line=False)
 
                 # 在OCR结果中查找匹配的拼音首字母
                 for i, item in enumerate(result):
@@ -1019,7 +1348,6 @@ class THSTrader:
                         for j in range(max(0, i-2), min(len(result), i+3)):
                             code_text = result[j][1]
                             # 提取6位数字
-                            import re
                             match = re.search(r'\d{6}', code_text)
                             if match:
                                 stock_code = match.group()
@@ -1027,8 +1355,7 @@ class THSTrader:
                                 return {'success': True, 'stock_code': stock_code, 'msg': '获取成功'}
 
             # 返回
-            self.d.press("back")
-            time.sleep(1)
+            self.device.press_key("back", timeout=1)
 
             msg = "未找到匹配的股票代码"
             print(f"✗ {msg}")
@@ -1039,6 +1366,7 @@ class THSTrader:
             print(f"✗ {msg}")
             return {'success': False, 'stock_code': '', 'msg': msg}
 
+    @traced()
     def buy_from_favorite(self, pinyin_initials, amount, price):
         """
         从自选区买入股票
@@ -1062,6 +1390,7 @@ class THSTrader:
         # 使用常规买入方法
         return self.buy(stock_code, amount, price)
 
+    @traced()
     def sell_from_favorite(self, pinyin_initials, amount, price):
         """
         从自选区卖出股票
@@ -1091,23 +1420,4 @@ class THSTrader:
         """导航到自选股页面"""
         print("导航到自选股页面...")
 
-        # 关闭对话框
-        self._close_dialogs()
-
-        # 启动应用
-        self.d.app_start(APP_PACKAGE)
-        time.sleep(2)
-        self._close_dialogs()
-
-        # 点击底部"自选"标签（坐标需要根据实际UI调整）
-        # 通常自选在左侧第一个或第二个位置
-        if self.d(text="自选").exists:
-            self.d(text="自选").click()
-        elif self.d(description="自选").exists:
-            self.d(description="自选").click()
-        else:
-            # 使用坐标点击（假设在底部左侧第一个位置）
-            self.d.click(72, 1210)
-
-        time.sleep(DEFAULT_WAIT)
-        self._close_dialogs()
+        self.pages.goto("favorites")
@@ -8,24 +8,34 @@ THSTrader CLI 入口
     python trader.py position --device 127.0.0.1:5565
     python trader.py buy --code 002415 --amount 1000 --price 10.0
     python trader.py sell --code 002415 --amount 500 --price 11.0
+    python trader.py basket --order buy,002415,100,31.5 --order sell,600519,100,1500
     python trader.py withdrawals
     python trader.py cancel --name 海康威视 --type 买入 --amount 1000 --price 10.0
+    python trader.py cancel-all --type 买入
     python trader.py add-favorite --name 海康威视
     python trader.py remove-favorite --name 海康威视
     python trader.py get-code --name 海康威视
     python trader.py buy-favorite --name 海康威视 --amount 1000 --price 31.5
     python trader.py sell-favorite --name 海康威视 --amount 500 --price 32.0
+    python trader.py broker --device 127.0.0.1:5565
+    python trader.py serve
+    python trader.py ocr-server
+    python trader.py record-state --dir fixtures/moni --state holdings
+    python trader.py --trace --trace-summary buy --code 002415 --amount 100 --price 31.5
 """
 
 import argparse
+import contextlib
 import sys
 import json
 from ths import THSTrader
+from ths.config import BROKER_ADDRESS, SERVE_ADDRESS, SERVE_TOKEN, OCR_ADDRESS, TRACE_FILE
+from ths.trace import tracer
 
 
 def cmd_balance(args):
     """获取账户余额"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     balance = trader.get_balance()
 
     print("\n" + "="*60)
@@ -41,7 +51,7 @@ def cmd_balance(args):
 
 def cmd_position(args):
     """获取持仓列表"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     positions = trader.get_position()
 
     print("\n" + "="*60)
@@ -59,7 +69,7 @@ def cmd_position(args):
 
 def cmd_buy(args):
     """买入股票"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.buy(args.code, args.amount, args.price)
 
     print("\n" + "="*60)
@@ -81,7 +91,7 @@ def cmd_buy(args):
 
 def cmd_sell(args):
     """卖出股票"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.sell(args.code, args.amount, args.price)
 
     print("\n" + "="*60)
@@ -101,9 +111,55 @@ def cmd_sell(args):
     return 0 if result['success'] else 1
 
 
+def _parse_order(text):
+    """解析 --order 参数: 方向,代码,数量,价格"""
+    from ths.trader import normalize_order
+    try:
+        action, code, amount, price = [p.strip() for p in text.split(',')]
+        return normalize_order({'action': action, 'stock_code': code, 'amount': amount, 'price': price})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效委托: {text}（格式: buy,002415,100,31.5）")
+
+
+def cmd_basket(args):
+    """批量委托"""
+    orders = list(args.order or [])
+    if args.file:
+        with (sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')) as f:
+            orders.extend(json.load(f))
+    if not orders:
+        print("✗ 没有委托，使用 --order 或 --file 指定")
+        return 1
+    # 文件中的委托与 --order 一样规范化方向、数量和价格，连接设备前报告错误
+    from ths.trader import normalize_order
+    for i, order in enumerate(orders, 1):
+        try:
+            orders[i - 1] = normalize_order(order)
+        except ValueError as e:
+            print(f"✗ 第 {i} 笔委托无效: {e}")
+            return 1
+
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
+    basket = trader.submit_basket(orders)
+
+    print("\n" + "="*60)
+    print(f"批量委托结果 (共 {len(basket['results'])} 笔，耗时 {basket['elapsed']}s)")
+    print("="*60)
+    for i, (order, result) in enumerate(zip(orders, basket['results']), 1):
+        status = '✓' if result['success'] else '✗'
+        print(f"  {i}. {status} {result['type']} {order['stock_code']} "
+              f"{result['amount']}股 @{result['price']}  {result['elapsed']}s  {result['msg']}")
+    print("="*60)
+
+    if args.json:
+        print(json.dumps(basket, ensure_ascii=False, indent=2))
+
+    return 0 if basket['success'] else 1
+
+
 def cmd_withdrawals(args):
     """获取可撤单列表"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     withdrawals = trader.get_avail_withdrawals()
 
     print("\n" + "="*60)
@@ -121,7 +177,7 @@ def cmd_withdrawals(args):
 
 def cmd_cancel(args):
     """撤单"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.withdraw(args.name, args.type, args.amount, args.price)
 
     print("\n" + "="*60)
@@ -141,9 +197,35 @@ def cmd_cancel(args):
     return 0 if result['success'] else 1
 
 
+def cmd_cancel_all(args):
+    """批量撤单"""
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
+    # --price 与 withdraw 相同，只匹配同一价格（容差半个价位）
+    predicate = None
+    if args.price is not None:
+        predicate = lambda info: abs(info["委托价格"] - args.price) < 0.005
+    result = trader.cancel_all(stock_name=args.name, trade_type=args.type, amount=args.amount,
+                               min_price=args.min_price, max_price=args.max_price,
+                               predicate=predicate, limit=args.limit)
+
+    print("\n" + "="*60)
+    print(f"批量撤单结果 (撤单 {len(result['cancelled'])} 笔)")
+    print("="*60)
+    for i, w in enumerate(result['cancelled'], 1):
+        print(f"  {i}. ✓ {w['股票名称']} {w['委托类型']} {w['委托数量']}股 @{w['委托价格']}")
+    for w in result['failed']:
+        print(f"  ✗ {w['股票名称']} {w['委托类型']} {w['委托数量']}股 @{w['委托价格']}")
+    print("="*60)
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    return 0 if result['success'] else 1
+
+
 def cmd_add_favorite(args):
     """添加自选股"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.add_favorite(args.pinyin)
 
     print("\n" + "="*60)
@@ -163,7 +245,7 @@ def cmd_add_favorite(args):
 
 def cmd_remove_favorite(args):
     """移除自选股"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.remove_favorite(args.pinyin)
 
     print("\n" + "="*60)
@@ -182,7 +264,7 @@ def cmd_remove_favorite(args):
 
 def cmd_get_code(args):
     """从自选区获取股票代码"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.get_favorite_code(args.pinyin)
 
     print("\n" + "="*60)
@@ -202,7 +284,7 @@ def cmd_get_code(args):
 
 def cmd_buy_favorite(args):
     """从自选区买入股票"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.buy_from_favorite(args.pinyin, args.amount, args.price)
 
     print("\n" + "="*60)
@@ -223,7 +305,7 @@ def cmd_buy_favorite(args):
 
 def cmd_sell_favorite(args):
     """从自选区卖出股票"""
-    trader = THSTrader(args.device)
+    trader = THSTrader(args.device, use_broker=not args.no_broker)
     result = trader.sell_from_favorite(args.pinyin, args.amount, args.price)
 
     print("\n" + "="*60)
@@ -242,6 +324,62 @@ def cmd_sell_favorite(args):
     return 0 if result['success'] else 1
 
 
+def cmd_broker(args):
+    """启动本地设备代理，保持设备连接供其他命令复用"""
+    from ths.broker import DeviceBroker
+    from ths.rpc import parse_address
+
+    address = parse_address(args.listen, BROKER_ADDRESS)
+    serials = args.serials or [args.device]
+    try:
+        DeviceBroker(address).serve_forever(serials)
+    except KeyboardInterrupt:
+        print("\n设备代理已停止")
+    return 0
+
+
+def cmd_record_state(args):
+    """把设备当前界面录制为回放场景中的一个状态"""
+    from ths.device import Device
+    from ths.fake import capture_state
+
+    scenario = capture_state(Device(args.device), args.dir, args.state)
+    print(f"✓ 已录制状态 {args.state}: {args.dir} (共 {len(scenario['states'])} 个状态)")
+    return 0
+
+
+def cmd_ocr_server(args):
+    """启动 OCR 工作进程，本机的 THSTrader 进程共用一份 OCR 模型"""
+    from ths.ocr_worker import OcrWorker
+    from ths.rpc import parse_address
+
+    address = parse_address(args.listen, OCR_ADDRESS)
+    try:
+        OcrWorker().serve_forever(address)
+    except KeyboardInterrupt:
+        print("\nOCR 工作进程已停止")
+    return 0
+
+
+def cmd_serve(args):
+    """常驻服务模式：保持 THSTrader 和 OCR 模型常驻，按 JSON-lines 处理请求"""
+    from ths.server import TraderServer
+    from ths.rpc import parse_address
+
+    # stdio 模式下 stdout 只用于协议数据
+    with contextlib.redirect_stdout(sys.stderr):
+        trader = THSTrader(args.device, use_broker=not args.no_broker)
+    server = TraderServer(trader, token=args.token or SERVE_TOKEN)
+    try:
+        if args.listen:
+            server.serve_socket(parse_address(args.listen, SERVE_ADDRESS))
+        else:
+            server.serve_stdio()
+    except KeyboardInterrupt:
+        print("\n服务已停止", file=sys.stderr)
+    return 0
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='THSTrader - 同花顺模拟炒股自动化交易工具',
@@ -260,12 +398,21 @@ def main():
   卖出股票:
     %(prog)s sell --code 002415 --amount 500 --price 11.0
 
+  批量委托（只导航一次）:
+    %(prog)s basket --order buy,002415,100,31.5 --order sell,600519,100,1500
+    %(prog)s basket --file orders.json
+
   查看可撤单:
     %(prog)s withdrawals
 
   撤单:
     %(prog)s cancel --name 海康威视 --type 买入 --amount 1000 --price 10.0
 
+  批量撤单（一次滚动，条件可组合，不加条件撤全部）:
+    %(prog)s cancel-all --type 买入
+    %(prog)s cancel-all --name 海康威视 --min-price 30 --max-price 32
+    %(prog)s cancel-all --name 海康威视 --type 买入 --amount 100 --price 31.5
+
   添加自选股:
     %(prog)s add-favorite --pinyin hkws
 
@@ -280,6 +427,23 @@ def main():
 
   从自选区卖出:
     %(prog)s sell-favorite --pinyin xfetf --amount 500 --price 32.0
+
+  启动设备代理（之后的命令自动复用连接）:
+    %(prog)s broker --serials 127.0.0.1:5565 127.0.0.1:5575
+
+  常驻服务（stdin/stdout JSON-lines，或 --listen 本地端口）:
+    echo '{"id": 1, "method": "get_balance"}' | %(prog)s serve
+    %(prog)s serve --listen
+
+  OCR 工作进程（之后启动的 THSTrader 共用已加载的模型）:
+    %(prog)s ocr-server
+
+  录制回放场景（ths.fake.FakeDevice 离线回放，跳转关系写入 scenario.json）:
+    %(prog)s record-state --dir fixtures/moni --state holdings
+
+  耗时追踪（各步骤耗时写入 JSON-lines 文件，并打印汇总表）:
+    %(prog)s --trace --trace-summary buy --code 002415 --amount 100 --price 31.5
+    %(prog)s --trace my_trace.jsonl position
         """
     )
 
@@ -287,6 +451,12 @@ def main():
                        help='设备序列号 (默认: 127.0.0.1:5565)')
     parser.add_argument('--json', '-j', action='store_true',
                        help='输出 JSON 格式')
+    parser.add_argument('--no-broker', action='store_true',
+                       help='不使用本地设备代理，直接连接设备')
+    parser.add_argument('--trace', nargs='?', default=None, const=TRACE_FILE, metavar='FILE',
+                       help=f'记录各步骤耗时到 JSON-lines 文件 (默认: {TRACE_FILE})')
+    parser.add_argument('--trace-summary', action='store_true',
+                       help='命令结束后打印耗时汇总表')
 
     subparsers = parser.add_subparsers(dest='command', help='命令')
 
@@ -312,6 +482,15 @@ def main():
     parser_sell.add_argument('--price', '-p', type=float, required=True, help='卖出价格')
     parser_sell.set_defaults(func=cmd_sell)
 
+    # basket 命令
+    parser_basket = subparsers.add_parser('basket', help='批量委托')
+    parser_basket.add_argument('--order', '-o', action='append', type=_parse_order,
+                               help='委托: 方向,代码,数量,价格，可重复，如 buy,002415,100,31.5')
+    parser_basket.add_argument('--file', '-f',
+                               help='JSON 委托列表文件（- 为标准输入），'
+                                    '每项 {"action", "stock_code", "amount", "price"}')
+    parser_basket.set_defaults(func=cmd_basket)
+
     # withdrawals 命令
     parser_withdrawals = subparsers.add_parser('withdrawals', help='获取可撤单列表')
     parser_withdrawals.set_defaults(func=cmd_withdrawals)
@@ -324,6 +503,17 @@ def main():
     parser_cancel.add_argument('--price', '-p', type=float, required=True, help='委托价格')
     parser_cancel.set_defaults(func=cmd_cancel)
 
+    # cancel-all 命令
+    parser_cancel_all = subparsers.add_parser('cancel-all', help='批量撤单')
+    parser_cancel_all.add_argument('--name', '-n', help='股票名称')
+    parser_cancel_all.add_argument('--type', '-t', choices=['买入', '卖出'], help='委托类型')
+    parser_cancel_all.add_argument('--amount', '-a', type=int, help='委托数量')
+    parser_cancel_all.add_argument('--price', '-p', type=float, help='委托价格')
+    parser_cancel_all.add_argument('--min-price', type=float, help='最低委托价格')
+    parser_cancel_all.add_argument('--max-price', type=float, help='最高委托价格')
+    parser_cancel_all.add_argument('--limit', type=int, help='最多撤几笔')
+    parser_cancel_all.set_defaults(func=cmd_cancel_all)
+
     # add-favorite 命令
     parser_add_fav = subparsers.add_parser('add-favorite', help='添加自选股')
     parser_add_fav.add_argument('--pinyin', '-p', required=True, help='股票拼音首字母 (如 hkws, xfetf)')
@@ -353,14 +543,47 @@ def main():
     parser_sell_fav.add_argument('--price', '-r', type=float, required=True, help='卖出价格')
     parser_sell_fav.set_defaults(func=cmd_sell_favorite)
 
+    # broker 命令
+    parser_broker = subparsers.add_parser('broker', help='启动本地设备代理，保持设备连接')
+    parser_broker.add_argument('--listen', '-l', default=None,
+                               help=f'监听地址 (默认: {BROKER_ADDRESS[0]}:{BROKER_ADDRESS[1]})')
+    parser_broker.add_argument('--serials', '-s', nargs='*', default=None,
+                               help='启动时预先连接的设备序列号 (默认: --device)')
+    parser_broker.set_defaults(func=cmd_broker)
+
+    # ocr-server 命令
+    parser_ocr = subparsers.add_parser('ocr-server', help='启动 OCR 工作进程')
+    parser_ocr.add_argument('--listen', '-l', default=None,
+                            help=f'监听地址 (默认: {OCR_ADDRESS[0]}:{OCR_ADDRESS[1]})')
+    parser_ocr.set_defaults(func=cmd_ocr_server)
+
+    # record-state 命令
+    parser_record = subparsers.add_parser('record-state', help='录制当前界面为回放场景状态')
+    parser_record.add_argument('--dir', required=True, help='场景目录')
+    parser_record.add_argument('--state', '-s', required=True, help='状态名')
+    parser_record.set_defaults(func=cmd_record_state)
+
+    # serve 命令
+    parser_serve = subparsers.add_parser('serve', help='常驻服务模式 (JSON-lines)')
+    parser_serve.add_argument('--listen', '-l', nargs='?', default=None,
+                              const=f'{SERVE_ADDRESS[0]}:{SERVE_ADDRESS[1]}',
+                              help=f'监听本地端口而非 stdin/stdout (默认: {SERVE_ADDRESS[0]}:{SERVE_ADDRESS[1]})')
+    parser_serve.add_argument('--token', default=None,
+                              help='端口模式下交易类请求的令牌 (默认: 环境变量 THSTRADER_TOKEN，未设置时随机生成)')
+    parser_serve.set_defaults(func=cmd_serve)
+
     args = parser.parse_args()
 
     if not args.command:
         parser.print_help()
         return 0
 
+    if args.trace or args.trace_summary:
+        tracer.start(args.trace)
+
     try:
-        return args.func(args)
+        with tracer.span(args.command):
+            return args.func(args)
     except KeyboardInterrupt:
         print("\n\n操作已取消")
         return 1
@@ -369,6 +592,16 @@ def main():
         import traceback
         traceback.print_exc()
         return 1
+    finally:
+        tracer.stop()
+        if args.trace_summary:
+            print("\n" + "="*60)
+            print("耗时汇总 (秒)")
+            print("="*60)
+            print(tracer.format_summary())
+            print("="*60)
+        if args.trace:
+            print(f"追踪记录: {args.trace}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "scripts"))
+
+FIXTURES = os.path.join(HERE, "fixtures")
+# 测试中用 generate.py 的页面构造函数拼出临时场景
+sys.path.insert(0, FIXTURES)
+
+
+@pytest.fixture
+def make_trader():
+    """用 tests/fixtures 下的回放场景（或场景 dict）创建 THSTrader（不连接设备、不写截图日志）"""
+    from ths.fake import FakeDevice
+    from ths.trader import THSTrader
+
+    def make(scenario="moni"):
+        if not isinstance(scenario, dict):
+            scenario = os.path.join(FIXTURES, scenario)
+        trader = THSTrader(device=FakeDevice(scenario))
+        trader.screen_log.mode = "off"
+        return trader
+    return make
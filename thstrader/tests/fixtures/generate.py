@@ -0,0 +1,336 @@
+"""
+生成回放场景（ths.fake.FakeDevice）
+按 config 中的控件 ID 和 OCR_CROP_AREAS 合成同花顺模拟炒股界面的层级 XML，
+列表行的文本控件放在裁剪区域内，读取持仓和撤单不需要 OCR
+
+    moni/           首页 -> 交易 -> 模拟炒股，余额、3 只持仓、买入 002415、2 笔委托及撤单、自选股增删
+    holdings_<N>/   N 只持仓按整屏分页（bench.py --position-scenario N=...）
+
+用法:
+    python tests/fixtures/generate.py            # 重新生成全部场景
+"""
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "scripts"))
+
+from ths.config import (APP_PACKAGE, UI_ELEMENTS, OCR_CROP_AREAS, GEOMETRY_BASE_SIZE,  # noqa: E402
+                        HARVEST_OVERLAP)
+
+WIDTH, HEIGHT = GEOMETRY_BASE_SIZE
+LIST_BOUNDS = (0, 300, WIDTH, 1100)  # 持仓、撤单列表区域
+HOLDING_HEIGHT = 110
+WITHDRAWAL_HEIGHT = 70
+SIZES = (10, 50, 200)
+
+# 模拟炒股场景的账户数据
+BALANCE = [("总资产", "200,000.00"), ("可用", "150,000.00"), ("总市值", "50,000.00"), ("浮动盈亏", "1,234.00")]
+HOLDINGS = [("海康威视", 1000, 800), ("贵州茅台", 100, 100), ("招商银行", 2000, 0)]
+WITHDRAWALS = [("海康威视", "31.50", 100, "买入"), ("贵州茅台", "1500.00", 100, "卖出")]
+STOCK = {"code": "002415", "name": "海康威视"}
+
+
+def node(cls="android.widget.TextView", rid="", text="", desc="", bounds=(0, 0, WIDTH, HEIGHT), children=(),
+         focused=False):
+    x1, y1, x2, y2 = bounds
+    attrs = (f'class="{cls}" package="{APP_PACKAGE}" resource-id="{rid}" text="{text}" '
+             f'content-desc="{desc}" bounds="[{x1},{y1}][{x2},{y2}]"')
+    if focused:
+        attrs += ' focused="true"'
+    return f"<node {attrs}>{''.join(children)}</node>"
+
+
+def page(*children):
+    return ('<?xml version="1.0" encoding="UTF-8"?><hierarchy rotation="0">'
+            + node("android.widget.FrameLayout", children=children) + "</hierarchy>")
+
+
+def field(text, row_origin, area):
+    """放在行内裁剪区域中的文本控件"""
+    x, y = row_origin
+    x1, y1, x2, y2 = area
+    return node(text=text, bounds=(x + x1, y + y1, x + x2, y + y2))
+
+
+def moni_menu():
+    """买入、卖出、持仓、撤单四个按钮，位置与 COORDINATES 一致"""
+    menu = ["menu_buy_image", "menu_sale_image", "menu_holdings_image", "menu_withdrawal_image"]
+    nodes = [node(text="模拟练习区", bounds=(0, 200, 300, 260))]
+    for n, key in enumerate(menu):
+        nodes.append(node("android.widget.ImageView", UI_ELEMENTS[key], bounds=(n * 144, 550, n * 144 + 144, 670)))
+    return nodes
+
+
+def capital():
+    nodes = []
+    for n, (title, value) in enumerate(BALANCE):
+        x = n * 180
+        nodes.append(node(rid=UI_ELEMENTS["capital_cell_title"], text=title, bounds=(x, 100, x + 180, 140)))
+        nodes.append(node(rid=UI_ELEMENTS["capital_cell_value"], text=value, bounds=(x, 140, x + 180, 180)))
+    return nodes
+
+
+def page_offsets(count, row_height):
+    """
+    列表按整屏翻页时各页的滚动距离
+
+    每页相对上一页滚动 RecyclerHarvester 的翻页距离，最后一页停在列表底部
+    """
+    height = LIST_BOUNDS[3] - LIST_BOUNDS[1]
+    distance = int(height * (1 - HARVEST_OVERLAP))
+    max_offset = max(0, count * row_height - height)
+    return list(range(0, max_offset, distance)) + [max_offset]
+
+
+def holdings_pages(holdings):
+    """
+    持仓列表按整屏翻页拆成多个状态
+
+    每页只保留完整可见的行，滚动距离见 page_offsets
+
+    Returns:
+        list: 每页的 XML
+    """
+    x1, top, x2, bottom = LIST_BOUNDS
+    areas = OCR_CROP_AREAS["holding"]
+    pages = []
+    for offset in page_offsets(len(holdings), HOLDING_HEIGHT):
+        rows = []
+        for n, (name, count, available) in enumerate(holdings):
+            y = top + n * HOLDING_HEIGHT - offset
+            if y < top or y + HOLDING_HEIGHT > bottom:
+                continue
+            rows.append(node("android.widget.RelativeLayout", bounds=(x1, y, x2, y + HOLDING_HEIGHT), children=[
+                field(name, (x1, y), areas["stock_name"]),
+                field(str(count), (x1, y), areas["stock_count"]),
+                field(str(available), (x1, y), areas["stock_available"]),
+            ]))
+        pages.append(page(*capital(), node("androidx.recyclerview.widget.RecyclerView",
+                                           UI_ELEMENTS["recyclerview_id"], bounds=LIST_BOUNDS, children=rows)))
+    return pages
+
+
+def withdrawal_rows(orders, offset=0):
+    """[(订单序号, 委托)] -> (完整可见的行 XML 列表, {订单序号: 行区域})"""
+    x1, top, x2, bottom = LIST_BOUNDS
+    areas = OCR_CROP_AREAS["withdrawal"]
+    rows, regions = [], {}
+    for n, (index, (name, price, count, trade_type)) in enumerate(orders):
+        y = top + n * WITHDRAWAL_HEIGHT - offset
+        if y < top or y + WITHDRAWAL_HEIGHT > bottom:
+            continue
+        bounds = (x1, y, x2, y + WITHDRAWAL_HEIGHT)
+        regions[index] = list(bounds)
+        rows.append(node("android.widget.LinearLayout", bounds=bounds, children=[
+            field(name, (x1, y), areas["stock_name"]),
+            field(price, (x1, y), areas["stock_price"]),
+            field(str(count), (x1, y), areas["stock_count"]),
+            field(trade_type, (x1, y), areas["type"]),
+        ]))
+    return rows, regions
+
+
+def withdrawals_page(orders, offset=0, option=False):
+    rows, _ = withdrawal_rows(orders, offset)
+    nodes = [node("androidx.recyclerview.widget.RecyclerView", UI_ELEMENTS["chedan_recycler_view"],
+                  bounds=LIST_BOUNDS, children=rows)]
+    if option:
+        nodes.append(node(rid=UI_ELEMENTS["option_chedan"], text="撤单", bounds=(0, 1120, WIDTH, 1200)))
+    return page(*nodes)
+
+
+def withdrawals_name(remaining, page_index=0):
+    name = "withdrawals_" + ("_".join(str(i) for i in remaining) if len(remaining) > 9 else
+                             "".join(str(i) for i in remaining) or "none")
+    return f"{name}_p{page_index}" if page_index else name
+
+
+def navigation():
+    """首页 -> 交易 -> 模拟炒股 的状态和跳转"""
+    states = {
+        "home": page(node(text="交易", desc="交易", bounds=(360, 1150, 480, 1270))),
+        "trade_tab": page(node(rid=UI_ELEMENTS["tab_moni"], text="模拟", bounds=(0, 100, 200, 160)),
+                          node(text="交易", desc="交易", bounds=(360, 1150, 480, 1270))),
+        "moni": page(*moni_menu()),
+    }
+    transitions = [
+        {"from": "home", "click": {"text": "交易"}, "to": "trade_tab"},
+        {"from": "trade_tab", "click": {"resourceId": UI_ELEMENTS["tab_moni"]}, "to": "moni"},
+    ]
+    return states, transitions
+
+
+def holdings_states(holdings):
+    states, transitions = {}, []
+    pages = holdings_pages(holdings)
+    for n, xml in enumerate(pages):
+        states[f"holdings_{n}"] = xml
+        if n + 1 < len(pages):
+            transitions.append({"from": f"holdings_{n}", "swipe": "up", "to": f"holdings_{n + 1}"})
+    transitions.insert(0, {"from": "moni", "click": {"resourceId": UI_ELEMENTS["menu_holdings_image"]},
+                           "to": "holdings_0"})
+    return states, transitions
+
+
+def trade_states():
+    """买入表单: 输入代码 -> 搜索结果 -> 确认框 -> 结果框"""
+    form = [
+        node("android.widget.EditText", UI_ELEMENTS["content_stock"], bounds=(100, 200, 600, 260)),
+        node("android.widget.EditText", UI_ELEMENTS["stockprice"], bounds=(100, 300, 600, 360)),
+        node("android.widget.EditText", UI_ELEMENTS["stockvolume"], bounds=(100, 400, 600, 460)),
+        node("android.widget.Button", text="买入", bounds=(100, 600, 600, 680)),
+    ]
+    search = node("androidx.recyclerview.widget.RecyclerView", UI_ELEMENTS["recyclerView"], bounds=(0, 270, WIDTH, 900),
+                  children=[node("android.widget.RelativeLayout", bounds=(0, 270, WIDTH, 350), children=[
+                      node(rid=UI_ELEMENTS["stockname_tv"], text=STOCK["name"], bounds=(0, 270, WIDTH, 350))])])
+    ok = node("android.widget.Button", UI_ELEMENTS["ok_btn"], text="确定", bounds=(100, 900, 600, 980))
+    confirm = [
+        node(rid=UI_ELEMENTS["stock_code_value"], text=STOCK["code"], bounds=(100, 500, 300, 540)),
+        node(rid=UI_ELEMENTS["stock_name_value"], text=STOCK["name"], bounds=(300, 500, 500, 540)),
+        node(rid=UI_ELEMENTS["number_value"], text="100", bounds=(100, 540, 300, 580)),
+        node(rid=UI_ELEMENTS["price_value"], text="31.50", bounds=(300, 540, 500, 580)),
+        node("android.widget.Button", UI_ELEMENTS["cancel_btn"], text="取消", bounds=(100, 1000, 600, 1080)),
+        ok,
+    ]
+    states = {
+        "buy_form": page(*form),
+        "buy_search": page(*form, search),
+        "buy_confirm": page(*form, *confirm),
+        "buy_result": page(*form, node(text="委托已提交", bounds=(100, 500, 600, 560)), ok),
+    }
+    transitions = [
+        {"from": "moni", "click": {"resourceId": UI_ELEMENTS["menu_buy_image"]}, "to": "buy_form"},
+        {"from": "buy_form", "input": {"resourceId": UI_ELEMENTS["content_stock"]}, "to": "buy_search"},
+        {"from": "buy_search", "click": {"resourceId": UI_ELEMENTS["stockname_tv"]}, "to": "buy_form"},
+        {"from": "buy_form", "click": {"text": "买入"}, "to": "buy_confirm"},
+        {"from": "buy_confirm", "click": {"resourceId": UI_ELEMENTS["ok_btn"]}, "to": "buy_result"},
+        {"from": "buy_confirm", "click": {"resourceId": UI_ELEMENTS["cancel_btn"]}, "to": "buy_form"},
+        {"from": "buy_result", "click": {"resourceId": UI_ELEMENTS["ok_btn"]}, "to": "buy_form"},
+    ]
+    return states, transitions
+
+
+def favorites_states():
+    """
+    自选股: 顶部搜索 -> 长按结果 -> 添加自选；自选页长按 -> 删除自选 -> 确定
+
+    自选页位于底部左侧的“自选”标签（COORDINATES["favorites_tab"]），列表中只有 STOCK
+    """
+    search_edit = node("android.widget.EditText", UI_ELEMENTS["search_edit"], bounds=(100, 60, 620, 140),
+                       focused=True)
+    result = node("androidx.recyclerview.widget.RecyclerView", UI_ELEMENTS["recyclerView"], bounds=(0, 300, WIDTH, 900),
+                  children=[node("android.widget.RelativeLayout", bounds=(0, 300, WIDTH, 380), children=[
+                      node(rid=UI_ELEMENTS["stockname_tv"], text=STOCK["name"], bounds=(0, 300, WIDTH, 380))])])
+    optional = node("android.widget.FrameLayout", UI_ELEMENTS["optional_list"], bounds=(0, 150, WIDTH, 1100))
+
+    def menu(*items):
+        return [node("android.widget.TextView", text=text, bounds=(200, 500 + n * 80, 520, 580 + n * 80))
+                for n, text in enumerate(items)]
+
+    states = {
+        "search": page(search_edit),
+        "search_result": page(search_edit, result),
+        "search_menu": page(search_edit, result, *menu("添加自选", "分享")),
+        "search_added": page(search_edit, result, node(text="添加成功", bounds=(200, 1000, 520, 1060))),
+        "favorites": page(optional, search_edit, result),
+        "favorites_menu": page(optional, search_edit, result, *menu("删除自选", "置顶")),
+        "favorites_confirm": page(optional, search_edit, result,
+                                  node("android.widget.Button", text="确定", bounds=(100, 700, 600, 780))),
+        "favorites_empty": page(optional, search_edit),
+    }
+    stock = {"resourceId": UI_ELEMENTS["stockname_tv"]}
+    transitions = [
+        {"from": "moni", "click": [0, 60, WIDTH, 140], "to": "search"},
+        {"from": "search", "input": {"resourceId": UI_ELEMENTS["search_edit"]}, "to": "search_result"},
+        {"from": "search_result", "long_click": stock, "to": "search_menu"},
+        {"from": "search_menu", "click": {"text": "添加自选"}, "to": "search_added"},
+        {"from": "moni", "click": [0, 1150, 144, 1270], "to": "favorites"},
+        {"from": "favorites", "long_click": stock, "to": "favorites_menu"},
+        {"from": "favorites_menu", "click": {"text": "删除自选"}, "to": "favorites_confirm"},
+        {"from": "favorites_confirm", "click": {"text": "确定"}, "to": "favorites_empty"},
+    ]
+    return states, transitions
+
+
+def withdrawal_states(orders, cancellable=None):
+    """
+    撤单列表: 点击一行弹出撤单选项，点击撤单后该行从列表中消失，下方的行上移
+
+    每种剩余委托的组合、每个翻页位置是一个状态（withdrawals_01、withdrawals_1、withdrawals_none，
+    翻页后加 _p1、_p2）；撤单后列表停在原位置，超出新的列表底部时停在底部
+
+    Args:
+        orders: 委托列表 [(股票名称, 价格, 数量, 类型)]
+        cancellable: 可以撤掉的委托序号，默认全部（委托多时限制状态数）
+    """
+    cancellable = set(range(len(orders)) if cancellable is None else cancellable)
+    states, transitions = {}, []
+    pending = [tuple(range(len(orders)))]
+    while pending:
+        remaining = pending.pop()
+        if withdrawals_name(remaining) in states:
+            continue
+        listed = [(i, orders[i]) for i in remaining]
+        offsets = page_offsets(len(remaining), WITHDRAWAL_HEIGHT)
+        for k, offset in enumerate(offsets):
+            name = withdrawals_name(remaining, k)
+            states[name] = withdrawals_page(listed, offset)
+            if k + 1 < len(offsets):
+                transitions.append({"from": name, "swipe": "up", "to": withdrawals_name(remaining, k + 1)})
+            _, regions = withdrawal_rows(listed, offset)
+            for index in sorted(cancellable & set(regions)):
+                option = f"{name}_option{index}"
+                after = tuple(i for i in remaining if i != index)
+                last = len(page_offsets(len(after), WITHDRAWAL_HEIGHT)) - 1
+                states[option] = withdrawals_page(listed, offset, option=True)
+                transitions.append({"from": name, "click": regions[index], "to": option})
+                transitions.append({"from": option, "click": {"resourceId": UI_ELEMENTS["option_chedan"]},
+                                    "to": withdrawals_name(after, min(k, last))})
+                pending.append(after)
+    transitions.insert(0, {"from": "moni", "click": {"resourceId": UI_ELEMENTS["menu_withdrawal_image"]},
+                           "to": withdrawals_name(tuple(range(len(orders))))})
+    return states, transitions
+
+
+def write_scenario(directory, states, transitions, start="home"):
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".xml"):
+            os.remove(os.path.join(directory, name))
+    for name, xml in states.items():
+        with open(os.path.join(directory, f"{name}.xml"), "w", encoding="utf-8") as f:
+            f.write(xml)
+    scenario = {
+        "package": APP_PACKAGE,
+        "start": start,
+        "launch": "home",
+        "states": {name: {"xml": f"{name}.xml"} for name in states},
+        # 任何界面按返回键都回到模拟炒股页
+        "transitions": transitions + [{"from": "*", "key": "back", "to": "moni"}],
+    }
+    with open(os.path.join(directory, "scenario.json"), "w", encoding="utf-8") as f:
+        json.dump(scenario, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"✓ {directory}: {len(states)} 个状态")
+
+
+def main():
+    states, transitions = navigation()
+    for part in (holdings_states(HOLDINGS), trade_states(), withdrawal_states(WITHDRAWALS), favorites_states()):
+        states.update(part[0])
+        transitions.extend(part[1])
+    write_scenario(os.path.join(HERE, "moni"), states, transitions)
+
+    for size in SIZES:
+        holdings = [(f"股票{n:03d}", 100 * (n + 1), 100 * (n + 1)) for n in range(size)]
+        states, transitions = navigation()
+        part = holdings_states(holdings)
+        states.update(part[0])
+        transitions.extend(part[1])
+        write_scenario(os.path.join(HERE, f"holdings_{size}"), states, transitions, start="moni")
+
+
+if __name__ == "__main__":
+    main()
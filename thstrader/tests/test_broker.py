@@ -0,0 +1,104 @@
+"""设备代理: 经代理回放场景、属性白名单、非代理端口快速回退"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+
+from conftest import FIXTURES
+from ths.broker import DeviceBroker, RemoteError, attach
+from ths.fake import FakeDevice
+from ths.trader import THSTrader
+
+
+@pytest.fixture
+def broker_address():
+    broker = DeviceBroker(("127.0.0.1", 0))
+    broker._devices["fake"] = FakeDevice(os.path.join(FIXTURES, "moni"))
+    broker._locks["fake"] = threading.RLock()
+    thread = threading.Thread(target=broker.serve_forever, daemon=True)
+    thread.start()
+    while broker._server is None:
+        time.sleep(0.01)
+    yield broker._server.server_address
+    broker.shutdown()
+
+
+def test_trader_over_broker(broker_address):
+    device = attach("fake", broker_address)
+    try:
+        trader = THSTrader(device=device)
+        trader.screen_log.mode = "off"
+        assert trader.get_balance()["可用"] == "150,000.00"
+        assert trader.buy("002415", 100, 31.5)["success"]
+    finally:
+        device.close()
+
+
+def test_only_device_methods_are_forwarded(broker_address):
+    device = attach("fake", broker_address)
+    try:
+        assert device.app_current() == "com.hexin.plat.android"
+        with pytest.raises(RemoteError, match="PermissionError"):
+            device.d.shell("rm -rf /sdcard")
+        with pytest.raises(RemoteError, match="PermissionError"):
+            device.d.shell("input keyevent KEYCODE_DEL && input text 1;reboot")
+        with pytest.raises(RemoteError, match="PermissionError"):
+            device.d.screenshot("/tmp/broker.png")
+        for name in ("push", "pull", "app_install"):
+            with pytest.raises(RemoteError, match="AttributeError"):
+                getattr(device.d, name)
+    finally:
+        device.close()
+
+
+class _Silent(socketserver.BaseRequestHandler):
+    def handle(self):
+        time.sleep(2)
+
+
+class _Http(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.rfile.readline()
+        self.wfile.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+
+
+@pytest.mark.parametrize("handler", [_Silent, _Http])
+def test_attach_falls_back_when_port_is_not_a_broker(handler):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        start = time.time()
+        assert attach("fake", server.server_address) is None
+        assert time.time() - start < 1.5
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_attach_closes_client_when_device_fails(broker_address, monkeypatch):
+    closed = []
+    from ths import broker
+
+    monkeypatch.setattr(broker.BrokerClient, "close", lambda self: closed.append(True))
+    monkeypatch.setattr(broker.DeviceBroker, "get_device", lambda self, serial: 1 / 0)
+    with pytest.raises(RemoteError):
+        attach("offline", broker_address)
+    assert closed
+
+
+def test_non_object_request_gets_error_reply(broker_address):
+    with socket.create_connection(broker_address, timeout=2) as sock:
+        stream = sock.makefile("rwb")
+        for line in (b"[1]\n", b'"x"\n', b"3\n"):
+            stream.write(line)
+            stream.flush()
+            reply = json.loads(stream.readline())
+            assert not reply["ok"] and "不是 JSON 对象" in reply["error"]
+        stream.write(b'{"op": "ping"}\n')
+        stream.flush()
+        assert json.loads(stream.readline()) == {"ok": True, "value": "pong"}
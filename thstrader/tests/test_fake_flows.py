@@ -0,0 +1,122 @@
+"""回放 tests/fixtures 中的场景，覆盖导航、余额、持仓、买入和撤单"""
+import pytest
+
+
+@pytest.fixture
+def trader(make_trader):
+    return make_trader("moni")
+
+
+def test_navigate_from_home(trader):
+    assert trader.device.state == "home"
+    assert trader.pages.goto("moni")
+    assert trader.device.state == "moni"
+    assert trader.pages.goto("withdrawals")
+    assert trader.pages.current() == "withdrawals"
+
+
+def test_navigate_between_pages(trader):
+    trader.device.goto_state("buy_form")
+    assert trader.pages.goto("withdrawals")
+    assert [a["action"] for a in trader.device.actions] == ["key", "click"]
+
+
+def test_get_balance(trader):
+    balance = trader.get_balance()
+    assert balance == {"总资产": "200,000.00", "可用": "150,000.00",
+                       "总市值": "50,000.00", "浮动盈亏": "1,234.00"}
+    assert trader.device.state == "moni"
+
+
+def test_get_position(trader):
+    assert trader.get_position() == [
+        {"股票名称": "海康威视", "股票余额": 1000, "可用余额": 800},
+        {"股票名称": "贵州茅台", "股票余额": 100, "可用余额": 100},
+        {"股票名称": "招商银行", "股票余额": 2000, "可用余额": 0},
+    ]
+
+
+@pytest.mark.parametrize("size", [10, 50, 200])
+def test_get_position_paged(make_trader, size):
+    holdings = make_trader(f"holdings_{size}").get_position()
+    assert [h["股票名称"] for h in holdings] == [f"股票{n:03d}" for n in range(size)]
+    assert holdings[-1]["股票余额"] == 100 * size
+
+
+def test_buy(trader):
+    result = trader.buy("002415", 100, 31.5)
+    assert result["success"], result
+    assert result["stock_name"] == "海康威视"
+    assert result["msg"] == "委托已提交"
+    assert trader.device.state == "moni"
+    assert any(a.get("resourceId", "").endswith("stockvolume") and a["text"] == "100"
+               for a in trader.device.actions if a["action"] == "input")
+
+
+def test_buy_verify_mismatch_is_cancelled(trader):
+    result = trader.buy("002415", 200, 31.5)
+    assert not result["success"]
+    assert result["msg"] == "订单确认信息不符"
+    assert trader.ledger.dirty
+
+
+def test_get_avail_withdrawals(trader):
+    assert trader.get_avail_withdrawals() == [
+        {"股票名称": "海康威视", "委托价格": 31.5, "委托数量": 100, "委托类型": "买入"},
+        {"股票名称": "贵州茅台", "委托价格": 1500.0, "委托数量": 100, "委托类型": "卖出"},
+    ]
+
+
+def test_withdraw(trader):
+    result = trader.withdraw("贵州茅台", "卖出", 100, 1500)
+    assert result["success"], result
+    # 撤掉的一行已从列表中消失，另一笔委托仍在
+    assert "withdrawals_0" in [a["state"] for a in trader.device.actions]
+
+
+def test_withdraw_price_must_match(trader):
+    assert not trader.withdraw("海康威视", "买入", 100, 31.51)["success"]
+    assert not any(a["state"].endswith("option0") for a in trader.device.actions)
+
+
+def test_cancel_all(trader):
+    result = trader.cancel_all()
+    assert result["success"], result
+    assert len(result["cancelled"]) == 2
+    assert "withdrawals_none" in [a["state"] for a in trader.device.actions]
+
+
+def test_cancel_all_scrolled_list(make_trader):
+    # 12 笔委托超过一屏，第 11 行开始时只露出一部分，撤掉第 0 行后才完整出现在当前屏幕
+    from generate import navigation, withdrawal_states
+    from ths.config import APP_PACKAGE
+
+    orders = [(f"目标{n}", "10.00", 100, "买入" if n in (0, 11) else "卖出") for n in range(12)]
+    states, transitions = navigation()
+    part = withdrawal_states(orders, cancellable={0, 11})
+    states.update(part[0])
+    transitions.extend(part[1] + [{"from": "*", "key": "back", "to": "moni"}])
+    trader = make_trader({"package": APP_PACKAGE, "start": "moni", "launch": "home",
+                          "states": {name: {"xml_text": xml} for name, xml in states.items()},
+                          "transitions": transitions})
+
+    result = trader.cancel_all(trade_type="买入")
+    assert [o["股票名称"] for o in result["cancelled"]] == ["目标0", "目标11"]
+    assert result["success"] and not result["failed"]
+
+
+def test_add_favorite(trader):
+    result = trader.add_favorite("HKWS")
+    assert result["success"], result
+    assert result["msg"] == "添加成功"
+    assert "search_added" in [a["state"] for a in trader.device.actions]
+    assert any(a["action"] == "input" and a["text"] == "hkws" for a in trader.device.actions)
+    assert trader.device.state == "moni"
+
+
+def test_remove_favorite(trader):
+    result = trader.remove_favorite("hkws")
+    assert result["success"], result
+    assert result["msg"] == "删除成功"
+    assert "favorites_empty" in [a["state"] for a in trader.device.actions]
+    assert trader.device.state == "moni"
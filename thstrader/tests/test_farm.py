@@ -0,0 +1,95 @@
+"""TraderFarm 在设备不可用和停止时结束任务"""
+import time
+
+import pytest
+
+from ths.farm import TraderFarm
+
+
+class SlowTrader:
+    def __init__(self, serial):
+        self.serial = serial
+
+    def get_balance(self):
+        time.sleep(0.3)
+        return {"可用": "1.00"}
+
+
+def offline(serial):
+    raise ConnectionError("offline")
+
+
+def test_queued_jobs_fail_when_no_device_is_healthy():
+    farm = TraderFarm(["a", "b"], trader_factory=offline, health_interval=0.2)
+    try:
+        queued = farm.submit("get_balance")
+        pinned = farm.submit("buy", "002415", 100, 31.5, serial="a")
+        with pytest.raises(RuntimeError, match="没有可用的设备"):
+            queued.result(timeout=5)
+        with pytest.raises(RuntimeError, match="设备 a 不可用"):
+            pinned.result(timeout=5)
+        # 之后提交的任务立即结束
+        with pytest.raises(RuntimeError):
+            farm.submit("get_balance").result(timeout=1)
+    finally:
+        farm.shutdown()
+
+
+def test_shutdown_cancels_pending_jobs():
+    farm = TraderFarm(["a"], trader_factory=SlowTrader)
+    running = farm.submit("get_balance")
+    while not running.running():
+        time.sleep(0.01)
+    queued = farm.submit("get_balance")
+    pinned = farm.submit("get_balance", serial="a")
+    farm.shutdown()
+    assert running.result() == {"可用": "1.00"}
+    assert queued.cancelled() and pinned.cancelled()
+    with pytest.raises(RuntimeError):
+        farm.submit("get_balance")
+
+
+class FlakyTrader:
+    """第一次查询失败，之后恢复"""
+
+    class device:
+        @staticmethod
+        def app_current():
+            return "com.hexin.plat.android"
+
+    def __init__(self, serial):
+        self.calls = 0
+
+    def get_balance(self):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("adb reset")
+        return {"可用": "2.00"}
+
+
+def test_failover_retries_on_same_device_when_others_are_down():
+    def factory(serial):
+        if serial == "b":
+            raise ConnectionError("offline")
+        return FlakyTrader(serial)
+
+    farm = TraderFarm(["a", "b"], trader_factory=factory, health_interval=0.2)
+    try:
+        while not farm.workers["a"].healthy:
+            time.sleep(0.01)
+        assert farm.submit("get_balance").result(timeout=5) == {"可用": "2.00"}
+    finally:
+        farm.shutdown()
+
+
+def test_unknown_method_is_rejected_at_submit():
+    farm = TraderFarm(["a"], trader_factory=SlowTrader)
+    try:
+        with pytest.raises(AttributeError):
+            farm.submit("get_balanse")
+        with pytest.raises(AttributeError):
+            farm.submit("_submit_order")
+        assert farm.call("get_balance") == {"可用": "1.00"}
+        assert farm.health()["a"]["healthy"]
+    finally:
+        farm.shutdown()
@@ -0,0 +1,48 @@
+"""RecyclerHarvester 翻页去重"""
+import pytest
+
+from generate import holdings_states, navigation
+from ths.config import APP_PACKAGE, UI_ELEMENTS
+from ths.fake import FakeDevice
+from ths.harvester import RecyclerHarvester
+
+
+def scenario(holdings):
+    states, transitions = navigation()
+    part = holdings_states(holdings)
+    states.update(part[0])
+    transitions.extend(part[1])
+    return {"package": APP_PACKAGE, "start": "holdings_0", "launch": "home",
+            "states": {name: {"xml_text": xml} for name, xml in states.items()},
+            "transitions": transitions}
+
+
+def harvest(holdings):
+    device = FakeDevice(scenario(holdings))
+    harvester = RecyclerHarvester(device, UI_ELEMENTS["recyclerview_id"], "android.widget.RelativeLayout")
+    return [row.texts[0] for row in harvester.harvest()]
+
+
+def test_distinct_rows():
+    names = [f"股票{n:02d}" for n in range(20)]
+    assert harvest([(name, 100, 100) for name in names]) == names
+
+
+def test_identical_rows_across_page_boundary():
+    # 第 5-7 行内容相同，第 6 行是两页的重叠行
+    names = [f"股票{n:02d}" for n in range(20)]
+    names[5:8] = ["海康威视"] * 3
+    assert harvest([(name, 100, 100) for name in names]) == names
+
+
+@pytest.mark.parametrize("duplicates", [(0, 2), (11, 14), (17, 20)])
+def test_identical_rows(duplicates):
+    # 内容相同的委托/持仓行位于页首、页中或最后一页
+    names = [f"股票{n:02d}" for n in range(20)]
+    start, end = duplicates
+    names[start:end] = ["海康威视"] * (end - start)
+    assert harvest([(name, 100, 100) for name in names]) == names
+
+
+def test_single_page():
+    assert harvest([("海康威视", 100, 100)] * 3) == ["海康威视"] * 3
@@ -0,0 +1,79 @@
+"""OCR 工作进程客户端: 握手、非工作进程端口快速回退"""
+import socketserver
+import threading
+import time
+
+import pytest
+
+from ths.ocr_worker import OcrWorker, attach_reader
+
+
+class LineReader:
+    """按图片宽度返回文本的识别器（不依赖 cnocr）"""
+
+    def ocr_for_single_line(self, image):
+        return {"text": str(image.shape[1]), "score": 1.0}
+
+    def ocr_for_single_lines(self, images, batch_size=1):
+        return [self.ocr_for_single_line(image) for image in images]
+
+    def ocr(self, image):
+        return []
+
+
+class _Silent(socketserver.BaseRequestHandler):
+    def handle(self):
+        time.sleep(2)
+
+
+class _Http(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.rfile.readline()
+        self.wfile.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+
+
+class _WrongPong(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.rfile.readline()
+        self.wfile.write(b'{"ok": true}\n')
+
+
+def listen(handler):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.mark.parametrize("handler", [_Silent, _Http, _WrongPong])
+def test_attach_reader_ignores_other_services(handler):
+    server = listen(handler)
+    try:
+        start = time.time()
+        assert attach_reader(server.server_address) is None
+        assert time.time() - start < 1.5
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_remote_reader_round_trip(monkeypatch):
+    from PIL import Image
+
+    # 监听随机端口，从 server_activate 取得实际地址
+    servers = []
+    activate = socketserver.TCPServer.server_activate
+    monkeypatch.setattr(socketserver.TCPServer, "server_activate",
+                        lambda server: (activate(server), servers.append(server)))
+    worker = OcrWorker(reader=LineReader())
+    threading.Thread(target=worker.serve_forever, args=(("127.0.0.1", 0), False), daemon=True).start()
+    while not servers:
+        time.sleep(0.01)
+    server = servers[0]
+    try:
+        reader = attach_reader(server.server_address)
+        assert reader is not None
+        assert [r["text"] for r in reader.ocr_for_single_lines([Image.new("RGB", (12, 5))])] == ["12"]
+        reader.close()
+    finally:
+        server.shutdown()
@@ -0,0 +1,28 @@
+"""常驻服务 stdio 模式"""
+import io
+import json
+
+import pytest
+
+from ths.server import TraderServer
+
+
+def serve(trader, lines):
+    stdin = io.BytesIO("".join(line + "\n" for line in lines).encode("utf-8"))
+    stdout = io.BytesIO()
+    TraderServer(trader).serve_stdio(stdin, stdout)
+    return [json.loads(line) for line in stdout.getvalue().decode("utf-8").splitlines()]
+
+
+def test_non_object_requests_keep_serving(make_trader):
+    trader = make_trader()
+    responses = serve(trader, ['[1]', '"x"', '3', '{"id": 1, "method": "ping"}'])
+    assert [r["id"] for r in responses] == [None, None, None, 1]
+    assert all("不是 JSON 对象" in r["error"] for r in responses[:3])
+    assert responses[-1]["result"] == "pong"
+
+
+@pytest.mark.parametrize("line", ["GET / HTTP/1.1", "null"])
+def test_unparsable_line_stops_serving(make_trader, line):
+    responses = serve(make_trader(), [line, '{"id": 1, "method": "ping"}'])
+    assert len(responses) == 1 and "无效请求" in responses[0]["error"]